@@ -0,0 +1,217 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import serial
+
+
+def encode_command(seq, code):
+    """
+    紧凑的串口指令格式：一行 "序号:指令码"，如 b"17:3\\n"。
+
+    序号在 0-99 之间循环，Arduino 回复以 "序号:" 开头的一行即为确认。
+    """
+    return f"{seq}:{code}\n".encode('ascii')
+
+
+def parse_ack(line):
+    """从 "序号:..." 格式的 Arduino 回复中取出序号，其他回复返回 None"""
+    head, sep, _ = line.partition(':')
+    head = head.strip()
+    return int(head) if sep and head.isdigit() else None
+
+
+class SerialCommand:
+    __slots__ = ('seq', 'code', 'queued_at', 'sent_at')
+
+    def __init__(self, seq, code):
+        self.seq = seq
+        self.code = code
+        self.queued_at = time.time()
+        self.sent_at = 0.0
+
+
+class SerialActuator:
+    """
+    Arduino 执行器的串口工作线程，检测循环只负责把指令放入队列，不会被串口阻塞。
+
+    同一时间只有一条指令在执行：写出指令后等待 Arduino 的回复作为确认（执行完成），
+    再发送下一条，超过 ack_timeout 未确认则视为超时继续。连接断开或打不开时在后台定期重连。
+
+    参数:
+        port: 串口号
+        baudrate: 波特率
+        queue_size: 指令队列长度，队列已满时丢弃新指令
+        ack_timeout: 等待确认的最长秒数，即一次投放动作的最长时间
+        max_age: 排队超过该秒数的指令已过时，不再发送
+        reconnect_interval: 重连间隔秒数
+        on_connect: 每次连接成功（Arduino 启动完成）后的回调
+    """
+
+    def __init__(self, port, baudrate=9600, queue_size=4, ack_timeout=7.0, max_age=30.0, reconnect_interval=2.0,
+                 on_connect=None):
+        self.port = port
+        self.baudrate = baudrate
+        self.ack_timeout = ack_timeout
+        self.max_age = max_age
+        self.reconnect_interval = reconnect_interval
+        self.on_connect = on_connect
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._serial = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._seq = 0
+        self._inflight = None
+        self._last_error = None
+
+        # 统计信息
+        self.sent = 0
+        self.acked = 0
+        self.timeouts = 0
+        self.dropped = 0
+        self.stale = 0
+        self.ignored = 0
+        self.connects = 0
+        self._latencies = deque(maxlen=200)
+
+    @property
+    def connected(self):
+        return self._serial is not None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"serial-{self.port}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        self._disconnect()
+
+    def send(self, code):
+        """
+        把指令放入队列，立即返回。
+
+        返回:
+            bool: 队列已满被丢弃时为 False
+        """
+        self._seq = (self._seq + 1) % 100
+        try:
+            self._queue.put_nowait(SerialCommand(self._seq, code))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            print(f"Arduino指令队列已满，丢弃指令 {code}")
+            return False
+
+    def _connect(self):
+        try:
+            self._serial = serial.Serial(self.port, self.baudrate, timeout=0.1)
+        except (serial.SerialException, OSError) as e:
+            # 后台不断重连，同样的错误只打印一次
+            if str(e) != self._last_error:
+                print(f"无法连接Arduino ({self.port}): {e}，将在后台重试")
+                self._last_error = str(e)
+            return False
+        self._last_error = None
+        # Arduino 打开串口时会复位，等待其启动完成
+        self._stop.wait(2)
+        self._serial.reset_input_buffer()
+        self.connects += 1
+        print(f"已连接到 Arduino on {self.port}")
+        if self.on_connect is not None:
+            self.on_connect()
+        return True
+
+    def _disconnect(self):
+        if self._serial is not None:
+            try:
+                self._serial.close()
+            except Exception:
+                pass
+            self._serial = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._serial is None and not self._connect():
+                self._stop.wait(self.reconnect_interval)
+                continue
+            try:
+                self._step()
+            except (serial.SerialException, OSError) as e:
+                print(f"Arduino串口错误: {e}，{self.reconnect_interval}秒后重连")
+                self._disconnect()
+                # 未确认的指令在重连后重新发送
+                if self._inflight is not None:
+                    self._inflight.sent_at = 0.0
+                self._stop.wait(self.reconnect_interval)
+
+    def _step(self):
+        if self._inflight is None:
+            try:
+                self._inflight = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+        command = self._inflight
+        if command is not None and not command.sent_at:
+            if time.time() - command.queued_at > self.max_age:
+                self.stale += 1
+                self._inflight = None
+                return
+            self._serial.write(encode_command(command.seq, command.code))
+            command.sent_at = time.time()
+            self.sent += 1
+
+        # 读取超时为 0.1 秒，没有回复时不会长时间阻塞
+        line = self._serial.readline().decode('utf-8', errors='replace').strip()
+        if line:
+            self._handle_reply(line)
+
+        command = self._inflight
+        if command is not None and command.sent_at and time.time() - command.sent_at > self.ack_timeout:
+            self.timeouts += 1
+            print(f"Arduino未确认指令 {command.code} (序号 {command.seq})")
+            self._inflight = None
+
+    def _handle_reply(self, line):
+        command = self._inflight
+        seq = parse_ack(line)
+        # 只有序号与正在执行的指令一致的回复才算确认，噪声和旧固件的回显不能确认指令
+        if command is None or not command.sent_at or seq != command.seq:
+            self.ignored += 1
+            print(f"Arduino返回 (已忽略): {line}")
+            return
+        now = time.time()
+        self._latencies.append((now - command.sent_at, now - command.queued_at))
+        self.acked += 1
+        self._inflight = None
+
+    def stats(self):
+        stats = {
+            'port': self.port,
+            'connected': self.connected,
+            'queued': self._queue.qsize(),
+            'sent': self.sent,
+            'acked': self.acked,
+            'timeouts': self.timeouts,
+            'dropped': self.dropped,
+            'stale': self.stale,
+            'ignored': self.ignored,
+            'connects': self.connects,
+        }
+        if self._latencies:
+            latencies = np.array(self._latencies) * 1000
+            stats.update({
+                'ack_latency_ms': round(float(latencies[:, 0].mean()), 1),
+                'ack_latency_p95_ms': round(float(np.percentile(latencies[:, 0], 95)), 1),
+                'actuation_latency_ms': round(float(latencies[:, 1].mean()), 1),
+            })
+        return stats
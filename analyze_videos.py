@@ -0,0 +1,185 @@
+import argparse
+import csv
+import json
+import os
+import time
+from multiprocessing import Pool
+
+import cv2
+
+from backends import BACKENDS, DEFAULT_WEIGHTS, create_backend
+from common import find_videos
+from voting import add_voter_arguments, voter_from_args
+
+CSV_FIELDS = ('video', 'frame', 'time', 'type', 'cls_id', 'label', 'score', 'x1', 'y1', 'x2', 'y2')
+
+# 工作进程内的推理后端和参数，由 _init_worker 设置
+_backend = None
+_args = None
+
+
+def plan_chunks(videos, chunk_frames):
+    """
+    把每个视频按帧区间切分为任务。
+
+    CAP_PROP_FRAME_COUNT 只是估计值，最后一段的结束帧为 None，一直读到文件末尾。
+
+    返回:
+        list: [(视频路径, 开始帧, 结束帧或None)]
+    """
+    chunks = []
+    for path in videos:
+        cap = cv2.VideoCapture(path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        starts = list(range(0, total, chunk_frames)) if total > chunk_frames else [0]
+        for i, start in enumerate(starts):
+            end = starts[i + 1] if i + 1 < len(starts) else None
+            chunks.append((path, start, end))
+    return chunks
+
+
+def _init_worker(args):
+    global _backend, _args
+    # 每个进程只用一个线程，并行度由进程数决定，避免线程争抢
+    import torch
+    torch.set_num_threads(1)
+    cv2.setNumThreads(1)
+    _args = args
+    _backend = create_backend(args.backend, args.weights, args.imgsz, warmup=1)
+
+
+def detection_records(video, frame_index, fps, detections, names):
+    for cls_id, score, box in detections:
+        yield {
+            'video': video,
+            'frame': frame_index,
+            'time': round(frame_index / fps, 3),
+            'type': 'detection',
+            'cls_id': cls_id,
+            'label': names[cls_id],
+            'score': round(score, 4),
+            'box': [round(float(v), 1) for v in box],
+        }
+
+
+def analyze_chunk(chunk):
+    """
+    分析一个视频的一段帧区间。
+
+    开始帧之前的 overlap 帧只用来让投票器进入状态，不输出记录，
+    使跨段的投票结果与整段连续分析一致。
+
+    返回:
+        tuple: (chunk, 记录列表, 分析的帧数)
+    """
+    path, start, end = chunk
+    args = _args
+    names = _backend.names
+    voter = voter_from_args(args, len(names))
+    video = os.path.basename(path)
+
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    warm_start = max(start - args.overlap, 0)
+    if warm_start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, warm_start)
+    index = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+
+    records = []
+    frames = 0
+    while end is None or index < end:
+        success, frame = cap.read()
+        if not success:
+            break
+        detections = _backend.predict_one(frame, args.conf)
+        decision = voter.update(detections, now=index / fps)
+        if index >= start:
+            frames += 1
+            records.extend(detection_records(video, index, fps, detections, names))
+            if decision is not None:
+                cls_id, score = decision
+                records.append({
+                    'video': video, 'frame': index, 'time': round(index / fps, 3), 'type': 'decision',
+                    'cls_id': cls_id, 'label': names[cls_id], 'score': round(score, 4), 'box': None,
+                })
+        index += 1
+    cap.release()
+    return chunk, records, frames
+
+
+class LogWriter:
+    """按 JSONL 或 CSV 格式边分析边写出检测记录"""
+
+    def __init__(self, path, fmt):
+        self.fmt = fmt
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._csv = None
+        if fmt == 'csv':
+            self._csv = csv.DictWriter(self._file, fieldnames=CSV_FIELDS)
+            self._csv.writeheader()
+
+    def write(self, records):
+        for record in records:
+            if self._csv is not None:
+                row = {k: v for k, v in record.items() if k != 'box'}
+                box = record['box'] or [None] * 4
+                row.update(zip(('x1', 'y1', 'x2', 'y2'), box))
+                self._csv.writerow(row)
+            else:
+                self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多进程离线分析录像，输出检测日志')
+    parser.add_argument('videos', nargs='+', help='视频文件或目录')
+    parser.add_argument('--output', default='detections.jsonl', help='日志文件 (默认: detections.jsonl)')
+    parser.add_argument('--format', choices=('jsonl', 'csv'), help='日志格式，默认按输出文件扩展名判断')
+    parser.add_argument('--backend', default='torch', choices=BACKENDS, help='推理后端 (默认: torch)')
+    parser.add_argument('--weights', default=DEFAULT_WEIGHTS, help=f'PyTorch 权重路径 (默认: {DEFAULT_WEIGHTS})')
+    parser.add_argument('--imgsz', type=int, default=640, help='输入尺寸 (默认: 640)')
+    parser.add_argument('--conf', type=float, default=0.8, help='置信度阈值 (默认: 0.8)')
+    parser.add_argument('--workers', type=int, default=0, help='进程数 (默认: CPU核心数)')
+    parser.add_argument('--chunk-frames', type=int, default=600, help='每个任务的帧数 (默认: 600)')
+    parser.add_argument('--overlap', type=int, default=30,
+                        help='每段开始前用于投票器预热的帧数，不输出记录 (默认: 30)')
+    add_voter_arguments(parser)
+    args = parser.parse_args()
+
+    fmt = args.format or ('csv' if args.output.lower().endswith('.csv') else 'jsonl')
+    videos = find_videos(args.videos)
+    if not videos:
+        print("没有找到视频文件")
+        return
+    chunks = plan_chunks(videos, args.chunk_frames)
+    workers = args.workers or os.cpu_count()
+    print(f"{len(videos)} 个视频切分为 {len(chunks)} 段，使用 {workers} 个进程")
+
+    writer = LogWriter(args.output, fmt)
+    total_frames = 0
+    total_records = 0
+    start = time.time()
+    try:
+        with Pool(workers, initializer=_init_worker, initargs=(args,)) as pool:
+            # 按完成顺序写出，每条记录都带有视频名和帧号
+            for (path, first, last), records, frames in pool.imap_unordered(analyze_chunk, chunks):
+                writer.write(records)
+                total_frames += frames
+                total_records += len(records)
+                print(f"{os.path.basename(path)} [{first}, {last if last is not None else '末尾'}) "
+                      f"{frames} 帧，{len(records)} 条记录")
+    finally:
+        writer.close()
+
+    elapsed = time.time() - start
+    print(f"\n共分析 {total_frames} 帧，{total_records} 条记录，用时 {elapsed:.1f}秒，"
+          f"吞吐 {total_frames / elapsed:.1f} 帧/秒 ({workers} 个进程)")
+    print(f"日志已保存至: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
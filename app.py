@@ -1,247 +1,564 @@
+from serving import ASYNC_MODES, Outbox, async_mode_from_argv, monkey_patch, wait_event
+
+# --async-mode eventlet 时需要在导入 flask 之前打补丁，采集和推理仍使用系统线程
+async_mode = async_mode_from_argv()
+cooperative_sleep = monkey_patch(async_mode)
+
 from flask import Flask, Response, request, send_from_directory
 import cv2
-from ultralytics import YOLO
 import argparse
 import os
 from flask_cors import CORS
-from flask_socketio import SocketIO
-import json
+from flask_socketio import SocketIO, join_room, leave_room
 import threading
-import serial
 import time
 import numpy as np
+from pipeline import OVERLAY_MODES, FramePacket, PipelineRegistry
+from motion import MOTION_ENGINES, MotionGate, create_motion_detector, motion_roi
+from detections import Detections
+from encoding import pack_video_frame
+from scheduler import BatchScheduler
+from workers import WORKER_MODES, ProcessInferencePool
+from backends import BACKENDS, InferenceBackend
+from common import current_rss_mb
+from actuator import SerialActuator
+from voting import TemporalVoter, add_voter_arguments
+from tracking import TrackedDetector
+from scene_cache import SceneCache, frame_signature
+from health import StartupHealth
+from stations import StationRegistry
+from telemetry import TelemetryHub
+import metrics
+from metrics import (COOLDOWN_SUPPRESSED, DETECTIONS, DRAWING_SECONDS, FRAMES, INFERENCE_SECONDS,
+                     MOTION_SECONDS, SCENE_CACHE_LOOKUPS, SENDS, SOCKET_CLIENTS, TIMEOUT_FALLBACKS, TRACKED_FRAMES)
+
+# 启动状态，模型和串口在后台初始化，前端和 Socket.IO 不必等待
+health = StartupHealth()
 
 app = Flask(__name__, static_folder='frontend/build')
 CORS(app)  # 添加CORS支持
-# 修改socketio初始化，使用threading模式
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')  # 初始化SocketIO
+# 默认使用threading模式，--async-mode eventlet 时所有连接使用协作式I/O
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=async_mode)  # 初始化SocketIO
+# 检测线程通过发件箱发送消息，eventlet 模式下由 Socket.IO 的后台任务统一发出
+outbox = Outbox(socketio, direct=async_mode != 'eventlet')
+# 逐帧状态按摄像头分房间推送，每个客户端按各自的最大频率只收到最新一条，通过 --telemetry-rate 设置上限
+telemetry = TelemetryHub(lambda sid, payload, callback: socketio.emit('telemetry', payload, to=sid, callback=callback))
 
 # 添加静态视频文件目录，使用绝对路径
 VIDEOS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'videos')
 app.config['VIDEOS_FOLDER'] = VIDEOS_DIR
 print(f"视频文件目录绝对路径: {VIDEOS_DIR}")
 
-# 加载模型
-model = YOLO("models/trashcan.pt")
-
-# 全局变量
-last_cls_id = None
-frame_count = 0
-threshold = 5  # 连续帧数阈值
-last_send_time = 0  # 上次发送信号的时间
-cooldown_period = 7  # 冷却时间，单位为秒
-
-# 添加运动检测相关变量
-prev_frame = None
-motion_threshold = 30  # 运动检测阈值
-motion_area_ratio = 0.02  # 移动区域占比阈值
-motion_detected = False
-motion_start_time = 0
-detection_conf = 0.8  # 初始置信度
-detection_state = "NORMAL"  # 状态: NORMAL, REDUCED_CONF, TIMEOUT
-
-# 在全局变量区域添加Arduino初始化代码
-try:
-    arduino = serial.Serial('COM3', 9600, timeout=1)
-    time.sleep(2)
-    print("已连接到 Arduino on COM3")
-except Exception as e:
-    arduino = None
-    print(f"无法初始化Arduino连接: {e}")
-
-def send_message(cls_id, score, label):
-    global last_send_time
-    
+# 推理后端，启动后在后台线程中按 --backend 加载和预热，完成前为 None
+backend = None
+
+# 各站点共用的检测参数，由 __main__ 按命令行参数设置
+# 运动检测引擎，默认在缩小图上用背景模型检测，可通过 --motion-engine 切换为帧差法
+motion_params = {'engine': 'background', 'learning_rate': 0.02}
+
+# 运动门控，默认关闭，通过 --motion-gate 启用
+motion_gate_params = {'enabled': False, 'tail': 3.0, 'keepalive_interval': 5.0}
+
+# 投票器跨帧累积各类别置信度，参数可通过 --vote-* 调整
+voter_params = {'decay': 0.8, 'fire_mass': 2.5, 'dominance': 0.7}
+
+# 跟踪辅助跳帧，默认每帧都检测，通过 --detect-stride 启用
+detect_stride = 1
+track_min_quality = 0.5
+
+# 画面未变化时复用检测结果和已编码画面，默认关闭，通过 --scene-cache 启用
+scene_cache_enabled = False
+scene_cache_params = {'size': 8, 'tolerance': 3.0, 'ttl': 2.0, 'max_hits': 60}
+
+# 多摄像头批量推理调度器，默认关闭，通过 --batch 启用
+scheduler = None
+
+# 推理工作进程池，默认在本进程推理，通过 --workers 启用
+worker_pool = None
+
+# 裁剪推理，默认关闭，通过 --roi 启用
+roi_inference = False
+
+# 等待Arduino确认的最长秒数
+ack_timeout = 7.0
+
+health.register('model')
+
+def setup_station(station):
+    """创建站点的运动检测、门控、跟踪、画面缓存和串口组件，投票器在模型加载后创建"""
+    station.motion_detector = create_motion_detector(motion_params['engine'], station.motion_threshold,
+                                                     learning_rate=motion_params['learning_rate'])
+    station.motion_gate = MotionGate(**motion_gate_params)
+    station.tracker = TrackedDetector(lambda frame, conf: run_inference(station, frame, conf),
+                                      detect_stride, track_min_quality)
+    station.scene_cache = SceneCache(**scene_cache_params) if scene_cache_enabled else None
+    connect_actuator(station)
+
+def connect_actuator(station):
+    """按站点的串口号启动 Arduino 串口线程，没有配置串口时不连接"""
+    component = f'serial:{station.name}'
+    if not station.serial_port:
+        health.unregister(component)
+        return
+    health.register(component, required=False,
+                    check=lambda: station.actuator is not None and station.actuator.connected)
+    station.actuator = SerialActuator(station.serial_port, ack_timeout=ack_timeout,
+                                      on_connect=lambda: health.ready(component, port=station.serial_port)).start()
+
+def teardown_station(station):
+    stop_station(station)
+    if station.actuator is not None:
+        station.actuator.stop()
+        station.actuator = None
+    health.unregister(f'serial:{station.name}')
+
+def reconfigure_station(station, changed):
+    """配置修改后更新站点组件，阈值和冷却时间直接生效"""
+    if 'motion_threshold' in changed:
+        station.motion_detector.threshold = station.motion_threshold
+    if 'serial_port' in changed:
+        if station.actuator is not None:
+            station.actuator.stop()
+            station.actuator = None
+        connect_actuator(station)
+    if {'conf', 'reduced_conf'} & changed and station.detection_state == "NORMAL":
+        station.detection_conf = station.conf
+    if 'camera' in changed:
+        # 摄像头变化后原来的背景模型、投票和跟踪状态不再适用
+        was_running = station.running
+        stop_station(station)
+        station.motion_detector = create_motion_detector(motion_params['engine'], station.motion_threshold,
+                                                         learning_rate=motion_params['learning_rate'])
+        station.voter = None
+        station.tracker.invalidate()
+        if station.scene_cache is not None:
+            station.scene_cache.clear()
+        station.reset()
+        if was_running:
+            start_station(station)
+
+# 站点注册表：每个垃圾桶一个站点，通过 --stations 从配置文件加载，可用 /api/stations 管理
+stations = StationRegistry(setup_station, teardown_station, reconfigure_station)
+
+def add_camera_station(camera_id):
+    """为没有配置站点的摄像头创建一个不连接串口的临时站点，不写入配置文件"""
+    try:
+        return stations.add({'name': f'camera-{camera_id}', 'camera': camera_id}, save=False)
+    except ValueError:
+        # 其他线程同时创建了该站点
+        return stations.for_camera(camera_id)
+
+def get_voter(station):
+    if station.voter is None:
+        station.voter = TemporalVoter(len(backend.names), **voter_params)
+    return station.voter
+
+def initialize_backend(name, warmup=2, batch=False, max_batch=4, max_wait=0.02, workers=0, worker_mode='camera'):
+    """在后台加载并预热模型，完成后才开始推理，之前的帧只推送画面"""
+    global backend, scheduler, worker_pool
+    try:
+        if workers > 0:
+            # 每个工作进程加载自己的模型，进程池可直接替代后端
+            loaded = worker_pool = ProcessInferencePool(name, workers, worker_mode, warmup=warmup).start()
+        else:
+            loaded = InferenceBackend(name).load()
+            if warmup > 0:
+                loaded.warmup(warmup)
+                print(f"{name} 推理后端预热完成 ({loaded.warmup_time:.2f}秒)")
+        if batch:
+            scheduler = BatchScheduler(loaded, max_batch=max_batch, max_wait=max_wait).start()
+        backend = loaded
+        health.ready('model', backend=name, workers=workers, load_s=round(loaded.load_time, 3),
+                     warmup_s=round(loaded.warmup_time, 3))
+    except Exception as e:
+        health.failed('model', e)
+
+def send_message(station, cls_id, score, label):
     # 检查是否在冷却期内
     current_time = time.time()
-    if current_time - last_send_time < cooldown_period:
+    if station.in_cooldown(current_time):
         # 在冷却期内，不发送消息
-        print(f"在冷却期内 ({cooldown_period}秒), 跳过发送")
+        COOLDOWN_SUPPRESSED.inc()
+        print(f"{station.name} 在冷却期内 ({station.cooldown}秒), 跳过发送")
         return
     
     # 更新最后发送时间
-    last_send_time = current_time
+    station.last_send_time = current_time
+    station.decisions += 1
+    SENDS.inc()
     
     # 通过WebSocket发送检测结果
     detection_data = {
         'cls_id': int(cls_id),
         'score': float(score),
-        'label': label
+        'label': label,
+        'station': station.name,
+        'camera_id': station.camera
     }
     print(f"发送检测结果: {detection_data}")
-    socketio.emit('detection_result', detection_data)
-    # 向Arduino发送检测结果
-    if arduino is not None:
-        try:
-            arduino.write(json.dumps({"cls_id": cls_id}).encode('utf-8'))
-            print("已发送检测结果到Arduino")
-        except Exception as e:
-            print(f"发送到Arduino错误: {e}")
+    outbox.emit('detection_result', detection_data)
+    # 向Arduino发送检测结果，由串口线程发送，不阻塞检测循环
+    if station.actuator is not None:
+        station.actuator.send(int(cls_id))
     
     # 重置运动检测和状态
-    global motion_detected, detection_state
-    motion_detected = False
-    detection_state = "NORMAL"
-    
-def detect_motion(frame):
-    """帧差法检测运动"""
-    global prev_frame, motion_detected, motion_start_time
-    
-    # 第一帧无法比较，直接设置为第一帧
-    if prev_frame is None:
-        prev_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        prev_frame = cv2.GaussianBlur(prev_frame, (21, 21), 0)
-        return False
+    station.reset()
     
-    # 将当前帧转为灰度并模糊化
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    gray = cv2.GaussianBlur(gray, (21, 21), 0)
+def detect_motion(station, frame):
+    """检测运动，引擎见 motion.create_motion_detector"""
+    movement_ratio, contours = station.motion_detector.update(frame)
+    station.motion_ratio = movement_ratio
     
-    # 计算当前帧与上一帧的差异
-    frame_delta = cv2.absdiff(prev_frame, gray)
-    thresh = cv2.threshold(frame_delta, motion_threshold, 255, cv2.THRESH_BINARY)[1]
-    
-    # 扩大白色区域以填补空隙
-    thresh = cv2.dilate(thresh, None, iterations=2)
-    
-    # 找到轮廓
-    contours, _ = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    
-    # 计算移动像素占比
-    total_pixels = thresh.shape[0] * thresh.shape[1]
-    white_pixels = cv2.countNonZero(thresh)
-    movement_ratio = white_pixels / total_pixels
-    
-    # 更新上一帧
-    prev_frame = gray
+    # 记录运动区域，供裁剪推理使用
+    roi = motion_roi(contours, frame.shape)
+    if roi is not None:
+        station.motion_roi_box = roi
     
     # 如果移动区域比例超过阈值，则认为检测到运动
-    if movement_ratio > motion_area_ratio:
-        if not motion_detected:
-            motion_detected = True
-            motion_start_time = time.time()
-            print(f"检测到运动! 移动区域占比: {movement_ratio:.4f}")
+    if movement_ratio > station.motion_area_ratio:
+        if not station.motion_detected:
+            station.motion_detected = True
+            station.motion_start_time = time.time()
+            print(f"{station.name} 检测到运动! 移动区域占比: {movement_ratio:.4f}")
         return True
     
     return False
 
-def generate_frames(camera_id):
-    video_cap = None
-    try:
-        video_cap = cv2.VideoCapture(camera_id)
-        if not video_cap.isOpened():
-            print(f"无法打开摄像头 {camera_id}")
-            return
+def predict(frame, conf, imgsz=None, offset=(0, 0), camera_id=None):
+    """对单帧推理，启用批量调度时交给调度器与其他摄像头合并推理，启用工作进程时按摄像头分配进程"""
+    # 只在这里统计推理耗时，光流跟踪得到的帧不计入
+    start = time.perf_counter()
+    if scheduler is not None:
+        detections = scheduler.predict(frame, conf, imgsz, offset)
+    elif worker_pool is not None:
+        detections = worker_pool.predict_one(frame, conf, imgsz, offset, source=camera_id)
+    else:
+        detections = backend.predict_one(frame, conf, imgsz, offset)
+    INFERENCE_SECONDS.observe(time.perf_counter() - start)
+    return detections
 
-        global last_cls_id, frame_count, motion_detected, motion_start_time, detection_state, detection_conf
+def run_inference(station, frame, conf):
+    """运行推理，启用裁剪推理时只把运动区域送入模型，并把检测框映射回原图坐标"""
+    if roi_inference and station.motion_detected and station.motion_roi_box is not None:
+        x1, y1, x2, y2 = station.motion_roi_box
+        crop = frame[y1:y2, x1:x2]
+        # 裁剪区域已对齐到模型步长，直接用其长边作为输入尺寸
+        imgsz = max(x2 - x1, y2 - y1)
+        return predict(crop, conf, imgsz, offset=(x1, y1), camera_id=station.camera)
 
-        # 设置摄像头分辨率为640x480
-        video_cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        video_cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+    return predict(frame, conf, camera_id=station.camera)
 
-        while video_cap.isOpened():
-            success, frame = video_cap.read()
-            if not success:
-                break
+def publish_telemetry(station, detections, state=None):
+    """把当前状态和最高分的检测结果发布到遥测通道"""
+    top_cls, top_score = None, 0.0
+    if len(detections):
+        i = int(np.argmax(detections.scores))
+        top_cls, top_score = int(detections.classes[i]), float(detections.scores[i])
+    telemetry.publish(station.camera, state or station.detection_state, station.detection_conf,
+                      motion_ratio=station.motion_ratio, elapsed=station.elapsed(),
+                      motion=station.motion_detected, idle=station.motion_gate.is_idle(),
+                      top_cls=top_cls, top_score=top_score)
 
-            # 确保帧的尺寸是640x480
-            frame = cv2.resize(frame, (640, 480))
-            
-            # 运动检测（仅在正常状态下检测）
-            if not motion_detected:
-                motion_detected = detect_motion(frame)
-            
-            # 如果检测到运动，根据时间动态调整置信度和状态
-            if motion_detected:
-                current_time = time.time()
-                elapsed_time = current_time - motion_start_time
-                
-                # 状态转换逻辑
-                if detection_state == "NORMAL" and elapsed_time >= 7:
-                    detection_state = "REDUCED_CONF"
-                    detection_conf = 0.5
-                    print(f"已经过7秒未识别，降低置信度到: {detection_conf}")
-                elif detection_state == "REDUCED_CONF" and elapsed_time >= 14:
-                    detection_state = "TIMEOUT"
-                    print("已经过14秒未识别，将使用默认分类")
-            
-            # 根据当前状态进行检测
-            try:
-                if detection_state == "TIMEOUT":
-                    # 超时状态：使用默认分类（随机或固定）
-                    default_cls_id = 0  # 设置默认分类ID
-                    default_label = model.names[default_cls_id]
-                    send_message(default_cls_id, 0.5, default_label)
-                    # 重置状态
-                    detection_conf = 0.8
-                    detection_state = "NORMAL"
-                    motion_detected = False
-                else:
-                    # 使用当前置信度进行检测
-                    results = model.predict(frame, conf=detection_conf, verbose=False)
-                    
-                    # 处理检测结果
-                    detection_found = False
-                    for result in results:
-                        # 绘制检测结果到帧上
-                        frame = result.plot()
-                        # 取出结果的类别、置信度、标签
-                        boxes = result.boxes
-                        for box in boxes:
-                            cls_id = int(box.cls.item())
-                            score = box.conf.item()
-                            label = model.names[cls_id]
-                            detection_found = True
-
-                            # 检测连续相同的 cls_id
-                            if cls_id == last_cls_id:
-                                frame_count += 1
-                            else:
-                                last_cls_id = cls_id
-                                frame_count = 1
-                            # 如果连续帧数超过阈值，发送消息
-                            if frame_count >= threshold:
-                                send_message(cls_id, score, label)
-                                frame_count = 0  # 重置计数器
-                                # 重置运动检测状态
-                                motion_detected = False
-                                detection_conf = 0.8  # 恢复原始置信度
-                                detection_state = "NORMAL"
-                    
-                    # 在帧上显示当前状态
-                    status_text = f"状态: {detection_state} | 置信度: {detection_conf}"
-                    if motion_detected:
-                        elapsed = time.time() - motion_start_time
-                        status_text += f" | 已检测 {elapsed:.1f}秒"
-                    cv2.putText(frame, status_text, (10, 30), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-            
-            except Exception as e:
-                print(f"预测过程中发生错误: {e}")
+def emit_frame_detections(station, camera_id, seq, frame, detections):
+    """浏览器绘制叠加层：只向订阅了该摄像头检测数据的客户端推送该帧的检测结果"""
+    if not detection_subscribers.get(camera_id):
+        return
+    outbox.emit('frame_detections', {
+        'camera_id': camera_id,
+        'seq': seq,
+        'width': frame.shape[1],
+        'height': frame.shape[0],
+        'state': station.detection_state,
+        'conf': station.detection_conf,
+        'motion': station.motion_detected,
+        'idle': station.motion_gate.is_idle(),
+        'elapsed': round(station.elapsed(), 1),
+        'detections': [
+            {'cls_id': cls_id, 'label': backend.names[cls_id], 'score': round(score, 3),
+             'box': [round(float(v), 1) for v in box]}
+            for cls_id, score, box in detections
+        ],
+    }, to=detection_room(camera_id))
+
+def process_frame(frame, camera_id=0, overlays=('server',), seq=0):
+    """
+    对一帧执行运动检测和推理，按观看者需要的叠加层模式准备画面。
+
+    参数:
+        frame: 摄像头画面
+        camera_id: 摄像头ID，用于找到对应的站点
+        overlays: 当前有观看者的叠加层模式集合
+        seq: 该帧的帧序号，与视频帧中的序号一致，浏览器据此把检测框与画面对应
+
+    返回:
+        FramePacket: 未绘制 (raw) 和已绘制 (annotated) 的画面，由观看者按需编码；没有对应站点时为 None
+    """
+    station = stations.for_camera(camera_id)
+    if station is None:
+        if not overlays:
+            # 站点已删除或改用其他摄像头，流程在宽限期后停止
+            return None
+        station = add_camera_station(camera_id)
+
+    # 确保帧的尺寸是640x480
+    frame = cv2.resize(frame, (640, 480))
+    FRAMES.inc(camera_id)
+
+    if backend is None:
+        # 模型仍在后台加载，先推送画面
+        raw = frame.copy() if 'client' in overlays else None
+        if 'server' in overlays:
+            cv2.putText(frame, "状态: LOADING", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        publish_telemetry(station, Detections(), 'LOADING')
+        return FramePacket(raw, frame if 'server' in overlays else None)
+    
+    # 运动检测：每帧都更新背景模型，否则运动期间背景停止更新，光照变化后会反复触发；
+    # 已处于运动状态时只更新占比和运动区域，不重新计时
+    start = time.perf_counter()
+    detect_motion(station, frame)
+    MOTION_SECONDS.observe(time.perf_counter() - start)
+    
+    # 如果检测到运动，根据时间动态调整置信度和状态
+    if station.motion_detected:
+        elapsed_time = station.elapsed()
+        
+        # 状态转换逻辑
+        if station.detection_state == "NORMAL" and elapsed_time >= station.reduce_after:
+            station.detection_state = "REDUCED_CONF"
+            station.detection_conf = station.reduced_conf
+            print(f"{station.name} 已经过{station.reduce_after:g}秒未识别，降低置信度到: {station.detection_conf}")
+        elif station.detection_state == "REDUCED_CONF" and elapsed_time >= station.timeout_after:
+            station.detection_state = "TIMEOUT"
+            print(f"{station.name} 已经过{station.timeout_after:g}秒未识别，将使用默认分类")
+    
+    # 画面与缓存项一致且状态相同时，复用上次的检测结果和画面
+    cache = station.scene_cache if station.detection_state != "TIMEOUT" else None
+    cached = signature = None
+    if cache is not None:
+        signature = frame_signature(frame)
+        # 状态栏显示的内容不同时画面也不同，秒数取整使缓存每秒至少刷新一次
+        context = (station.detection_state, station.detection_conf, station.motion_detected,
+                   int(station.elapsed()), station.motion_gate.is_idle(), frozenset(overlays))
+        cached = cache.lookup(signature, context)
+        SCENE_CACHE_LOOKUPS.inc('hit' if cached is not None else 'miss')
 
-            # 将帧编码为 JPEG 格式
-            ret, buffer = cv2.imencode('.jpg', frame)
-            frame = buffer.tobytes()
+    # 根据当前状态进行检测
+    detections = Detections()
+    inferred = decided = False
+    try:
+        if station.detection_state == "TIMEOUT":
+            # 超时状态：使用默认分类
+            default_cls_id = station.default_cls
+            default_label = backend.names[default_cls_id]
+            TIMEOUT_FALLBACKS.inc()
+            send_message(station, default_cls_id, 0.5, default_label)
+            get_voter(station).reset()
+            station.tracker.invalidate()
+            # 重置状态
+            station.reset()
+        elif cached is not None:
+            # 命中缓存：不推理，缓存项来自被门控跳过的帧时同样跳过投票
+            if cached.detections is not None:
+                detections = cached.detections
+                inferred = True
+            # 跳过的帧没有经过跟踪器，恢复推理时重新检测
+            station.tracker.invalidate()
+        # 运动门控：投放口空闲时跳过推理
+        elif station.motion_gate.should_infer(station.motion_detected):
+            # 使用当前置信度进行检测
+            inferences = station.tracker.inferences
+            # 启用跳帧时，中间帧的检测框由光流跟踪得到
+            detections = station.tracker(frame, station.detection_conf)
+            if station.tracker.inferences == inferences:
+                TRACKED_FRAMES.inc()
+            inferred = True
+        else:
+            # 被门控跳过的帧没有经过跟踪器，上一次的检测框可能已过时，恢复推理时重新检测
+            station.tracker.invalidate()
 
-            # 生成 MJPEG 流
-            yield (b'--frame\r\n'
-                b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+        if inferred:
+            for cls_id, _, _ in detections:
+                DETECTIONS.inc(backend.names[cls_id])
 
+            # 跨帧累积置信度，某个类别占据主导时发送消息
+            decision = get_voter(station).update(detections)
+            if decision is not None:
+                cls_id, score = decision
+                send_message(station, cls_id, score, backend.names[cls_id])
+                station.tracker.invalidate()
+                # 重置运动检测状态，恢复原始置信度
+                station.reset()
+                decided = True
+            
     except Exception as e:
-        print(f"视频流处理过程中发生错误: {e}")
-    finally:
-        # 确保释放摄像头资源
-        if video_cap is not None and video_cap.isOpened():
-            video_cap.release()
-            print(f"摄像头 {camera_id} 资源已释放")
+        print(f"{station.name} 预测过程中发生错误: {e}")
+
+    if cache is not None and decided:
+        # 状态已重置，旧画面不再适用
+        cache.clear()
+    elif cached is not None:
+        # 画面和状态都没有变化，已编码的JPEG也一并复用，检测结果照常推送给浏览器绘制的客户端
+        if 'client' in overlays:
+            emit_frame_detections(station, camera_id, seq, frame, detections)
+        publish_telemetry(station, detections)
+        return cached.packet
+
+    # 当前状态
+    elapsed = station.elapsed()
+    idle = station.motion_gate.is_idle()
+    raw = annotated = None
+
+    if 'client' in overlays:
+        # 浏览器绘制叠加层，画面不做任何绘制
+        emit_frame_detections(station, camera_id, seq, frame, detections)
+        # 两种模式都有观看者时，保留一份未绘制的副本
+        raw = frame.copy() if 'server' in overlays else frame
+
+    if 'server' in overlays:
+        start = time.perf_counter()
+        # 绘制检测结果到帧上
+        detections.draw(frame, backend.names)
+        # 在帧上显示当前状态
+        status_text = f"状态: {station.detection_state} | 置信度: {station.detection_conf}"
+        if station.motion_detected:
+            status_text += f" | 已检测 {elapsed:.1f}秒"
+        elif idle:
+            status_text += " | 空闲"
+        cv2.putText(frame, status_text, (10, 30), 
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        annotated = frame
+        DRAWING_SECONDS.observe(time.perf_counter() - start)
+
+    packet = FramePacket(raw, annotated)
+    if cache is not None and not decided:
+        cache.store(signature, context, detections if inferred else None, packet)
+    publish_telemetry(station, detections)
+    return packet
+
+# 每个摄像头只运行一个检测流程，所有观看者共享其结果
+def pipeline_stopped(camera_id):
+    # 摄像头不再检测时释放其固定的工作进程，重新开始时再按负载分配
+    if worker_pool is not None:
+        worker_pool.release(camera_id)
+
+pipelines = PipelineRegistry(process_frame, grace_period=5.0, sleep=cooperative_sleep, on_stop=pipeline_stopped)
+metrics.gauge('trash_active_streams', '正在观看的视频流数 (MJPEG 和 WebSocket)',
+              lambda: sum(p.subscribers for p in pipelines.pipelines()))
+metrics.gauge('trash_active_pipelines', '正在运行的摄像头检测流程数', lambda: len(pipelines.pipelines()))
+
+def start_station(station):
+    """没有观看者时也持续检测该站点的摄像头"""
+    if not station.running:
+        station.pipeline = pipelines.hold(station.camera)
+        print(f"站点 {station.name} 开始检测摄像头 {station.camera}")
+
+def stop_station(station):
+    """取消保持，仍有观看者时流程继续运行，否则在宽限期后停止"""
+    pipeline, station.pipeline = station.pipeline, None
+    if pipeline is not None:
+        pipeline.release()
+        print(f"站点 {station.name} 停止检测")
+
+def generate_frames(camera_id, overlay='server', quality='auto'):
+    for _, frame in pipelines.subscribe(camera_id, overlay, quality):
+        # 生成 MJPEG 流
+        yield (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
 
 @app.route('/video_feed')
 def video_feed():
     # 从请求参数中获取摄像头 ID，默认为 0
     camera_id = request.args.get('camera', default=0, type=int)
-    return Response(generate_frames(camera_id),
+    # overlay=client 时返回未绘制的画面，检测框由浏览器根据 frame_detections 事件绘制
+    overlay = request.args.get('overlay', default='server')
+    if overlay not in OVERLAY_MODES:
+        overlay = 'server'
+    # quality=auto 时根据客户端的消费速度自适应调整画质和分辨率，也可指定 high/medium/low
+    quality = request.args.get('quality', default='auto')
+    return Response(generate_frames(camera_id, overlay, quality),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/stats')
+def stats():
+    # 返回各摄像头检测流程的观看人数、处理帧率、丢帧数和帧延迟
+    rss = current_rss_mb()
+    return {
+        'pipelines': pipelines.stats(),
+        'encoder': pipelines.encoder.stats(),
+        'scheduler': scheduler.stats() if scheduler is not None else None,
+        'workers': worker_pool.stats() if worker_pool is not None else None,
+        'stations': stations.stats(),
+        'outbox': outbox.stats(),
+        'telemetry': telemetry.stats(),
+        'process': {'async_mode': async_mode, 'threads': threading.active_count(),
+                    'rss_mb': round(rss, 1) if rss is not None else None}
+    }
+
+def station_changes():
+    changes = request.get_json(silent=True)
+    if not isinstance(changes, dict):
+        raise ValueError("请求体应为JSON对象")
+    return changes
+
+@app.route('/api/stations', methods=['GET', 'POST'])
+def station_list():
+    # 列出所有站点，或按JSON请求体新增一个站点
+    if request.method == 'GET':
+        return {'stations': stations.stats()}
+    try:
+        station = stations.add(station_changes())
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    if station.autostart:
+        start_station(station)
+    return station.stats(), 201
+
+@app.route('/api/stations/<name>', methods=['GET', 'PUT', 'PATCH', 'DELETE'])
+def station_detail(name):
+    # 查看、修改或删除站点；修改只需提供要改的字段，阈值和冷却时间立即生效
+    station = stations.get(name)
+    if station is None:
+        return {'error': f"站点 {name} 不存在"}, 404
+    if request.method == 'DELETE':
+        stations.remove(name)
+        return {'removed': name}
+    if request.method != 'GET':
+        try:
+            station = stations.update(name, station_changes())
+        except ValueError as e:
+            return {'error': str(e)}, 400
+    return station.stats()
+
+@app.route('/api/stations/<name>/<action>', methods=['POST'])
+def station_action(name, action):
+    # start: 没有观看者时也持续检测；stop: 取消
+    station = stations.get(name)
+    if station is None:
+        return {'error': f"站点 {name} 不存在"}, 404
+    if action == 'start':
+        start_station(station)
+    elif action == 'stop':
+        stop_station(station)
+    else:
+        return {'error': f"未知操作: {action}"}, 400
+    return station.stats()
+
+@app.route('/healthz')
+def healthz():
+    # 进程存活即返回 200，不依赖模型和串口
+    return {'status': 'ok', 'uptime_s': health.report()['uptime_s']}
+
+@app.route('/readyz')
+def readyz():
+    # 模型加载、预热完成后才就绪；同时报告各组件状态和启动耗时
+    report = health.report()
+    return report, 200 if report['ready'] else 503
+
+@app.route('/metrics')
+def prometheus_metrics():
+    # Prometheus 文本格式的指标
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 # 修改视频文件访问路由以支持跨源请求和正确的MIME类型
 @app.route('/videos/<path:filename>')
 def serve_video(filename):
@@ -263,17 +580,181 @@ def serve(path):
 # 添加WebSocket事件处理
 @socketio.on('connect')
 def handle_connect():
+    SOCKET_CLIENTS.inc()
     print('客户端已连接')
 
 @socketio.on('disconnect')
 def handle_disconnect():
+    SOCKET_CLIENTS.dec()
+    stop_video_stream(request.sid)
+    telemetry.unsubscribe(request.sid)
+    unsubscribe_detections(request.sid)
     print('客户端已断开连接')
 
+# 浏览器绘制叠加层的客户端按摄像头分房间接收 frame_detections，camera_id -> sid 集合
+detection_subscribers = {}
+
+def detection_room(camera_id):
+    return f'detections:{camera_id}'
+
+def unsubscribe_detections(sid, camera_id=None):
+    for camera in list(detection_subscribers) if camera_id is None else [camera_id]:
+        sids = detection_subscribers.get(camera)
+        if sids is not None and sid in sids:
+            sids.discard(sid)
+            leave_room(detection_room(camera), sid=sid)
+            if not sids:
+                detection_subscribers.pop(camera, None)
+
+@socketio.on('subscribe_detections')
+def handle_subscribe_detections(data=None):
+    camera_id = int((data or {}).get('camera', 0))
+    join_room(detection_room(camera_id))
+    detection_subscribers.setdefault(camera_id, set()).add(request.sid)
+
+@socketio.on('unsubscribe_detections')
+def handle_unsubscribe_detections(data=None):
+    camera_id = (data or {}).get('camera')
+    unsubscribe_detections(request.sid, int(camera_id) if camera_id is not None else None)
+
+# 通过 Socket.IO 接收二进制视频帧的客户端，sid -> 停止事件
+video_streams = {}
+VIDEO_ACK_TIMEOUT = 2.0  # 等待客户端确认的最长秒数
+
+def stream_video(sid, camera_id, overlay, quality, stop):
+    """通过 Socket.IO 向单个客户端推送二进制视频帧，收到客户端确认后才发送下一帧"""
+    frames = pipelines.subscribe(camera_id, overlay, quality)
+    try:
+        for seq, jpeg in frames:
+            if stop.is_set():
+                break
+            acked = threading.Event()
+            socketio.emit('video_frame', pack_video_frame(seq, camera_id, jpeg),
+                          to=sid, callback=lambda *args: acked.set())
+            # 慢速客户端确认得慢，期间产生的帧被直接跳过，不会在连接中积压
+            if not wait_event(acked, VIDEO_ACK_TIMEOUT, cooperative_sleep):
+                print(f"客户端 {sid} 未确认视频帧 {seq}")
+    finally:
+        frames.close()
+        if video_streams.get(sid) is stop:
+            del video_streams[sid]
+
+def stop_video_stream(sid):
+    stop = video_streams.pop(sid, None)
+    if stop is not None:
+        stop.set()
+
+@socketio.on('subscribe_video')
+def handle_subscribe_video(data=None):
+    # 每个客户端同时只订阅一路视频
+    data = data or {}
+    sid = request.sid
+    stop_video_stream(sid)
+
+    camera_id = int(data.get('camera', 0))
+    overlay = data.get('overlay', 'server')
+    if overlay not in OVERLAY_MODES:
+        overlay = 'server'
+    quality = data.get('quality', 'auto')
+
+    stop = threading.Event()
+    video_streams[sid] = stop
+    socketio.start_background_task(stream_video, sid, camera_id, overlay, quality, stop)
+
+@socketio.on('unsubscribe_video')
+def handle_unsubscribe_video():
+    stop_video_stream(request.sid)
+
+@socketio.on('subscribe_telemetry')
+def handle_subscribe_telemetry(data=None):
+    # 加入摄像头的遥测房间，max_rate 为客户端希望每秒最多收到的更新数，不能超过服务端上限
+    data = data or {}
+    try:
+        max_rate = float(data.get('max_rate') or 0) or None
+    except (TypeError, ValueError):
+        max_rate = None
+    telemetry.subscribe(request.sid, int(data.get('camera', 0)), max_rate)
+    # 二进制消息中只有类别ID，通过确认回复告诉客户端类别名称，模型未加载时为空
+    return {'names': [backend.names[i] for i in sorted(backend.names)] if backend is not None else []}
+
+@socketio.on('unsubscribe_telemetry')
+def handle_unsubscribe_telemetry(data=None):
+    camera_id = (data or {}).get('camera')
+    telemetry.unsubscribe(request.sid, int(camera_id) if camera_id is not None else None)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='垃圾检测 Flask 后端')
     parser.add_argument('--port', type=int, default=5000, help='Flask 端口 (默认: 5000)')
+    parser.add_argument('--serial-port', default='COM3',
+                        help='未指定 --stations 时默认站点的 Arduino 串口号 (默认: COM3)')
+    parser.add_argument('--stations', help='站点配置文件(JSON)，通过 /api/stations 修改后写回该文件')
+    parser.add_argument('--ack-timeout', type=float, default=7.0, help='等待Arduino确认的最长秒数 (默认: 7)')
+    parser.add_argument('--motion-gate', action='store_true', help='仅在检测到运动时运行推理')
+    parser.add_argument('--motion-engine', default='background', choices=MOTION_ENGINES,
+                        help='运动检测引擎：background 背景模型，diff 相邻帧差 (默认: background)')
+    parser.add_argument('--motion-learning-rate', type=float, default=0.02,
+                        help='背景模型的更新速率 (默认: 0.02)')
+    parser.add_argument('--motion-tail', type=float, default=3.0, help='运动结束后继续推理的秒数 (默认: 3)')
+    parser.add_argument('--keepalive-interval', type=float, default=5.0,
+                        help='空闲时保活推理的间隔秒数，0 表示空闲时不推理 (默认: 5)')
+    parser.add_argument('--roi', action='store_true', help='只把运动区域裁剪后送入模型推理')
+    parser.add_argument('--backend', default='torch', choices=BACKENDS, help='推理后端 (默认: torch)')
+    parser.add_argument('--warmup', type=int, default=2, help='启动时预热推理次数 (默认: 2)')
+    parser.add_argument('--batch', action='store_true', help='多摄像头共享模型批量推理')
+    parser.add_argument('--max-batch', type=int, default=4, help='批量推理单批最大帧数 (默认: 4)')
+    parser.add_argument('--max-wait-ms', type=float, default=20, help='批量推理等待其他摄像头的最长毫秒数 (默认: 20)')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='推理工作进程数，画面经共享内存传给工作进程 (默认: 0，在本进程推理)')
+    parser.add_argument('--worker-mode', default='camera', choices=WORKER_MODES,
+                        help='camera 每个摄像头固定一个工作进程；pool 每帧交给最空闲的进程 (默认: camera)')
+    add_voter_arguments(parser)
+    parser.add_argument('--detect-stride', type=int, default=1,
+                        help='每隔多少帧运行一次检测，中间帧用光流跟踪 (默认: 1，每帧检测)')
+    parser.add_argument('--track-min-quality', type=float, default=0.5,
+                        help='跟踪质量低于该值时立即重新检测 (默认: 0.5)')
+    parser.add_argument('--scene-cache', action='store_true', help='画面未变化时复用上一次的检测结果和画面')
+    parser.add_argument('--scene-tolerance', type=float, default=3.0,
+                        help='缩小画面的平均像素差在该值以内视为未变化 (默认: 3)')
+    parser.add_argument('--scene-ttl', type=float, default=2.0, help='缓存结果的有效秒数，过期后强制重新推理 (默认: 2)')
+    parser.add_argument('--scene-cache-size', type=int, default=8, help='每个摄像头缓存的画面数 (默认: 8)')
+    parser.add_argument('--async-mode', default='threading', choices=ASYNC_MODES,
+                        help='服务模式：threading 每个连接一个线程；eventlet 协作式I/O，适合大量观看者 (默认: threading)')
+    parser.add_argument('--telemetry-rate', type=float, default=5.0,
+                        help='每个客户端每秒最多收到的逐帧状态更新数 (默认: 5)')
+    parser.add_argument('--debug', action='store_true', help='Flask 调试模式，启用自动重载（会把模型加载两次）')
     args = parser.parse_args()
+    if args.batch and args.workers > 0:
+        parser.error('--batch 与 --workers 不能同时使用')
+
+    motion_params.update(engine=args.motion_engine, learning_rate=args.motion_learning_rate)
+    motion_gate_params.update(enabled=args.motion_gate, tail=args.motion_tail,
+                              keepalive_interval=args.keepalive_interval)
+    ack_timeout = args.ack_timeout
+    roi_inference = args.roi
+    detect_stride = args.detect_stride
+    track_min_quality = args.track_min_quality
+    scene_cache_enabled = args.scene_cache
+    scene_cache_params.update(size=args.scene_cache_size, tolerance=args.scene_tolerance, ttl=args.scene_ttl)
+    voter_params = {'decay': args.vote_decay, 'fire_mass': args.vote_mass, 'dominance': args.vote_dominance}
+    # 串口和模型都在后台初始化，服务立即开始监听
+    if args.stations:
+        stations.load(args.stations)
+    else:
+        stations.add({'name': 'bin-0', 'camera': 0, 'serial_port': args.serial_port}, save=False)
+    for station in stations.stations():
+        if station.autostart:
+            start_station(station)
+    threading.Thread(target=initialize_backend, name='model-loader', daemon=True,
+                     args=(args.backend, args.warmup, args.batch, args.max_batch, args.max_wait_ms / 1000,
+                           args.workers, args.worker_mode)).start()
     
-    # 使用threading模式运行
-    print("使用threading模式启动服务器...")
-    socketio.run(app, host='0.0.0.0', port=args.port, debug=True, allow_unsafe_werkzeug=True)
\ No newline at end of file
+    outbox.start()
+    telemetry.max_rate = args.telemetry_rate
+    socketio.start_background_task(telemetry.run, socketio.sleep)
+    print(f"使用{async_mode}模式启动服务器...")
+    health.mark('server_start')
+    if async_mode == 'eventlet':
+        socketio.run(app, host='0.0.0.0', port=args.port, debug=args.debug, use_reloader=args.debug)
+    else:
+        socketio.run(app, host='0.0.0.0', port=args.port, debug=args.debug, use_reloader=args.debug,
+                     allow_unsafe_werkzeug=True)
\ No newline at end of file
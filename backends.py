@@ -0,0 +1,243 @@
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+
+from detections import Detections
+
+DEFAULT_WEIGHTS = "models/trashcan.pt"
+
+# 后端名称 -> ultralytics 导出格式
+EXPORT_FORMATS = {
+    'torch': None,
+    'onnx': 'onnx',
+    'openvino': 'openvino',
+    # INT8 模型需要用录像帧校准，由 quantize.py 生成
+    'onnx-int8': None,
+}
+BACKENDS = tuple(EXPORT_FORMATS)
+
+
+def artifact_path(weights, backend):
+    """返回指定后端的导出模型路径（与 ultralytics 导出时的命名一致）"""
+    stem, _ = os.path.splitext(weights)
+    if backend == 'onnx':
+        return f"{stem}.onnx"
+    if backend == 'onnx-int8':
+        return f"{stem}_int8.onnx"
+    if backend == 'openvino':
+        return f"{stem}_openvino_model"
+    return weights
+
+
+def export_model(weights, backend, imgsz=640):
+    """
+    把 PyTorch 模型导出为指定后端格式。导出结果缓存在模型旁边，
+    只有原始权重比缓存新时才重新导出。
+
+    返回:
+        str: 导出模型的路径
+    """
+    path = artifact_path(weights, backend)
+    if backend == 'onnx-int8':
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"找不到INT8模型 {path}，请先运行 python quantize.py")
+        return path
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(weights):
+        return path
+
+    from ultralytics import YOLO
+
+    print(f"正在导出 {backend} 模型: {weights} -> {path}")
+    # 动态输入尺寸，以支持裁剪推理和批量推理
+    exported = YOLO(weights).export(format=EXPORT_FORMATS[backend], imgsz=imgsz, dynamic=True)
+    return str(exported)
+
+
+class InferenceBackend:
+    """
+    推理后端，统一 PyTorch / ONNX Runtime / OpenVINO 的调用方式，输出 Detections。
+
+    参数:
+        name: 后端名称，见 BACKENDS
+        weights: PyTorch 权重路径，其他后端从它导出
+        imgsz: 默认输入尺寸
+    """
+
+    def __init__(self, name='torch', weights=DEFAULT_WEIGHTS, imgsz=640):
+        if name not in EXPORT_FORMATS:
+            raise ValueError(f"未知的推理后端: {name}，可选: {', '.join(BACKENDS)}")
+        self.name = name
+        self.weights = weights
+        self.imgsz = imgsz
+        self.model = None
+        self.load_time = 0.0
+        self.warmup_time = 0.0
+        # ultralytics 在 Model.predict 中先修改共享的 predictor.args 再加锁，
+        # 多个站点的检测线程同时推理时会用到彼此的 conf 和 imgsz，因此整个调用串行执行
+        self._lock = threading.Lock()
+
+    def load(self):
+        from ultralytics import YOLO
+
+        start = time.time()
+        path = self.weights if self.name == 'torch' else export_model(self.weights, self.name, self.imgsz)
+        self.model = YOLO(path, task='detect')
+        self.load_time = time.time() - start
+        print(f"已加载 {self.name} 推理后端: {path} ({self.load_time:.2f}秒)")
+        return self
+
+    @property
+    def names(self):
+        return self.model.names
+
+    def warmup(self, runs=2, imgsz=None):
+        """用空白帧预热，让首帧推理不再承担初始化开销"""
+        imgsz = imgsz or self.imgsz
+        frame = np.zeros((imgsz * 3 // 4, imgsz, 3), np.uint8)
+        start = time.time()
+        for _ in range(runs):
+            self.predict([frame], conf=0.25)
+        self.warmup_time = time.time() - start
+        return self
+
+    def predict(self, frames, conf, imgsz=None, offsets=None):
+        """
+        批量推理。
+
+        参数:
+            frames: 图像列表
+            conf: 置信度阈值
+            imgsz: 输入尺寸，None 表示使用默认值
+            offsets: 每帧检测框需要平移的 (x, y) 列表
+
+        返回:
+            list: 每帧一个 Detections
+        """
+        kwargs = {'conf': conf, 'imgsz': imgsz or self.imgsz, 'verbose': False}
+        with self._lock:
+            results = self.model.predict(frames, **kwargs)
+        if offsets is None:
+            offsets = [(0, 0)] * len(frames)
+        return [Detections.from_result(r, offset=o) for r, o in zip(results, offsets)]
+
+    def predict_one(self, frame, conf, imgsz=None, offset=(0, 0)):
+        """单帧推理"""
+        return self.predict([frame], conf, imgsz, [offset])[0]
+
+
+def create_backend(name='torch', weights=DEFAULT_WEIGHTS, imgsz=640, warmup=2):
+    """创建、加载并预热推理后端"""
+    backend = InferenceBackend(name, weights, imgsz).load()
+    if warmup > 0:
+        backend.warmup(warmup)
+        print(f"{name} 推理后端预热完成 ({backend.warmup_time:.2f}秒)")
+    return backend
+
+
+def sample_frames(video_path, count, size=(640, 480)):
+    """从视频中均匀抽取若干帧，没有视频时生成随机帧"""
+    import cv2
+
+    frames = []
+    if video_path:
+        cap = cv2.VideoCapture(video_path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or count
+        step = max(total // count, 1)
+        index = 0
+        while len(frames) < count:
+            success, frame = cap.read()
+            if not success:
+                break
+            if index % step == 0:
+                frames.append(cv2.resize(frame, size))
+            index += 1
+        cap.release()
+    rng = np.random.default_rng(0)
+    while len(frames) < count:
+        frames.append(rng.integers(0, 255, (size[1], size[0], 3), np.uint8))
+    return frames
+
+
+def compare_backends(names, weights, frames, conf=0.25, imgsz=640, warmup=3):
+    """
+    对比各后端的单帧推理延迟，并以第一个后端为基准检查输出是否一致。
+
+    返回:
+        list: 每个后端一条结果字典
+    """
+    reports = []
+    reference = None
+    for name in names:
+        backend = create_backend(name, weights, imgsz, warmup)
+        latencies = []
+        outputs = []
+        for frame in frames:
+            start = time.perf_counter()
+            outputs.append(backend.predict_one(frame, conf))
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        report = {
+            'backend': name,
+            'load_s': round(backend.load_time, 2),
+            'warmup_s': round(backend.warmup_time, 2),
+            'mean_ms': round(float(np.mean(latencies)), 2),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+            'p95_ms': round(float(np.percentile(latencies, 95)), 2),
+        }
+        if reference is None:
+            reference = outputs
+        else:
+            report.update(compare_outputs(reference, outputs))
+        reports.append(report)
+    return reports
+
+
+def compare_outputs(reference, outputs):
+    """比较两组检测结果：类别一致的帧比例和最大框坐标偏差"""
+    same_classes = 0
+    max_box_diff = 0.0
+    max_score_diff = 0.0
+    for ref, out in zip(reference, outputs):
+        if len(ref) != len(out):
+            continue
+        ref_order = np.lexsort((ref.boxes[:, 0], ref.classes))
+        out_order = np.lexsort((out.boxes[:, 0], out.classes))
+        if not np.array_equal(ref.classes[ref_order], out.classes[out_order]):
+            continue
+        same_classes += 1
+        if len(ref):
+            max_box_diff = max(max_box_diff, float(np.abs(ref.boxes[ref_order] - out.boxes[out_order]).max()))
+            max_score_diff = max(max_score_diff, float(np.abs(ref.scores[ref_order] - out.scores[out_order]).max()))
+    return {
+        'same_classes': f"{same_classes}/{len(reference)}",
+        'max_box_diff_px': round(max_box_diff, 2),
+        'max_score_diff': round(max_score_diff, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='推理后端导出与延迟对比')
+    parser.add_argument('--backends', nargs='+', default=['torch', 'onnx', 'openvino'], choices=BACKENDS,
+                        help='要对比的后端，第一个作为输出一致性基准 (默认: torch onnx openvino)')
+    parser.add_argument('--weights', default=DEFAULT_WEIGHTS, help=f'PyTorch 权重路径 (默认: {DEFAULT_WEIGHTS})')
+    parser.add_argument('--video', help='用于取样的视频文件，不指定时使用随机帧')
+    parser.add_argument('--frames', type=int, default=50, help='测试帧数 (默认: 50)')
+    parser.add_argument('--conf', type=float, default=0.25, help='置信度阈值 (默认: 0.25)')
+    parser.add_argument('--imgsz', type=int, default=640, help='输入尺寸 (默认: 640)')
+    args = parser.parse_args()
+
+    frames = sample_frames(args.video, args.frames)
+    reports = compare_backends(args.backends, args.weights, frames, args.conf, args.imgsz)
+
+    print(f"\n{'后端':<10}{'加载(s)':>10}{'平均(ms)':>10}{'P50(ms)':>10}{'P95(ms)':>10}  输出一致性")
+    for r in reports:
+        consistency = '基准' if 'same_classes' not in r else \
+            f"类别一致 {r['same_classes']}, 框偏差 {r['max_box_diff_px']}px, 分数偏差 {r['max_score_diff']}"
+        print(f"{r['backend']:<10}{r['load_s']:>10}{r['mean_ms']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}  {consistency}")
+
+
+if __name__ == "__main__":
+    main()
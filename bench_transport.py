@@ -0,0 +1,208 @@
+import argparse
+import os
+import tempfile
+
+import cv2
+import numpy as np
+from socketio import packet
+
+from encoding import QUALITY_TIERS, pack_video_frame
+
+# MJPEG 流每帧的分隔头和结尾，与 app.generate_frames 一致
+MJPEG_PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+MJPEG_PART_TRAILER = b'\r\n'
+
+
+def read_frames(video_path, count, size=(640, 480)):
+    """读取连续的若干帧，没有视频时生成带运动物体和噪声的合成画面"""
+    frames = []
+    if video_path:
+        cap = cv2.VideoCapture(video_path)
+        while len(frames) < count:
+            success, frame = cap.read()
+            if not success:
+                break
+            frames.append(cv2.resize(frame, size))
+        cap.release()
+    if frames:
+        return frames
+
+    rng = np.random.default_rng(0)
+    background = cv2.GaussianBlur(rng.integers(0, 255, (size[1], size[0], 3), np.uint8), (31, 31), 0)
+    for i in range(count):
+        frame = background.copy()
+        x = 40 + (i * 7) % (size[0] - 160)
+        cv2.rectangle(frame, (x, 180), (x + 120, 300), (40, 160, 220), -1)
+        cv2.putText(frame, f'Frame {i + 1}', (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        noise = rng.normal(0, 3, frame.shape)
+        frames.append(np.clip(frame + noise, 0, 255).astype(np.uint8))
+    return frames
+
+
+def psnr(a, b):
+    mse = np.mean((a.astype(np.float64) - b.astype(np.float64)) ** 2)
+    return 99.0 if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+
+
+def encode_jpeg(frames, quality):
+    """返回 (每帧JPEG字节列表, 平均PSNR)"""
+    jpegs = []
+    scores = []
+    for frame in frames:
+        ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        jpegs.append(buffer.tobytes())
+        scores.append(psnr(frame, cv2.imdecode(buffer, cv2.IMREAD_COLOR)))
+    return jpegs, float(np.mean(scores))
+
+
+def websocket_frame_size(payload_len, masked=False):
+    """WebSocket 帧头长度加负载长度，客户端发往服务端的帧带4字节掩码"""
+    if payload_len < 126:
+        header = 2
+    elif payload_len < 65536:
+        header = 4
+    else:
+        header = 10
+    return header + (4 if masked else 0) + payload_len
+
+
+def mjpeg_bytes(jpeg):
+    return len(MJPEG_PART_HEADER) + len(jpeg) + len(MJPEG_PART_TRAILER)
+
+
+def socketio_bytes(jpeg, seq, camera_id=0):
+    """
+    Socket.IO 二进制视频帧在 WebSocket 上的实际字节数：
+    占位事件文本帧 + 二进制附件帧，加上浏览器回传的确认帧。
+    """
+    payload = pack_video_frame(seq, camera_id, jpeg)
+    text, attachment = packet.Packet(packet.EVENT, data=['video_frame', payload], id=seq).encode()
+    # Engine.IO 消息类型前缀 '4'，二进制消息在 WebSocket 上不加前缀
+    sent = websocket_frame_size(len(text) + 1) + websocket_frame_size(len(attachment))
+    ack = packet.Packet(packet.ACK, data=[seq], id=seq).encode()
+    received = websocket_frame_size(len(ack) + 1, masked=True)
+    return sent, received
+
+
+def encode_video(frames, codec, fps=30):
+    """
+    用 cv2.VideoWriter 编码为视频文件，返回 (每帧平均字节数, 平均PSNR)，编码器不可用时返回 None。
+    """
+    height, width = frames[0].shape[:2]
+    fd, path = tempfile.mkstemp(suffix='.mp4')
+    os.close(fd)
+    try:
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, (width, height))
+        if not writer.isOpened():
+            return None
+        for frame in frames:
+            writer.write(frame)
+        writer.release()
+
+        cap = cv2.VideoCapture(path)
+        scores = []
+        for frame in frames:
+            success, decoded = cap.read()
+            if not success:
+                break
+            scores.append(psnr(frame, decoded))
+        cap.release()
+        if not scores:
+            return None
+        return os.path.getsize(path) / len(frames), float(np.mean(scores))
+    finally:
+        os.remove(path)
+
+
+def matching_jpeg_quality(frames, target_psnr):
+    """找出平均PSNR不低于目标值的最低JPEG质量"""
+    low, high = 10, 95
+    while low < high:
+        mid = (low + high) // 2
+        if encode_jpeg(frames, mid)[1] >= target_psnr:
+            high = mid
+        else:
+            low = mid + 1
+    return low
+
+
+def compare(frames, qualities, codecs, fps=30):
+    """
+    对比同一JPEG质量下 MJPEG 与 Socket.IO 的传输字节数，
+    以及相同画质 (PSNR) 下JPEG逐帧传输与视频编码的字节数。
+    """
+    transport = []
+    for quality in qualities:
+        jpegs, score = encode_jpeg(frames, quality)
+        jpeg_total = sum(len(j) for j in jpegs)
+        mjpeg_total = sum(mjpeg_bytes(j) for j in jpegs)
+        sent_total = received_total = 0
+        for seq, jpeg in enumerate(jpegs, 1):
+            sent, received = socketio_bytes(jpeg, seq)
+            sent_total += sent
+            received_total += received
+        n = len(jpegs)
+        transport.append({
+            'quality': quality,
+            'psnr': round(score, 2),
+            'jpeg_kb': round(jpeg_total / n / 1024, 2),
+            'mjpeg_kb': round(mjpeg_total / n / 1024, 2),
+            'socketio_kb': round(sent_total / n / 1024, 2),
+            'ack_bytes': round(received_total / n, 1),
+            'mjpeg_kbps': round(mjpeg_total / n * fps * 8 / 1000, 1),
+            'socketio_kbps': round(sent_total / n * fps * 8 / 1000, 1),
+        })
+
+    video = []
+    for codec in codecs:
+        result = encode_video(frames, codec, fps)
+        if result is None:
+            print(f"编码器 {codec} 不可用，跳过")
+            continue
+        frame_bytes, score = result
+        quality = matching_jpeg_quality(frames, score)
+        jpegs, jpeg_score = encode_jpeg(frames, quality)
+        jpeg_bytes = sum(len(j) for j in jpegs) / len(jpegs)
+        video.append({
+            'codec': codec,
+            'psnr': round(score, 2),
+            'video_kb': round(frame_bytes / 1024, 2),
+            'jpeg_quality': quality,
+            'jpeg_psnr': round(jpeg_score, 2),
+            'jpeg_kb': round(jpeg_bytes / 1024, 2),
+            'ratio': round(jpeg_bytes / frame_bytes, 2) if frame_bytes else None,
+        })
+    return transport, video
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对比 MJPEG、Socket.IO 二进制帧和视频编码的带宽')
+    parser.add_argument('--video', help='用于测试的视频文件，不指定时使用合成画面')
+    parser.add_argument('--frames', type=int, default=150, help='测试帧数 (默认: 150)')
+    parser.add_argument('--fps', type=int, default=30, help='计算码率使用的帧率 (默认: 30)')
+    parser.add_argument('--qualities', type=int, nargs='+',
+                        default=sorted({q for q, _ in QUALITY_TIERS}, reverse=True),
+                        help='对比的JPEG质量 (默认: 各画质档位)')
+    parser.add_argument('--codecs', nargs='+', default=['avc1', 'mp4v'],
+                        help='对比的视频编码器 FourCC (默认: avc1 mp4v)')
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.frames)
+    transport, video = compare(frames, args.qualities, args.codecs, args.fps)
+
+    print(f"\n{len(frames)} 帧, {frames[0].shape[1]}x{frames[0].shape[0]}, 按 {args.fps} FPS 计算码率")
+    print(f"\n{'JPEG质量':>8}{'PSNR':>8}{'JPEG(KB)':>10}{'MJPEG(KB)':>11}{'Socket.IO(KB)':>15}"
+          f"{'确认(B)':>9}{'MJPEG(kbps)':>13}{'Socket.IO(kbps)':>17}")
+    for r in transport:
+        print(f"{r['quality']:>8}{r['psnr']:>8}{r['jpeg_kb']:>10}{r['mjpeg_kb']:>11}{r['socketio_kb']:>15}"
+              f"{r['ack_bytes']:>9}{r['mjpeg_kbps']:>13}{r['socketio_kbps']:>17}")
+
+    if video:
+        print(f"\n{'编码器':<8}{'PSNR':>8}{'视频(KB/帧)':>13}{'同画质JPEG质量':>16}{'JPEG PSNR':>11}{'JPEG(KB/帧)':>13}{'倍数':>8}")
+        for r in video:
+            print(f"{r['codec']:<8}{r['psnr']:>8}{r['video_kb']:>13}{r['jpeg_quality']:>16}"
+                  f"{r['jpeg_psnr']:>11}{r['jpeg_kb']:>13}{r['ratio']:>8}")
+
+
+if __name__ == "__main__":
+    main()
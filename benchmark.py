@@ -0,0 +1,309 @@
+import argparse
+import threading
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from backends import BACKENDS, DEFAULT_WEIGHTS, create_backend
+from common import current_rss_mb, find_videos
+from encoding import QUALITY_TIERS
+from motion import MOTION_ENGINES, create_motion_detector, motion_roi
+from tracking import TrackedDetector
+from workers import WORKER_MODES, ProcessInferencePool
+
+# 与 app.py 中每帧经过的处理阶段一致
+STAGES = ('read', 'resize', 'motion', 'predict', 'draw', 'encode')
+
+
+def synthetic_video(duration=10):
+    """用 videos/create_test_video.py 生成一段测试视频，返回其路径"""
+    from videos.create_test_video import create_test_video
+
+    path = os.path.join(tempfile.mkdtemp(prefix='bench-'), 'synthetic.mp4')
+    create_test_video(path, duration=duration, codec='mp4v')
+    return path
+
+
+def replay(videos, frames):
+    """
+    依次读取视频，读完后从头重放，直到产出指定帧数。
+
+    返回:
+        generator: 逐个产出 (读取耗时, 帧)
+    """
+    produced = 0
+    while produced < frames:
+        progressed = False
+        for path in videos:
+            cap = cv2.VideoCapture(path)
+            while produced < frames:
+                start = time.perf_counter()
+                success, frame = cap.read()
+                elapsed = time.perf_counter() - start
+                if not success:
+                    break
+                progressed = True
+                produced += 1
+                yield elapsed, frame
+            cap.release()
+        if not progressed:
+            raise RuntimeError(f"无法从 {', '.join(videos)} 读取画面")
+
+
+def percentiles(samples):
+    ms = np.asarray(samples) * 1000
+    return {
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def run_benchmark(videos, backend, frames=300, warmup_frames=10, conf=0.8, size=(640, 480),
+                  detect_stride=1, track_min_quality=0.5, motion_engine='background'):
+    """
+    按 app.py 的处理顺序逐帧执行：读取、缩放、运动检测、推理、绘制、JPEG编码，分别计时。
+
+    参数:
+        videos: 视频文件列表
+        backend: 已加载的推理后端
+        frames: 计入统计的帧数
+        warmup_frames: 开头不计入统计的帧数
+        conf: 置信度阈值
+        size: 缩放后的画面尺寸，与摄像头采集尺寸一致
+        detect_stride: 每隔多少帧运行一次检测，中间帧用光流跟踪
+        track_min_quality: 跟踪质量低于该值时立即重新检测
+        motion_engine: 运动检测引擎，见 motion.MOTION_ENGINES
+
+    返回:
+        dict: 各阶段延迟分位数、端到端帧率、实际推理比例和内存峰值
+    """
+    detector = create_motion_detector(motion_engine)
+    tracked = TrackedDetector(backend.predict_one, detect_stride, track_min_quality)
+    quality = QUALITY_TIERS[0][0]
+    samples = {stage: [] for stage in STAGES}
+    totals = []
+    peak_rss = current_rss_mb()
+    detections_total = 0
+
+    started = None
+    for index, (read_time, frame) in enumerate(replay(videos, frames + warmup_frames)):
+        if index == warmup_frames:
+            started = time.perf_counter()
+            inferences_before = tracked.inferences
+        timings = {'read': read_time}
+
+        t0 = time.perf_counter()
+        frame = cv2.resize(frame, size)
+        t1 = time.perf_counter()
+        movement_ratio, contours = detector.update(frame)
+        motion_roi(contours, frame.shape)
+        t2 = time.perf_counter()
+        detections = tracked(frame, conf)
+        t3 = time.perf_counter()
+        detections.draw(frame, backend.names)
+        t4 = time.perf_counter()
+        cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        t5 = time.perf_counter()
+
+        timings.update(resize=t1 - t0, motion=t2 - t1, predict=t3 - t2, draw=t4 - t3, encode=t5 - t4)
+        rss = current_rss_mb()
+        if rss is not None:
+            peak_rss = max(peak_rss or 0.0, rss)
+        if index < warmup_frames:
+            continue
+        for stage, elapsed in timings.items():
+            samples[stage].append(elapsed)
+        totals.append(sum(timings.values()))
+        detections_total += len(detections)
+
+    wall = time.perf_counter() - started
+    inferences = tracked.inferences - inferences_before
+    return {
+        'frames': len(totals),
+        'fps': round(len(totals) / wall, 2) if wall > 0 else 0.0,
+        'motion_engine': motion_engine,
+        'detect_stride': detect_stride,
+        'inferences': inferences,
+        'inference_rate': round(inferences / len(totals), 3) if totals else 0.0,
+        'inference_fps': round(inferences / wall, 2) if wall > 0 else 0.0,
+        'tracking_fallbacks': tracked.fallbacks,
+        'detections': detections_total,
+        'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else None,
+        'stages': {stage: percentiles(samples[stage]) for stage in STAGES},
+        'total': percentiles(totals),
+    }
+
+
+def run_scaling(videos, backend_name, weights=DEFAULT_WEIGHTS, cameras=4, workers_list=(0, 1, 2, 4), frames=100,
+                conf=0.8, mode='camera', size=(640, 480)):
+    """
+    模拟多摄像头主机：每个摄像头一个线程持续提交画面推理，比较在本进程推理和不同工作进程数时的总吞吐。
+
+    参数:
+        videos: 视频文件列表，预先读入内存，不计读取耗时
+        backend_name: 推理后端名称
+        weights: PyTorch 权重路径
+        cameras: 模拟的摄像头数
+        workers_list: 要比较的工作进程数，0 表示所有摄像头线程共用本进程的模型
+        frames: 每个摄像头推理的帧数
+        conf: 置信度阈值
+        mode: 工作进程的分配方式，见 workers.WORKER_MODES
+        size: 画面尺寸
+
+    返回:
+        list: 每个工作进程数一项，包含总帧率、每摄像头帧率和相对第一项的加速比
+    """
+    clip = [cv2.resize(frame, size) for _, frame in replay(videos, 30)]
+    results = []
+    for workers in workers_list:
+        if workers > 0:
+            engine = ProcessInferencePool(backend_name, workers, mode, weights).start()
+        else:
+            engine = create_backend(backend_name, weights)
+
+        def camera(index):
+            for i in range(frames):
+                engine.predict_one(clip[(index * 7 + i) % len(clip)], conf)
+
+        threads = [threading.Thread(target=camera, args=(i,)) for i in range(cameras)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+        if workers > 0:
+            engine.stop()
+
+        fps = cameras * frames / wall
+        results.append({
+            'workers': workers,
+            'cameras': cameras,
+            'frames': cameras * frames,
+            'fps': round(fps, 2),
+            'per_camera_fps': round(fps / cameras, 2),
+            'speedup': round(fps / results[0]['fps'], 2) if results else 1.0,
+        })
+        print(f"工作进程 {workers}: {results[-1]['fps']} FPS")
+    return results
+
+
+def print_scaling(results):
+    print(f"\n{'工作进程':<10}{'总帧率':>10}{'每摄像头':>10}{'加速比':>10}")
+    for r in results:
+        print(f"{r['workers']:<10}{r['fps']:>10}{r['per_camera_fps']:>10}{r['speedup']:>10}")
+    print(f"\n摄像头数: {results[0]['cameras']}, CPU核心数: {os.cpu_count()}")
+    if max(r['workers'] for r in results) > (os.cpu_count() or 1):
+        print("警告: 工作进程数超过CPU核心数，结果不能说明多核扩展效果")
+
+
+def compare_baseline(result, baseline, tolerance):
+    """
+    与历史结果比较，各阶段 P95 或帧率变差超过 tolerance (比例) 时视为回退。
+
+    返回:
+        list: 回退项的说明
+    """
+    regressions = []
+    for stage, current in result['stages'].items():
+        previous = baseline.get('stages', {}).get(stage)
+        if previous and previous['p95_ms'] > 0 and current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{stage} P95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+    if baseline.get('fps') and result['fps'] < baseline['fps'] * (1 - tolerance):
+        regressions.append(f"FPS {baseline['fps']} -> {result['fps']}")
+    return regressions
+
+
+def print_result(result):
+    print(f"\n{'阶段':<10}{'平均(ms)':>10}{'P50(ms)':>10}{'P95(ms)':>10}{'P99(ms)':>10}")
+    for stage, r in list(result['stages'].items()) + [('total', result['total'])]:
+        print(f"{stage:<10}{r['mean_ms']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}")
+    print(f"\n帧数: {result['frames']}, 端到端帧率: {result['fps']} FPS, "
+          f"检测框数: {result['detections']}, 内存峰值: {result['peak_rss_mb']} MB")
+    print(f"检测间隔: {result['detect_stride']}, 实际推理 {result['inferences']} 帧 "
+          f"(占 {result['inference_rate']:.1%}, {result['inference_fps']} 次/秒), "
+          f"跟踪丢失后重新检测: {result['tracking_fallbacks']} 次")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回放视频测量检测流程各阶段延迟，不需要摄像头和Arduino')
+    parser.add_argument('--videos', nargs='+', default=['videos'],
+                        help='视频文件或目录 (默认: videos)，没有视频时自动生成测试视频')
+    parser.add_argument('--frames', type=int, default=300, help='计入统计的帧数 (默认: 300)')
+    parser.add_argument('--warmup-frames', type=int, default=10, help='开头不计入统计的帧数 (默认: 10)')
+    parser.add_argument('--backend', default='torch', choices=BACKENDS, help='推理后端 (默认: torch)')
+    parser.add_argument('--weights', default=DEFAULT_WEIGHTS, help=f'PyTorch 权重路径 (默认: {DEFAULT_WEIGHTS})')
+    parser.add_argument('--conf', type=float, default=0.8, help='置信度阈值 (默认: 0.8)')
+    parser.add_argument('--motion-engine', default='background', choices=MOTION_ENGINES,
+                        help='运动检测引擎 (默认: background)')
+    parser.add_argument('--detect-stride', type=int, default=1,
+                        help='每隔多少帧运行一次检测，中间帧用光流跟踪 (默认: 1)')
+    parser.add_argument('--track-min-quality', type=float, default=0.5,
+                        help='跟踪质量低于该值时立即重新检测 (默认: 0.5)')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        help='比较多摄像头在不同工作进程数下的推理吞吐，0 表示在本进程推理，如 --workers 0 1 2 4')
+    parser.add_argument('--cameras', type=int, default=4, help='与 --workers 一起使用，模拟的摄像头数 (默认: 4)')
+    parser.add_argument('--worker-mode', default='camera', choices=WORKER_MODES,
+                        help='与 --workers 一起使用，工作进程的分配方式 (默认: camera)')
+    parser.add_argument('--output', help='把结果写入JSON文件')
+    parser.add_argument('--baseline', help='与之前保存的JSON结果比较，出现回退时以非零状态退出')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='允许的性能波动比例 (默认: 0.1)')
+    args = parser.parse_args()
+
+    videos = find_videos(args.videos)
+    if not videos:
+        print("没有找到视频文件，生成测试视频")
+        videos = [synthetic_video()]
+
+    if args.workers:
+        scaling = run_scaling(videos, args.backend, args.weights, args.cameras, args.workers, args.frames,
+                              args.conf, args.worker_mode)
+        print_scaling(scaling)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump({'scaling': scaling, 'backend': args.backend, 'cpu_count': os.cpu_count(),
+                           'worker_mode': args.worker_mode, 'platform': platform.platform()},
+                          f, ensure_ascii=False, indent=2)
+            print(f"结果已保存至: {args.output}")
+        return
+
+    backend = create_backend(args.backend, args.weights)
+    result = run_benchmark(videos, backend, args.frames, args.warmup_frames, args.conf,
+                           detect_stride=args.detect_stride, track_min_quality=args.track_min_quality,
+                           motion_engine=args.motion_engine)
+    result.update({
+        'backend': args.backend,
+        'videos': videos,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+    })
+    print_result(result)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存至: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare_baseline(result, json.load(f), args.tolerance)
+        if regressions:
+            print("\n性能回退:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\n与基准相比没有性能回退")
+
+
+if __name__ == "__main__":
+    main()
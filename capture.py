@@ -0,0 +1,126 @@
+import cv2
+import threading
+import time
+
+from metrics import CAPTURE_SECONDS
+
+
+class LatestFrameCapture:
+    """
+    在独立线程中持续读取摄像头，只保留最新一帧。
+
+    推理比摄像头慢时，旧帧会被直接覆盖丢弃，读取方每次拿到的都是最新画面，
+    避免 V4L2 缓冲区积压导致检测结果滞后。
+
+    参数:
+        source: 摄像头ID或视频文件路径
+        width: 期望的帧宽度
+        height: 期望的帧高度
+    """
+
+    def __init__(self, source, width=640, height=480):
+        self.source = source
+        self.width = width
+        self.height = height
+
+        self._cap = None
+        self._thread = None
+        self._running = False
+        self._cond = threading.Condition()
+
+        # 最新帧及其元数据
+        self._frame = None
+        self._frame_id = 0
+        self._frame_time = 0.0
+        self._consumed_id = 0
+
+        # 统计计数器
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.last_frame_age = 0.0
+        self.max_frame_age = 0.0
+
+    def start(self):
+        """打开摄像头并启动采集线程，成功返回 True"""
+        self._cap = cv2.VideoCapture(self.source)
+        if not self._cap.isOpened():
+            print(f"无法打开摄像头 {self.source}")
+            return False
+
+        self._cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self._cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        # 尽量缩小驱动端缓冲区，部分后端不支持时会被忽略
+        self._cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"capture-{self.source}", daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        while self._running:
+            start = time.perf_counter()
+            success, frame = self._cap.read()
+            CAPTURE_SECONDS.observe(time.perf_counter() - start)
+            if not success:
+                break
+
+            with self._cond:
+                # 上一帧还没被取走就被覆盖，计为丢帧
+                if self._frame_id > self._consumed_id:
+                    self.frames_dropped += 1
+                self._frame = frame
+                self._frame_id += 1
+                self._frame_time = time.time()
+                self.frames_read += 1
+                self._cond.notify_all()
+
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def read(self, timeout=1.0):
+        """
+        等待并返回一帧比上次读取更新的画面。
+
+        返回:
+            tuple: (success, frame)，采集线程已停止时 success 为 False
+        """
+        with self._cond:
+            while self._running and self._frame_id <= self._consumed_id:
+                if not self._cond.wait(timeout):
+                    return False, None
+
+            if self._frame_id <= self._consumed_id:
+                return False, None
+
+            self._consumed_id = self._frame_id
+            self.last_frame_age = time.time() - self._frame_time
+            self.max_frame_age = max(self.max_frame_age, self.last_frame_age)
+            return True, self._frame
+
+    def is_running(self):
+        return self._running
+
+    def stats(self):
+        """返回采集统计信息"""
+        return {
+            'source': self.source,
+            'frames_read': self.frames_read,
+            'frames_dropped': self.frames_dropped,
+            'last_frame_age_ms': round(self.last_frame_age * 1000, 1),
+            'max_frame_age_ms': round(self.max_frame_age * 1000, 1),
+        }
+
+    def stop(self):
+        """停止采集线程并释放摄像头"""
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._cap is not None and self._cap.isOpened():
+            self._cap.release()
+            print(f"摄像头 {self.source} 资源已释放")
+        self._cap = None
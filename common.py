@@ -0,0 +1,42 @@
+import glob
+import os
+
+# 离线工具识别的视频文件扩展名
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+
+def list_videos(video_dir, skip=None):
+    """
+    按文件名排序列出目录下的视频文件。
+
+    参数:
+        video_dir: 视频目录
+        skip: 文件名包含该字符串的视频不列出，如 '_cropped'
+    """
+    return sorted(p for p in glob.glob(os.path.join(video_dir, '*'))
+                  if p.lower().endswith(VIDEO_EXTENSIONS) and not (skip and skip in os.path.basename(p)))
+
+
+def find_videos(paths, skip=None):
+    """把目录展开为其中的视频文件，其余路径原样保留"""
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            videos.extend(list_videos(path, skip))
+        else:
+            videos.append(path)
+    return videos
+
+
+def current_rss_mb():
+    """当前进程的常驻内存 (MB)，没有安装 psutil 且不是 Linux 时无法获取，返回 None"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, AttributeError, ValueError):
+        return None
@@ -1,34 +1,29 @@
 import cv2
-from ultralytics import YOLO
+from backends import BACKENDS, create_backend
 import argparse
-import serial
-import time
+from actuator import SerialActuator
+from voting import add_voter_arguments, voter_from_args
 
 def main():
     # 解析命令行参数
     parser = argparse.ArgumentParser(description='垃圾检测程序')
     parser.add_argument('--headless', action='store_true', help='以无界面模式运行')
     parser.add_argument('--camera', type=int, default=0, help='摄像头ID (默认: 0)')
+    parser.add_argument('--backend', default='torch', choices=BACKENDS, help='推理后端 (默认: torch)')
+    parser.add_argument('--serial-port', default='/dev/ttyUSB0', help='Arduino 串口号 (默认: /dev/ttyUSB0)')
+    add_voter_arguments(parser)
     args = parser.parse_args()
     
     # 加载模型
-    model = YOLO("models/trashcan.pt") 
+    model = create_backend(args.backend)
 
-    # 初始化Arduino串口连接
-    try:
-        arduino = serial.Serial('/dev/ttyUSB0', 9600, timeout=1)
-        time.sleep(2)
-        print("已连接到 Arduino")
-    except Exception as e:
-        print(f"Arduino连接错误: {e}")
-        arduino = None
+    # Arduino串口工作线程，连接和重连都在后台进行，不阻塞检测循环
+    arduino = SerialActuator(args.serial_port).start()
 
     def send_message(cls_id, score, label):
         # 发送检测结果到Arduino
-        message = f"{cls_id},{score:.2f},{label}"
-        print("发送消息:", message)
-        if arduino:
-            arduino.write(message.encode('utf-8'))
+        print(f"发送消息: {cls_id},{score:.2f},{label}")
+        arduino.send(int(cls_id))
 
     # 打开视频捕捉，默认使用摄像头1
     video_cap = cv2.VideoCapture(args.camera)
@@ -36,10 +31,8 @@ def main():
         print(f"无法打开摄像头 {args.camera}")
         return
 
-    # 初始化变量
-    last_cls_id = None
-    frame_count = 0
-    threshold = 5  # 连续帧数阈值
+    # 跨帧累积各类别置信度的投票器
+    voter = voter_from_args(args, len(model.names))
 
     while video_cap.isOpened():
         success, frame = video_cap.read()
@@ -49,28 +42,15 @@ def main():
         # 设置置信度
         conf = 0.8
         # 进行YOLO预测
-        results = model.predict(frame, conf=conf, verbose=False)
+        detections = model.predict_one(frame, conf)
         
-        for result in results:
-            # 绘制结果
-            frame = result.plot()
-            # 取出结果的类别、置信度、坐标
-            boxes = result.boxes
-            for box in boxes:
-                cls_id = int(box.cls.item())
-                score = box.conf.item()
-                label = model.names[cls_id]
-
-                # 检测相同的cls_id
-                if cls_id == last_cls_id:
-                    frame_count += 1
-                else:
-                    last_cls_id = cls_id
-                    frame_count = 1
-                # 如果连续帧数超过阈值, 发送消息
-                if frame_count >= threshold:
-                    send_message(cls_id, score, label)
-                    frame_count = 0  # 重置计数器
+        # 绘制结果
+        detections.draw(frame, model.names)
+        # 某个类别的累积置信度占据主导时发送消息
+        decision = voter.update(detections)
+        if decision is not None:
+            cls_id, score = decision
+            send_message(cls_id, score, model.names[cls_id])
 
         # 如果不是无界面模式，显示图像
         if not args.headless:
@@ -81,9 +61,10 @@ def main():
     # 释放资源
     video_cap.release()
     cv2.destroyAllWindows()
-    if arduino:
-        arduino.close()
-        print("Arduino连接已关闭")
+    arduino.stop()
+    print("Arduino连接已关闭")
+    stats = voter.stats()
+    print(f"共做出 {stats['decisions']} 次分类，决定时间中位数: {stats['median_decision_ms']} 毫秒")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
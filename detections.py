@@ -0,0 +1,67 @@
+import cv2
+import numpy as np
+
+# 各类别的绘制颜色 (BGR)
+PALETTE = [
+    (56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255),
+    (49, 210, 207), (10, 249, 72), (23, 204, 146), (134, 219, 61),
+    (211, 188, 0), (209, 85, 0), (255, 56, 132), (203, 56, 255),
+]
+
+
+class Detections:
+    """
+    一帧的检测结果，以 NumPy 数组保存，便于坐标变换、绘制和投票。
+
+    属性:
+        boxes: (N, 4) float32，xyxy 像素坐标
+        scores: (N,) float32，置信度
+        classes: (N,) int32，类别ID
+    """
+
+    __slots__ = ('boxes', 'scores', 'classes')
+
+    def __init__(self, boxes=None, scores=None, classes=None):
+        self.boxes = np.zeros((0, 4), np.float32) if boxes is None else np.asarray(boxes, np.float32).reshape(-1, 4)
+        self.scores = np.zeros(0, np.float32) if scores is None else np.asarray(scores, np.float32).reshape(-1)
+        self.classes = np.zeros(0, np.int32) if classes is None else np.asarray(classes, np.int32).reshape(-1)
+
+    @classmethod
+    def from_result(cls, result, offset=(0, 0)):
+        """
+        从 ultralytics 的单帧结果构造，并把坐标平移 offset。
+
+        参数:
+            result: ultralytics Results
+            offset: (x, y)，裁剪区域左上角在原图中的坐标
+        """
+        boxes = result.boxes
+        xyxy = boxes.xyxy.cpu().numpy().astype(np.float32)
+        if offset != (0, 0):
+            xyxy += np.array([offset[0], offset[1], offset[0], offset[1]], np.float32)
+        return cls(xyxy, boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy())
+
+    def select(self, mask):
+        """按布尔掩码或索引筛选，返回新的 Detections"""
+        return Detections(self.boxes[mask], self.scores[mask], self.classes[mask])
+
+    def __len__(self):
+        return len(self.classes)
+
+    def __iter__(self):
+        """逐个产出 (cls_id, score, box)"""
+        for i in range(len(self.classes)):
+            yield int(self.classes[i]), float(self.scores[i]), self.boxes[i]
+
+    def draw(self, frame, names):
+        """在帧上绘制检测框和标签（原地修改）"""
+        for cls_id, score, box in self:
+            color = PALETTE[cls_id % len(PALETTE)]
+            x1, y1, x2, y2 = (int(v) for v in box)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            text = f"{names[cls_id]} {score:.2f}"
+            (tw, th), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 1)
+            ty = max(y1, th + 4)
+            cv2.rectangle(frame, (x1, ty - th - 4), (x1 + tw, ty), color, -1)
+            cv2.putText(frame, text, (x1, ty - 2), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+        return frame
@@ -0,0 +1,166 @@
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from metrics import ENCODING_SECONDS
+
+# 画质档位：(JPEG质量, 缩放比例)，0 为最高档
+QUALITY_TIERS = [
+    (85, 1.0),
+    (70, 1.0),
+    (60, 0.75),
+    (50, 0.5),
+    (40, 0.5),
+]
+TIER_NAMES = {'high': 0, 'medium': 2, 'low': 4}
+
+# Socket.IO 二进制视频帧的头部：帧序号 (uint32)、摄像头ID (uint32)、时间戳 (float64)，小端
+VIDEO_FRAME_HEADER = struct.Struct('<IId')
+
+
+def pack_video_frame(seq, camera_id, jpeg, timestamp=None):
+    """把一帧JPEG打包为带头部的二进制消息"""
+    if timestamp is None:
+        timestamp = time.time()
+    return VIDEO_FRAME_HEADER.pack(seq & 0xFFFFFFFF, camera_id, timestamp) + jpeg
+
+
+class FrameEncoder:
+    """
+    JPEG 编码线程池，编码在这里完成，不占用检测循环。
+
+    cv2.imencode 执行时会释放 GIL，多个编码可以真正并行。
+
+    参数:
+        workers: 编码线程数
+    """
+
+    def __init__(self, workers=2):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="jpeg-encoder")
+        self._lock = threading.Lock()
+        self.encodes = [0] * len(QUALITY_TIERS)
+        self.reuses = 0
+        self.encode_time = 0.0
+
+    def submit(self, frame, tier):
+        """提交编码任务，返回结果为JPEG字节的 Future"""
+        return self._pool.submit(self._encode, frame, tier)
+
+    def _encode(self, frame, tier):
+        start = time.perf_counter()
+        quality, scale = QUALITY_TIERS[tier]
+        if scale != 1.0:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        elapsed = time.perf_counter() - start
+        ENCODING_SECONDS.observe(elapsed)
+        with self._lock:
+            self.encodes[tier] += 1
+            self.encode_time += elapsed
+        return buffer.tobytes()
+
+    def record_reuse(self):
+        with self._lock:
+            self.reuses += 1
+
+    def stats(self):
+        total = sum(self.encodes)
+        return {
+            'encodes_per_tier': list(self.encodes),
+            'reuses': self.reuses,
+            'avg_encode_ms': round(self.encode_time / total * 1000, 2) if total else 0.0,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+class EncodedFrameCache:
+    """
+    一帧画面按画质档位的编码缓存，每个档位最多编码一次，所有观看者共享。
+    """
+
+    __slots__ = ('_frame', '_futures', '_lock')
+
+    def __init__(self, frame):
+        self._frame = frame
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def get(self, tier, encoder):
+        """返回该档位JPEG的 Future，已有缓存时直接复用"""
+        with self._lock:
+            future = self._futures.get(tier)
+            if future is None:
+                future = encoder.submit(self._frame, tier)
+                self._futures[tier] = future
+                return future
+        encoder.record_reuse()
+        return future
+
+
+class AdaptiveQuality:
+    """
+    根据观看者的消费速度调整画质档位。
+
+    每发送一帧记录写出耗时：持续慢于帧间隔时降档（更低质量、更小尺寸），
+    持续明显快于帧间隔时升档。
+
+    参数:
+        tier: 初始档位
+        fixed: 为 True 时固定档位不调整
+        patience: 连续多少帧满足条件才调整
+    """
+
+    def __init__(self, tier=0, fixed=False, patience=5):
+        self.tier = tier
+        self.fixed = fixed
+        self.patience = patience
+        self._slow = 0
+        self._fast = 0
+        self.send_time = 0.0
+
+    def update(self, send_time, frame_interval):
+        """记录一帧的写出耗时，必要时调整档位"""
+        # 指数平滑，避免单帧抖动引起频繁切换
+        self.send_time = send_time if self.send_time == 0 else 0.7 * self.send_time + 0.3 * send_time
+        if self.fixed or frame_interval <= 0:
+            return
+
+        if self.send_time > frame_interval * 0.8:
+            self._slow += 1
+            self._fast = 0
+        elif self.send_time < frame_interval * 0.3:
+            self._fast += 1
+            self._slow = 0
+        else:
+            self._slow = self._fast = 0
+
+        if self._slow >= self.patience and self.tier < len(QUALITY_TIERS) - 1:
+            self.tier += 1
+            self._slow = 0
+        elif self._fast >= self.patience * 4 and self.tier > 0:
+            # 升档更保守，避免在两个档位之间来回切换
+            self.tier -= 1
+            self._fast = 0
+
+
+def parse_quality(value):
+    """
+    解析 quality 参数：auto 为自适应，也可以是 high/medium/low 或档位编号。
+
+    返回:
+        AdaptiveQuality
+    """
+    if value in (None, '', 'auto'):
+        return AdaptiveQuality()
+    if value in TIER_NAMES:
+        return AdaptiveQuality(TIER_NAMES[value], fixed=True)
+    try:
+        tier = min(max(int(value), 0), len(QUALITY_TIERS) - 1)
+    except ValueError:
+        return AdaptiveQuality()
+    return AdaptiveQuality(tier, fixed=True)
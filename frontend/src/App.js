@@ -3,6 +3,7 @@ import './App.css';
 import VideoStream from './components/VideoStream';
 import ControlPanel from './components/ControlPanel';
 import DetectionResults from './components/DetectionResults';
+import TelemetryPanel from './components/TelemetryPanel';
 import { Container, Grid, Box, Typography, Snackbar, Alert } from '@mui/material';
 import { initSocket, closeSocket } from './services/socketService';
 
@@ -10,6 +11,10 @@ function App() {
   const [isDetecting, setIsDetecting] = useState(false);
   const [currentCameraId, setCurrentCameraId] = useState(0);
   const [streamKey, setStreamKey] = useState(Date.now());
+  // 叠加层绘制方式：server 由后端画进画面，client 由浏览器根据检测数据绘制
+  const [overlayMode, setOverlayMode] = useState('server');
+  // 视频传输方式：mjpeg 为 HTTP 流，socket 通过WebSocket推送二进制帧
+  const [videoTransport, setVideoTransport] = useState('mjpeg');
   const [detectionResults, setDetectionResults] = useState([]);
   const [socketConnected, setSocketConnected] = useState(false);
   const [notification, setNotification] = useState({ open: false, message: '', severity: 'info' });
@@ -62,6 +67,14 @@ function App() {
     setCurrentCameraId(cameraId);
   };
 
+  const handleOverlayModeChange = (mode) => {
+    setOverlayMode(mode);
+  };
+
+  const handleVideoTransportChange = (transport) => {
+    setVideoTransport(transport);
+  };
+
   const handleClearResults = () => {
     setDetectionResults([]);
   };
@@ -108,9 +121,19 @@ function App() {
               onCameraChange={handleCameraChange}
               currentCameraId={currentCameraId}
               socketConnected={socketConnected}
+              overlayMode={overlayMode}
+              onOverlayModeChange={handleOverlayModeChange}
+              videoTransport={videoTransport}
+              onVideoTransportChange={handleVideoTransportChange}
             />
           </Grid>
           
+          {socketConnected && (
+            <Grid item xs={12}>
+              <TelemetryPanel cameraId={currentCameraId} isDetecting={isDetecting} />
+            </Grid>
+          )}
+
           <Grid item xs={12}>
             <DetectionResults 
               results={detectionResults} 
@@ -123,6 +146,8 @@ function App() {
               isDetecting={isDetecting}
               cameraId={currentCameraId}
               streamKey={streamKey}
+              overlayMode={overlayMode}
+              transport={socketConnected ? videoTransport : 'mjpeg'}
             />
           </Grid>
         </Grid>
@@ -13,7 +13,9 @@ import {
   Badge,
   Collapse,
   IconButton,
-  Chip
+  Chip,
+  FormControlLabel,
+  Switch
 } from '@mui/material';
 import PlayArrowIcon from '@mui/icons-material/PlayArrow';
 import StopIcon from '@mui/icons-material/Stop';
@@ -28,7 +30,11 @@ const ControlPanel = ({
   onStopDetection, 
   onCameraChange,
   currentCameraId,
-  socketConnected = false
+  socketConnected = false,
+  overlayMode = 'server',
+  onOverlayModeChange,
+  videoTransport = 'mjpeg',
+  onVideoTransportChange
 }) => {
   // 添加折叠状态
   const [expanded, setExpanded] = useState(true);
@@ -149,6 +155,33 @@ const ControlPanel = ({
             <Typography variant="caption" color="text.secondary" sx={{ display: 'block', mt: 1 }}>
               {isDetecting ? '检测进行中时无法更改摄像头' : '请选择要使用的摄像头编号'}
             </Typography>
+            <Tooltip title="开启后服务端只推送原始画面和检测数据，检测框由浏览器绘制，减轻服务端负担">
+              <FormControlLabel
+                sx={{ mt: 1, color: 'var(--text-primary)' }}
+                control={
+                  <Switch
+                    size="small"
+                    checked={overlayMode === 'client'}
+                    onChange={(e) => onOverlayModeChange && onOverlayModeChange(e.target.checked ? 'client' : 'server')}
+                  />
+                }
+                label="浏览器绘制检测框"
+              />
+            </Tooltip>
+            <Tooltip title="开启后通过WebSocket推送二进制画面帧，浏览器确认后才发送下一帧；连接断开时自动使用MJPEG">
+              <FormControlLabel
+                sx={{ mt: 1, color: 'var(--text-primary)' }}
+                control={
+                  <Switch
+                    size="small"
+                    checked={videoTransport === 'socket'}
+                    disabled={!socketConnected}
+                    onChange={(e) => onVideoTransportChange && onVideoTransportChange(e.target.checked ? 'socket' : 'mjpeg')}
+                  />
+                }
+                label="WebSocket传输"
+              />
+            </Tooltip>
           </Grid>
           
           <Grid item xs={12} md={7}>
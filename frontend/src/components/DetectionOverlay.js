@@ -0,0 +1,119 @@
+import React, { useEffect, useRef } from 'react';
+import { subscribeFrameDetections } from '../services/socketService';
+
+// 与后端 detections.PALETTE 一致的类别颜色 (RGB)
+const PALETTE = [
+  '#ff3838', '#ff9d97', '#ff701f', '#ffb21d',
+  '#cfd231', '#48f90a', '#92cc17', '#3ddb86',
+  '#00bcd3', '#0055d1', '#8438ff', '#ff38cb'
+];
+
+// 最多缓存的检测结果条数，等待对应序号的画面显示
+const MAX_PENDING = 30;
+
+// 在视频画面上绘制检测框和状态，画面本身由服务端以未绘制的原始帧推送
+function DetectionOverlay({ cameraId, imageRef, frameSeqRef }) {
+  const canvasRef = useRef(null);
+
+  useEffect(() => {
+    const draw = (data) => {
+      const canvas = canvasRef.current;
+      const image = imageRef.current;
+      if (!canvas || !image) return;
+
+      // 画布与图片显示尺寸保持一致
+      const width = image.clientWidth;
+      const height = image.clientHeight;
+      if (canvas.width !== width) canvas.width = width;
+      if (canvas.height !== height) canvas.height = height;
+
+      const ctx = canvas.getContext('2d');
+      ctx.clearRect(0, 0, width, height);
+      if (!width || !height) return;
+
+      const scaleX = width / data.width;
+      const scaleY = height / data.height;
+      ctx.lineWidth = 2;
+      ctx.font = '14px sans-serif';
+      ctx.textBaseline = 'bottom';
+
+      data.detections.forEach(({ cls_id, label, score, box }) => {
+        const color = PALETTE[cls_id % PALETTE.length];
+        const x = box[0] * scaleX;
+        const y = box[1] * scaleY;
+        const w = (box[2] - box[0]) * scaleX;
+        const h = (box[3] - box[1]) * scaleY;
+        const text = `${label} ${score.toFixed(2)}`;
+        const textWidth = ctx.measureText(text).width + 6;
+        const textY = Math.max(y, 18);
+
+        ctx.strokeStyle = color;
+        ctx.strokeRect(x, y, w, h);
+        ctx.fillStyle = color;
+        ctx.fillRect(x, textY - 18, textWidth, 18);
+        ctx.fillStyle = '#ffffff';
+        ctx.fillText(text, x + 3, textY - 2);
+      });
+
+      // 状态信息
+      let status = `状态: ${data.state} | 置信度: ${data.conf}`;
+      if (data.motion) {
+        status += ` | 已检测 ${data.elapsed.toFixed(1)}秒`;
+      } else if (data.idle) {
+        status += ' | 空闲';
+      }
+      ctx.font = 'bold 16px sans-serif';
+      ctx.fillStyle = '#ff0000';
+      ctx.fillText(status, 10, 30);
+    };
+
+    // 检测结果可能先于对应的画面到达：知道当前画面序号时，绘制序号不超过它的最新一条
+    const pending = [];
+    let drawnSeq = 0;
+    let frameId = null;
+    const drawMatching = () => {
+      const frameSeq = frameSeqRef ? frameSeqRef.current : null;
+      if (frameSeq !== null) {
+        let match = null;
+        while (pending.length && pending[0].seq <= frameSeq) match = pending.shift();
+        if (match && match.seq > drawnSeq) {
+          drawnSeq = match.seq;
+          draw(match);
+        }
+      }
+      frameId = requestAnimationFrame(drawMatching);
+    };
+    frameId = requestAnimationFrame(drawMatching);
+
+    const unsubscribe = subscribeFrameDetections(cameraId, (data) => {
+      // MJPEG 画面没有序号，收到即绘制
+      if (!frameSeqRef || frameSeqRef.current === null) {
+        draw(data);
+        return;
+      }
+      pending.push(data);
+      if (pending.length > MAX_PENDING) pending.shift();
+    });
+
+    return () => {
+      cancelAnimationFrame(frameId);
+      unsubscribe();
+    };
+  }, [cameraId, imageRef, frameSeqRef]);
+
+  return (
+    <canvas
+      ref={canvasRef}
+      style={{
+        position: 'absolute',
+        top: 0,
+        left: 0,
+        width: '100%',
+        height: '100%',
+        pointerEvents: 'none'
+      }}
+    />
+  );
+}
+
+export default DetectionOverlay;
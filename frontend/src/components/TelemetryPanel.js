@@ -0,0 +1,71 @@
+import React, { useEffect, useState } from 'react';
+import { Paper, Box, Typography, Chip, LinearProgress } from '@mui/material';
+import { subscribeTelemetry } from '../services/socketService';
+
+// 检测状态的中文名称和颜色
+const stateLabels = {
+  NORMAL: { label: '正常', color: 'var(--success-color)' },
+  REDUCED_CONF: { label: '降低置信度', color: 'var(--warning-color)' },
+  TIMEOUT: { label: '超时', color: '#ff4136' },
+  LOADING: { label: '模型加载中', color: 'var(--primary-color)' }
+};
+
+const TelemetryPanel = ({ cameraId, isDetecting, maxRate = 5 }) => {
+  const [sample, setSample] = useState(null);
+
+  // 订阅当前摄像头的逐帧状态，切换摄像头或停止检测时取消订阅
+  useEffect(() => {
+    if (!isDetecting) {
+      setSample(null);
+      return undefined;
+    }
+    return subscribeTelemetry(cameraId, { maxRate }, setSample);
+  }, [cameraId, isDetecting, maxRate]);
+
+  if (!isDetecting || !sample) return null;
+
+  const state = stateLabels[sample.state] || { label: sample.state, color: 'default' };
+
+  return (
+    <Paper
+      elevation={3}
+      sx={{
+        p: 2,
+        borderRadius: '16px',
+        backgroundColor: 'var(--card-color)',
+        border: '1px solid var(--border-color)'
+      }}
+    >
+      <Box sx={{ display: 'flex', alignItems: 'center', flexWrap: 'wrap', gap: 2 }}>
+        <Typography variant="subtitle1" sx={{ fontWeight: 'bold', color: 'var(--text-primary)' }}>
+          实时状态
+        </Typography>
+        <Chip label={state.label} size="small" sx={{ fontWeight: 'bold', backgroundColor: state.color }} />
+        <Chip
+          label={sample.motion ? `检测中 ${sample.elapsed.toFixed(1)}秒` : sample.idle ? '空闲' : '无运动'}
+          size="small"
+          variant="outlined"
+        />
+        <Typography variant="body2" sx={{ color: 'var(--text-secondary)' }}>
+          置信度阈值 {sample.conf.toFixed(2)}
+        </Typography>
+        <Typography variant="body2" sx={{ color: 'var(--text-secondary)' }}>
+          当前最高: {sample.topLabel ? `${sample.topLabel} (${(sample.topScore * 100).toFixed(1)}%)` : '无'}
+        </Typography>
+      </Box>
+      <Box sx={{ display: 'flex', alignItems: 'center', gap: 1, mt: 1 }}>
+        <Typography variant="body2" sx={{ color: 'var(--text-secondary)', whiteSpace: 'nowrap' }}>
+          运动区域 {(sample.motionRatio * 100).toFixed(1)}%
+        </Typography>
+        {/* 运动区域占比通常只有百分之几，按 10% 为满格显示 */}
+        <LinearProgress
+          variant="determinate"
+          value={Math.min(sample.motionRatio * 100 * 10, 100)}
+          sx={{ flexGrow: 1, height: 6, borderRadius: 3 }}
+        />
+      </Box>
+    </Paper>
+  );
+};
+
+export default TelemetryPanel;
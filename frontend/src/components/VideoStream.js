@@ -1,9 +1,14 @@
-import React, { useEffect, useRef } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { Paper, Box, Grid, Typography } from '@mui/material';
+import DetectionOverlay from './DetectionOverlay';
+import { subscribeVideo } from '../services/socketService';
 
-function VideoStream({ isDetecting, cameraId, streamKey }) {
-  const videoFeedUrl = isDetecting 
-    ? `${process.env.REACT_APP_API_URL || 'http://localhost:5000'}/video_feed?camera=${cameraId}&key=${streamKey}`
+function VideoStream({ isDetecting, cameraId, streamKey, overlayMode = 'server', transport = 'mjpeg' }) {
+  // WebSocket传输是否生效，未连接时退回MJPEG
+  const [socketActive, setSocketActive] = useState(false);
+
+  const videoFeedUrl = isDetecting && !socketActive
+    ? `${process.env.REACT_APP_API_URL || 'http://localhost:5000'}/video_feed?camera=${cameraId}&overlay=${overlayMode}&key=${streamKey}`
     : null;
     
   // 使用videos端点获取视频文件，确保使用绝对路径
@@ -12,6 +17,35 @@ function VideoStream({ isDetecting, cameraId, streamKey }) {
   // 添加对视频元素的引用
   const mainVideoRef = useRef(null);
   const secondaryVideoRef = useRef(null);
+  // 检测画面，浏览器绘制叠加层时用于对齐画布
+  const feedImageRef = useRef(null);
+  // 当前显示的视频帧序号，WebSocket传输时叠加层按序号选择对应的检测结果，MJPEG时为null
+  const frameSeqRef = useRef(null);
+
+  // WebSocket传输：收到的JPEG直接写入图片元素，不触发组件重新渲染
+  useEffect(() => {
+    if (!isDetecting || transport !== 'socket') {
+      setSocketActive(false);
+      return undefined;
+    }
+
+    let objectUrl = null;
+    const unsubscribe = subscribeVideo(cameraId, { overlay: overlayMode }, ({ seq, jpeg }) => {
+      if (!feedImageRef.current) return;
+      const url = URL.createObjectURL(new Blob([jpeg], { type: 'image/jpeg' }));
+      feedImageRef.current.src = url;
+      frameSeqRef.current = seq;
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+      objectUrl = url;
+    });
+    setSocketActive(unsubscribe !== null);
+
+    return () => {
+      if (unsubscribe) unsubscribe();
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+      frameSeqRef.current = null;
+    };
+  }, [isDetecting, transport, cameraId, overlayMode, streamKey]);
 
   // 使用useEffect钩子来确保视频加载并播放
   useEffect(() => {
@@ -116,17 +150,24 @@ function VideoStream({ isDetecting, cameraId, streamKey }) {
                 padding: '10px'
               }}
             >
-              <img 
-                src={videoFeedUrl} 
-                alt="视频流"
-                style={{ 
-                  maxWidth: '100%', 
-                  maxHeight: '100%', 
-                  objectFit: 'contain',
-                  borderRadius: '12px',
-                  boxShadow: '0 4px 8px rgba(247, 197, 197, 0.15)'
-                }}
-              />
+              <Box sx={{ position: 'relative', display: 'inline-block', maxWidth: '100%', maxHeight: '100%' }}>
+                <img 
+                  ref={feedImageRef}
+                  src={socketActive ? undefined : videoFeedUrl} 
+                  alt="视频流"
+                  style={{ 
+                    display: 'block',
+                    maxWidth: '100%', 
+                    maxHeight: '460px', 
+                    objectFit: 'contain',
+                    borderRadius: '12px',
+                    boxShadow: '0 4px 8px rgba(247, 197, 197, 0.15)'
+                  }}
+                />
+                {overlayMode === 'client' && (
+                  <DetectionOverlay cameraId={cameraId} imageRef={feedImageRef} frameSeqRef={frameSeqRef} />
+                )}
+              </Box>
             </Box>
           </Paper>
         </Grid>
@@ -39,13 +39,133 @@ export const initSocket = (onDetectionResult, onConnect, onDisconnect) => {
   });
 
   socket.on('detection_result', (data) => {
-    console.log('收到检测结果:', data);
     if (onDetectionResult) onDetectionResult(data);
   });
 
   return socket;
 };
 
+// 订阅逐帧检测数据（浏览器绘制叠加层模式），服务端只向订阅了该摄像头的客户端推送，返回取消订阅的函数
+export const subscribeFrameDetections = (cameraId, onFrameDetections) => {
+  if (!socket) return () => {};
+
+  const subscribe = () => socket.emit('subscribe_detections', { camera: cameraId });
+
+  const handler = (data) => {
+    if (data.camera_id === cameraId) onFrameDetections(data);
+  };
+  socket.on('frame_detections', handler);
+  // 重连后服务端的订阅已失效，需要重新订阅
+  socket.on('connect', subscribe);
+  if (socket.connected) subscribe();
+
+  return () => {
+    if (socket) {
+      socket.emit('unsubscribe_detections', { camera: cameraId });
+      socket.off('frame_detections', handler);
+      socket.off('connect', subscribe);
+    }
+  };
+};
+
+// 二进制视频帧头部长度：帧序号 (uint32)、摄像头ID (uint32)、时间戳 (float64)，小端
+const VIDEO_HEADER_SIZE = 16;
+
+// 通过WebSocket订阅二进制视频帧，返回取消订阅的函数
+export const subscribeVideo = (cameraId, { overlay = 'server', quality = 'auto' } = {}, onFrame) => {
+  if (!socket) return null;
+
+  const subscribe = () => socket.emit('subscribe_video', { camera: cameraId, overlay, quality });
+
+  const handler = (data, ack) => {
+    const view = new DataView(data);
+    const seq = view.getUint32(0, true);
+    const camera = view.getUint32(4, true);
+    const timestamp = view.getFloat64(8, true);
+    if (camera === cameraId) {
+      onFrame({ seq, timestamp, jpeg: data.slice(VIDEO_HEADER_SIZE) });
+    }
+    // 确认后服务端才发送下一帧
+    if (ack) ack(seq);
+  };
+
+  socket.on('video_frame', handler);
+  // 重连后服务端的订阅已失效，需要重新订阅
+  socket.on('connect', subscribe);
+  if (socket.connected) subscribe();
+
+  return () => {
+    if (socket) {
+      socket.emit('unsubscribe_video');
+      socket.off('video_frame', handler);
+      socket.off('connect', subscribe);
+    }
+  };
+};
+
+// 遥测消息的状态编码，与后端 telemetry.STATES 顺序一致
+const TELEMETRY_STATES = ['NORMAL', 'REDUCED_CONF', 'TIMEOUT', 'LOADING'];
+const NO_CLASS = 0xffff;
+
+// 解析36字节的二进制遥测消息（小端），格式见后端 telemetry.TELEMETRY_FORMAT
+const parseTelemetry = (data) => {
+  const view = new DataView(data);
+  const flags = view.getUint8(17);
+  const topCls = view.getUint16(30, true);
+  return {
+    seq: view.getUint32(0, true),
+    cameraId: view.getUint32(4, true),
+    timestamp: view.getFloat64(8, true),
+    state: TELEMETRY_STATES[view.getUint8(16)] || 'UNKNOWN',
+    motion: (flags & 1) !== 0,
+    idle: (flags & 2) !== 0,
+    conf: view.getFloat32(18, true),
+    motionRatio: view.getFloat32(22, true),
+    elapsed: view.getFloat32(26, true),
+    topCls: topCls === NO_CLASS ? null : topCls,
+    topScore: view.getFloat32(32, true)
+  };
+};
+
+// 订阅摄像头的逐帧状态，服务端最多按 maxRate 次/秒推送最新状态，返回取消订阅的函数
+export const subscribeTelemetry = (cameraId, { maxRate = 5 } = {}, onSample) => {
+  if (!socket) return () => {};
+
+  // 类别名称由订阅的确认回复提供，模型加载完成前为空
+  let names = [];
+  let pending = false;
+  const subscribe = () => {
+    pending = true;
+    socket.emit('subscribe_telemetry', { camera: cameraId, max_rate: maxRate }, (reply) => {
+      pending = false;
+      if (reply && reply.names) names = reply.names;
+    });
+  };
+
+  const handler = (data, ack) => {
+    const sample = parseTelemetry(data);
+    // 确认后服务端才发送下一条，期间的旧状态直接被丢弃
+    if (ack) ack(sample.seq);
+    if (sample.cameraId !== cameraId) return;
+    // 模型加载完成后重新获取类别名称
+    if (!names.length && sample.state !== 'LOADING' && !pending) subscribe();
+    onSample({ ...sample, topLabel: sample.topCls !== null ? names[sample.topCls] || String(sample.topCls) : null });
+  };
+
+  socket.on('telemetry', handler);
+  // 重连后需要重新加入房间
+  socket.on('connect', subscribe);
+  if (socket.connected) subscribe();
+
+  return () => {
+    if (socket) {
+      socket.emit('unsubscribe_telemetry', { camera: cameraId });
+      socket.off('telemetry', handler);
+      socket.off('connect', subscribe);
+    }
+  };
+};
+
 // 关闭WebSocket连接
 export const closeSocket = () => {
   if (socket) {
@@ -0,0 +1,115 @@
+import threading
+import time
+
+
+class Component:
+    __slots__ = ('name', 'required', 'check', 'state', 'error', 'ready_at', 'details')
+
+    def __init__(self, name, required, check):
+        self.name = name
+        self.required = required
+        self.check = check
+        self.state = 'pending'
+        self.error = None
+        self.ready_at = None
+        self.details = {}
+
+
+class StartupHealth:
+    """
+    记录各组件的启动状态和耗时，供 /healthz 和 /readyz 使用。
+
+    组件启动完成时调用 ready()，失败时调用 failed()；带有 check 的组件
+    （如串口）在就绪后仍按 check() 的结果报告当前是否可用。
+
+    参数:
+        started_at: 进程启动时间，默认为创建时
+    """
+
+    def __init__(self, started_at=None):
+        self.started_at = started_at or time.time()
+        self._components = {}
+        self._milestones = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, required=True, check=None):
+        """
+        登记一个组件。
+
+        参数:
+            name: 组件名
+            required: 为 True 时该组件就绪前 /readyz 返回未就绪
+            check: 返回组件当前是否可用的函数
+        """
+        with self._lock:
+            self._components[name] = Component(name, required, check)
+
+    def unregister(self, name):
+        with self._lock:
+            self._components.pop(name, None)
+
+    def ready(self, name, **details):
+        """组件启动完成，只记录第一次就绪的时间"""
+        with self._lock:
+            component = self._components.get(name)
+            if component is None:
+                # 组件已被注销（如站点已删除）
+                return
+            if component.ready_at is None:
+                component.ready_at = time.time()
+                print(f"{name} 已就绪 (启动后 {component.ready_at - self.started_at:.2f}秒)")
+            component.state = 'ready'
+            component.error = None
+            component.details.update(details)
+
+    def failed(self, name, error):
+        with self._lock:
+            component = self._components.get(name)
+            if component is None:
+                return
+            component.state = 'failed'
+            component.error = str(error)
+        print(f"{name} 启动失败: {error}")
+
+    def mark(self, milestone):
+        """记录启动过程中某个时间点，如服务开始监听"""
+        with self._lock:
+            self._milestones[milestone] = round(time.time() - self.started_at, 3)
+
+    def _is_ready(self, component):
+        if component.state != 'ready':
+            return False
+        return component.check is None or bool(component.check())
+
+    def is_ready(self):
+        with self._lock:
+            components = list(self._components.values())
+        return all(self._is_ready(c) for c in components if c.required)
+
+    def report(self):
+        """
+        返回:
+            dict: 是否就绪、启动至今秒数、各启动时间点和各组件状态
+        """
+        with self._lock:
+            components = list(self._components.values())
+            milestones = dict(self._milestones)
+        report = {}
+        for c in components:
+            ready = self._is_ready(c)
+            entry = {
+                'ready': ready,
+                'required': c.required,
+                'state': c.state if ready or c.state != 'ready' else 'unavailable',
+                'ready_after_s': round(c.ready_at - self.started_at, 3) if c.ready_at is not None else None,
+            }
+            if c.error:
+                entry['error'] = c.error
+            entry.update(c.details)
+            report[c.name] = entry
+        return {
+            'ready': all(entry['ready'] for entry in report.values() if entry['required']),
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'startup': milestones,
+            'components': report,
+        }
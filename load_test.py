@@ -0,0 +1,183 @@
+import argparse
+import http.client
+import json
+import sys
+import threading
+import time
+from urllib.parse import urlencode, urlparse
+
+import numpy as np
+
+BOUNDARY = b'--frame\r\n'
+
+
+class StreamClient:
+    """
+    一个 MJPEG 观看者：打开 /video_feed 并持续读取，按分隔符统计收到的帧数。
+
+    参数:
+        host, port: 服务地址
+        path: 请求路径（含查询参数）
+        stop: 停止事件
+    """
+
+    def __init__(self, host, port, path, stop):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.stop = stop
+        self.frames = 0
+        self.bytes = 0
+        self.first_frame_s = None
+        self.error = None
+        self.started_at = 0.0
+        self.ended_at = 0.0
+
+    def run(self):
+        self.started_at = time.time()
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=10)
+        try:
+            conn.request('GET', self.path)
+            response = conn.getresponse()
+            if response.status != 200:
+                raise RuntimeError(f"HTTP {response.status}")
+            tail = b''
+            while not self.stop.is_set():
+                chunk = response.read1(65536)
+                if not chunk:
+                    raise RuntimeError("服务端关闭了连接")
+                self.bytes += len(chunk)
+                # 分隔符可能跨两次读取，带上上一块的末尾一起查找
+                data = tail + chunk
+                count = data.count(BOUNDARY)
+                if count and self.first_frame_s is None:
+                    self.first_frame_s = time.time() - self.started_at
+                self.frames += count
+                tail = data[-(len(BOUNDARY) - 1):]
+        except Exception as e:
+            if not self.stop.is_set():
+                self.error = str(e)
+        finally:
+            self.ended_at = time.time()
+            conn.close()
+
+    @property
+    def fps(self):
+        # 从收到第一帧开始计算，不计入连接和等待首帧的时间
+        if self.first_frame_s is None:
+            return 0.0
+        elapsed = self.ended_at - self.started_at - self.first_frame_s
+        return self.frames / elapsed if elapsed > 0 else 0.0
+
+
+def fetch_stats(host, port):
+    conn = http.client.HTTPConnection(host, port, timeout=5)
+    try:
+        conn.request('GET', '/stats')
+        return json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+
+def run_load_test(url, clients=30, duration=30.0, camera=0, quality='low', overlay='server', ramp=0.05):
+    """
+    同时打开多个 MJPEG 观看者，统计每个观看者的帧率，并每秒采样服务端的线程数和内存。
+
+    参数:
+        url: 服务地址，如 http://localhost:5000
+        clients: 观看者数量
+        duration: 全部观看者连接后持续的秒数
+        camera: 摄像头ID
+        quality: 画质，见 /video_feed 的 quality 参数
+        overlay: 叠加层模式
+        ramp: 相邻两个观看者开始连接的间隔秒数
+
+    返回:
+        dict: 观看者帧率分位数、首帧延迟、错误数以及服务端线程数和内存峰值
+    """
+    parsed = urlparse(url)
+    host, port = parsed.hostname, parsed.port or 80
+    path = '/video_feed?' + urlencode({'camera': camera, 'quality': quality, 'overlay': overlay})
+    stop = threading.Event()
+
+    baseline = fetch_stats(host, port).get('process', {})
+    streams = [StreamClient(host, port, path, stop) for _ in range(clients)]
+    threads = []
+    for stream in streams:
+        thread = threading.Thread(target=stream.run, daemon=True)
+        thread.start()
+        threads.append(thread)
+        time.sleep(ramp)
+
+    samples = []
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        time.sleep(1.0)
+        try:
+            samples.append(fetch_stats(host, port).get('process', {}))
+        except Exception as e:
+            print(f"获取 /stats 失败: {e}")
+
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=15)
+
+    fps = np.array([s.fps for s in streams])
+    first = [s.first_frame_s for s in streams if s.first_frame_s is not None]
+    return {
+        'clients': clients,
+        'duration_s': duration,
+        'async_mode': baseline.get('async_mode'),
+        'errors': sum(1 for s in streams if s.error),
+        'no_frames': sum(1 for s in streams if not s.frames),
+        'frames': int(sum(s.frames for s in streams)),
+        'megabytes': round(sum(s.bytes for s in streams) / 1024 / 1024, 1),
+        'fps_min': round(float(fps.min()), 2) if clients else 0.0,
+        'fps_p50': round(float(np.percentile(fps, 50)), 2) if clients else 0.0,
+        'fps_mean': round(float(fps.mean()), 2) if clients else 0.0,
+        'first_frame_p95_s': round(float(np.percentile(first, 95)), 2) if first else None,
+        'server_threads_idle': baseline.get('threads'),
+        'server_threads_peak': max((s.get('threads', 0) for s in samples), default=None),
+        'server_rss_idle_mb': baseline.get('rss_mb'),
+        'server_rss_peak_mb': max((s.get('rss_mb', 0) for s in samples), default=None),
+        'error_messages': sorted({s.error for s in streams if s.error})[:5],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对正在运行的 app.py 做并发观看者压力测试')
+    parser.add_argument('--url', default='http://localhost:5000', help='服务地址 (默认: http://localhost:5000)')
+    parser.add_argument('--clients', type=int, default=30, help='同时观看的客户端数 (默认: 30)')
+    parser.add_argument('--duration', type=float, default=30, help='全部连接后持续的秒数 (默认: 30)')
+    parser.add_argument('--camera', type=int, default=0, help='摄像头ID (默认: 0)')
+    parser.add_argument('--quality', default='low', help='画质 auto/high/medium/low (默认: low)')
+    parser.add_argument('--overlay', default='server', help='叠加层模式 server/client (默认: server)')
+    parser.add_argument('--ramp', type=float, default=0.05, help='相邻客户端开始连接的间隔秒数 (默认: 0.05)')
+    parser.add_argument('--min-fps', type=float, default=0.0,
+                        help='任一客户端帧率低于该值或出现错误时以非零状态退出 (默认: 0，不检查)')
+    parser.add_argument('--output', help='把结果写入JSON文件')
+    args = parser.parse_args()
+
+    result = run_load_test(args.url, args.clients, args.duration, args.camera, args.quality,
+                           args.overlay, args.ramp)
+    print(f"\n服务模式: {result['async_mode']}, 客户端: {result['clients']}, 持续 {result['duration_s']}秒")
+    print(f"每客户端帧率: 最低 {result['fps_min']}, 中位数 {result['fps_p50']}, 平均 {result['fps_mean']} FPS")
+    print(f"总帧数: {result['frames']}, 总流量: {result['megabytes']} MB, 首帧延迟 P95: {result['first_frame_p95_s']}秒")
+    print(f"服务端线程数: 空闲 {result['server_threads_idle']} -> 峰值 {result['server_threads_peak']}")
+    print(f"服务端内存: 空闲 {result['server_rss_idle_mb']} MB -> 峰值 {result['server_rss_peak_mb']} MB")
+    print(f"出错的客户端: {result['errors']}, 没有收到画面的客户端: {result['no_frames']}")
+    for message in result['error_messages']:
+        print(f"  {message}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存至: {args.output}")
+
+    if args.min_fps > 0 and (result['errors'] or result['fps_min'] < args.min_fps):
+        print(f"\n未达到要求：存在出错的客户端或帧率低于 {args.min_fps} FPS")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import bisect
+import threading
+
+# 延迟直方图的默认分桶（秒），覆盖从亚毫秒的绘制到数百毫秒的推理
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """指标基类，记录时只做一次加锁的字典更新，格式化推迟到被抓取时"""
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def samples(self):
+        """返回 [(名称后缀, 标签值, 额外标签, 数值)]"""
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, values, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, values, extra)} {_format_value(value)}")
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """只增不减的计数器"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items(), key=lambda kv: tuple(map(str, kv[0])))
+        if not items and not self.labelnames:
+            items = [((), 0)]
+        return [('', values, None, value) for values, value in items]
+
+
+class Gauge(Metric):
+    """
+    可增可减的数值。指定 func 时在被抓取时调用它取值，记录端不需要任何开销。
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, func=None):
+        super().__init__(name, documentation)
+        self.func = func
+        self._value = 0
+
+    def set(self, value):
+        self._value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def samples(self):
+        value = self.func() if self.func is not None else self._value
+        return [('', (), None, value)]
+
+
+class Histogram(Metric):
+    """累积分桶直方图，记录时只定位一个分桶并加一"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def samples(self):
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        samples = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float('inf'),), counts):
+            cumulative += n
+            samples.append(('_bucket', (), ('le', _format_value(float(bound))), cumulative))
+        samples.append(('_sum', (), None, total))
+        samples.append(('_count', (), None, count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """按 Prometheus 文本格式输出所有指标"""
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, func=None):
+    return REGISTRY.register(Gauge(name, documentation, func))
+
+
+def histogram(name, documentation, buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, documentation, buckets))
+
+
+# 检测流程各阶段耗时
+CAPTURE_SECONDS = histogram('trash_capture_seconds', '从摄像头读取一帧的耗时')
+MOTION_SECONDS = histogram('trash_motion_seconds', '运动检测耗时')
+INFERENCE_SECONDS = histogram('trash_inference_seconds', '模型推理耗时')
+DRAWING_SECONDS = histogram('trash_drawing_seconds', '绘制检测框和状态的耗时')
+ENCODING_SECONDS = histogram('trash_encoding_seconds', 'JPEG编码耗时')
+
+FRAMES = counter('trash_frames_total', '检测流程处理的帧数', ('camera',))
+DETECTIONS = counter('trash_detections_total', '检测到的目标数', ('label',))
+SENDS = counter('trash_sends_total', '发送给前端和Arduino的分类结果数')
+COOLDOWN_SUPPRESSED = counter('trash_cooldown_suppressed_total', '冷却期内被跳过的发送次数')
+TRACKED_FRAMES = counter('trash_tracked_frames_total', '由光流跟踪得到检测框、没有运行模型的帧数')
+TIMEOUT_FALLBACKS = counter('trash_timeout_fallbacks_total', '超时后使用默认分类的次数')
+SCENE_CACHE_LOOKUPS = counter('trash_scene_cache_lookups_total', '画面缓存查找次数，按是否命中区分', ('result',))
+
+SOCKET_CLIENTS = gauge('trash_socketio_clients', '已连接的 Socket.IO 客户端数')
@@ -0,0 +1,224 @@
+import cv2
+import numpy as np
+import time
+
+
+class MotionGate:
+    """
+    运动门控：只在投放口有运动时运行推理。
+
+    运动结束后继续推理 tail 秒，空闲时每隔 keepalive_interval 秒做一次保活推理，
+    其余帧跳过推理以节省CPU。
+
+    参数:
+        enabled: 是否启用门控，关闭时每帧都推理
+        tail: 运动结束后继续推理的秒数
+        keepalive_interval: 空闲时保活推理的间隔（秒），0 表示空闲时不推理
+    """
+
+    def __init__(self, enabled=False, tail=3.0, keepalive_interval=5.0):
+        self.enabled = enabled
+        self.tail = tail
+        self.keepalive_interval = keepalive_interval
+
+        self.last_motion_time = 0.0
+        self.last_inference_time = 0.0
+
+        # 统计计数器
+        self.inferences_run = 0
+        self.inferences_skipped = 0
+        self.keepalive_runs = 0
+
+    def should_infer(self, moving, now=None):
+        """根据本帧是否有运动，判断是否需要推理"""
+        if now is None:
+            now = time.time()
+        if moving:
+            self.last_motion_time = now
+
+        if not self.enabled or now - self.last_motion_time <= self.tail:
+            run = True
+        elif self.keepalive_interval > 0 and now - self.last_inference_time >= self.keepalive_interval:
+            run = True
+            self.keepalive_runs += 1
+        else:
+            run = False
+
+        if run:
+            self.last_inference_time = now
+            self.inferences_run += 1
+        else:
+            self.inferences_skipped += 1
+        return run
+
+    def is_idle(self, now=None):
+        """当前是否处于空闲（跳过推理）阶段"""
+        if now is None:
+            now = time.time()
+        return self.enabled and now - self.last_motion_time > self.tail
+
+    def stats(self):
+        total = self.inferences_run + self.inferences_skipped
+        return {
+            'enabled': self.enabled,
+            'inferences_run': self.inferences_run,
+            'inferences_skipped': self.inferences_skipped,
+            'keepalive_runs': self.keepalive_runs,
+            'skip_ratio': round(self.inferences_skipped / total, 4) if total else 0.0,
+        }
+
+
+class FrameDifferenceDetector:
+    """
+    帧差法运动检测：当前帧与上一帧做差，统计变化像素占比。
+
+    参数:
+        threshold: 像素差阈值
+        dilation: 膨胀次数
+        blur_size: 高斯模糊核大小
+    """
+
+    def __init__(self, threshold=30, dilation=2, blur_size=21):
+        self.threshold = threshold
+        self.dilation = dilation
+        self.blur_size = blur_size
+        self.prev_frame = None
+        self.mask = None  # 最近一次的运动掩码，用于调试显示
+
+    def update(self, frame):
+        """
+        输入一帧，返回 (移动像素占比, 运动轮廓列表)。第一帧返回 (0.0, [])。
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        gray = cv2.GaussianBlur(gray, (self.blur_size, self.blur_size), 0)
+
+        # 第一帧无法比较，直接设置为第一帧
+        if self.prev_frame is None:
+            self.prev_frame = gray
+            return 0.0, []
+
+        # 计算当前帧与上一帧的差异
+        frame_delta = cv2.absdiff(self.prev_frame, gray)
+        thresh = cv2.threshold(frame_delta, self.threshold, 255, cv2.THRESH_BINARY)[1]
+
+        # 扩大白色区域以填补空隙
+        thresh = cv2.dilate(thresh, None, iterations=self.dilation)
+
+        # 找到轮廓
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        # 计算移动像素占比
+        total_pixels = thresh.shape[0] * thresh.shape[1]
+        movement_ratio = cv2.countNonZero(thresh) / total_pixels
+
+        # 更新上一帧
+        self.prev_frame = gray
+        self.mask = thresh
+        return movement_ratio, contours
+
+
+class BackgroundMotionDetector:
+    """
+    背景模型运动检测：在缩小的灰度图上维护滑动平均背景，当前帧与背景做差。
+
+    与帧差法相比，缓慢移动的物体与背景的差异会逐帧累积，不会因为相邻两帧几乎相同而漏检；
+    所有运算都在缩小后的图像上进行，每帧开销小得多。返回的轮廓已换算回原图坐标。
+
+    参数:
+        threshold: 像素差阈值
+        dilation: 膨胀次数（在缩小图上）
+        scale: 缩放比例
+        learning_rate: 背景更新速率，越大背景越快吸收静止下来的物体
+        blur_size: 高斯模糊核大小（在缩小图上）
+    """
+
+    def __init__(self, threshold=30, dilation=1, scale=0.25, learning_rate=0.02, blur_size=5):
+        self.threshold = threshold
+        self.dilation = dilation
+        self.scale = scale
+        self.learning_rate = learning_rate
+        self.blur_size = blur_size
+        self.background = None
+        self.mask = None  # 最近一次的运动掩码（缩小图），用于调试显示
+
+    def reset(self):
+        self.background = None
+
+    def update(self, frame):
+        """
+        输入一帧，返回 (移动像素占比, 运动轮廓列表)。第一帧返回 (0.0, [])。
+        """
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        if self.blur_size > 1:
+            gray = cv2.GaussianBlur(gray, (self.blur_size, self.blur_size), 0)
+
+        if self.background is None:
+            self.background = gray.astype(np.float32)
+            self.mask = np.zeros_like(gray)
+            return 0.0, []
+
+        delta = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+        mask = cv2.threshold(delta, self.threshold, 255, cv2.THRESH_BINARY)[1]
+        if self.dilation > 0:
+            mask = cv2.dilate(mask, None, iterations=self.dilation)
+        cv2.accumulateWeighted(gray, self.background, self.learning_rate)
+        self.mask = mask
+
+        movement_ratio = cv2.countNonZero(mask) / mask.size
+        if movement_ratio == 0:
+            return 0.0, []
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        inv = 1.0 / self.scale
+        return movement_ratio, [(c * inv).astype(np.int32) for c in contours]
+
+
+# 运动检测引擎：diff 为相邻帧差，background 为缩小图上的背景模型
+MOTION_ENGINES = ('background', 'diff')
+
+
+def create_motion_detector(engine='background', threshold=30, dilation=None, learning_rate=0.02):
+    """按名称创建运动检测器，dilation 为 None 时使用各引擎的默认值"""
+    if engine == 'diff':
+        return FrameDifferenceDetector(threshold, 2 if dilation is None else dilation)
+    if engine == 'background':
+        return BackgroundMotionDetector(threshold, 1 if dilation is None else dilation, learning_rate=learning_rate)
+    raise ValueError(f"未知的运动检测引擎: {engine}，可选: {', '.join(MOTION_ENGINES)}")
+
+
+def motion_roi(contours, frame_shape, padding=32, stride=32, min_area=100, min_size=160):
+    """
+    计算运动轮廓的外接矩形并集，向外扩展 padding 后对齐到模型步长。
+
+    参数:
+        contours: 运动轮廓列表
+        frame_shape: 原始帧的 shape
+        padding: 向外扩展的像素数
+        stride: 模型步长，裁剪区域的宽高对齐到它的整数倍
+        min_area: 小于该面积的轮廓视为噪声
+        min_size: 裁剪区域的最小边长
+
+    返回:
+        tuple: (x1, y1, x2, y2)，没有有效轮廓时返回 None
+    """
+    rects = [cv2.boundingRect(c) for c in contours if cv2.contourArea(c) > min_area]
+    if not rects:
+        return None
+
+    height, width = frame_shape[:2]
+    x1 = min(x for x, _, _, _ in rects) - padding
+    y1 = min(y for _, y, _, _ in rects) - padding
+    x2 = max(x + w for x, _, w, _ in rects) + padding
+    y2 = max(y + h for _, y, _, h in rects) + padding
+
+    def snap(lo, hi, limit):
+        # 把区间扩展到 stride 的整数倍且不小于 min_size，超出边界时向内平移
+        size = max(hi - lo, min_size)
+        size = min(-(-size // stride) * stride, limit)
+        center = (lo + hi) // 2
+        lo = min(max(center - size // 2, 0), limit - size)
+        return lo, lo + size
+
+    x1, x2 = snap(x1, x2, width)
+    y1, y2 = snap(y1, y2, height)
+    return x1, y1, x2, y2
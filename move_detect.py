@@ -1,13 +1,22 @@
 import cv2
 import numpy as np
+import argparse
+import csv
+import itertools
+import json
+import os
 import time
+from multiprocessing import Pool
+from common import find_videos
+from motion import MOTION_ENGINES, create_motion_detector
 
 def nothing(x):
     pass
 
-def main():
+def live_tuning(args):
+    """在摄像头画面上用滑块实时调参"""
     # 打开摄像头
-    cap = cv2.VideoCapture(1)
+    cap = cv2.VideoCapture(args.camera)
     if not cap.isOpened():
         print("无法打开摄像头")
         return
@@ -20,10 +29,11 @@ def main():
     cv2.namedWindow('Motion Detection')
     cv2.createTrackbar('Threshold', 'Motion Detection', 30, 100, nothing)
     cv2.createTrackbar('Area Ratio (%)', 'Motion Detection', 2, 10, nothing)
-    cv2.createTrackbar('Dilation', 'Motion Detection', 2, 10, nothing)
+    cv2.createTrackbar('Dilation', 'Motion Detection', 1 if args.engine == 'background' else 2, 10, nothing)
+    cv2.createTrackbar('Learn Rate (%)', 'Motion Detection', 2, 20, nothing)
     
     # 初始化变量
-    prev_frame = None
+    detector = create_motion_detector(args.engine)
     motion_detected = False
     motion_start_time = 0
     
@@ -40,44 +50,23 @@ def main():
         motion_threshold = cv2.getTrackbarPos('Threshold', 'Motion Detection')
         motion_area_ratio = cv2.getTrackbarPos('Area Ratio (%)', 'Motion Detection') / 100.0
         dilation_iterations = cv2.getTrackbarPos('Dilation', 'Motion Detection')
+        learning_rate = max(cv2.getTrackbarPos('Learn Rate (%)', 'Motion Detection'), 1) / 100.0
         
         # 制作一个显示用的帧
         display_frame = frame.copy()
         
-        # 第一帧无法比较，直接设置为第一帧
-        if prev_frame is None:
-            prev_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            prev_frame = cv2.GaussianBlur(prev_frame, (21, 21), 0)
-            continue
-        
-        # 将当前帧转为灰度并模糊化
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        gray = cv2.GaussianBlur(gray, (21, 21), 0)
-        
-        # 计算当前帧与上一帧的差异
-        frame_delta = cv2.absdiff(prev_frame, gray)
-        thresh = cv2.threshold(frame_delta, motion_threshold, 255, cv2.THRESH_BINARY)[1]
-        
-        # 扩大白色区域以填补空隙
-        thresh = cv2.dilate(thresh, None, iterations=dilation_iterations)
-        
-        # 找到轮廓
-        contours, _ = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        # 运动检测，第一帧返回 0
+        detector.threshold = motion_threshold
+        detector.dilation = dilation_iterations
+        detector.learning_rate = learning_rate
+        movement_ratio, contours = detector.update(frame)
         
-        # 计算移动像素占比
-        total_pixels = thresh.shape[0] * thresh.shape[1]
-        white_pixels = cv2.countNonZero(thresh)
-        movement_ratio = white_pixels / total_pixels
-        
-        # 在显示帧上绘制轮廓
+        # 在显示帧上绘制轮廓（已换算为原图坐标）
         for contour in contours:
             if cv2.contourArea(contour) > 100:  # 过滤小轮廓
                 (x, y, w, h) = cv2.boundingRect(contour)
                 cv2.rectangle(display_frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
         
-        # 更新上一帧
-        prev_frame = gray
-        
         # 如果移动区域比例超过阈值，则认为检测到运动
         if movement_ratio > motion_area_ratio:
             if not motion_detected:
@@ -103,9 +92,10 @@ def main():
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
         
         # 创建可视化显示
-        # 将thresh转换为彩色以便叠加显示
+        # 将运动掩码放大并转换为彩色以便并排显示
+        thresh = detector.mask if detector.mask is not None else np.zeros(frame.shape[:2], np.uint8)
+        thresh = cv2.resize(thresh, (frame.shape[1], frame.shape[0]), interpolation=cv2.INTER_NEAREST)
         thresh_color = cv2.cvtColor(thresh, cv2.COLOR_GRAY2BGR)
-        delta_color = cv2.cvtColor(frame_delta, cv2.COLOR_GRAY2BGR)
         
         # 水平拼接原始帧和阈值帧
         top_row = np.hstack((display_frame, thresh_color))
@@ -119,5 +109,158 @@ def main():
     cap.release()
     cv2.destroyAllWindows()
 
+def load_labels(clip):
+    """
+    读取片段旁边的标注文件 (同名 .json)，格式为 {"events": [[开始秒, 结束秒], ...]}，
+    每个区间表示一次投放。没有标注文件时视为整段都不应触发。
+    """
+    path = os.path.splitext(clip)[0] + '.json'
+    if not os.path.exists(path):
+        print(f"{clip} 没有标注文件，整段按无投放处理")
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [tuple(event) for event in json.load(f).get('events', [])]
+
+
+def _init_worker():
+    # 每个进程只用一个线程，由进程数决定并行度
+    cv2.setNumThreads(1)
+
+
+def movement_series(task):
+    """
+    在一个片段上运行一组运动检测参数，返回逐帧的移动区域占比。
+
+    面积占比阈值只作用在结果上，不需要为每个占比重新解码和检测。
+    """
+    clip, engine, threshold, dilation = task
+    detector = create_motion_detector(engine, threshold, dilation)
+    cap = cv2.VideoCapture(clip)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    ratios = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        ratio, _ = detector.update(cv2.resize(frame, (640, 480)))
+        ratios.append(ratio)
+    cap.release()
+    return task, fps, np.array(ratios, np.float32)
+
+
+def score_triggers(ratios, fps, events, area_ratio, tolerance=1.0):
+    """
+    统计一个片段在某个面积占比阈值下的表现。
+
+    返回:
+        tuple: (检出的投放数, 投放总数, 各次投放的触发延迟列表, 误触发次数, 无投放时长秒数)
+    """
+    moving = ratios > area_ratio
+    times = np.arange(len(ratios)) / fps
+    # 上升沿即一次触发
+    onsets = times[np.flatnonzero(moving & ~np.concatenate(([False], moving[:-1])))]
+
+    latencies = []
+    inside = np.zeros(len(ratios), bool)
+    for start, end in events:
+        window = (times >= start) & (times <= end + tolerance)
+        inside |= (times >= start - tolerance) & (times <= end + tolerance)
+        hits = np.flatnonzero(window & moving)
+        if len(hits):
+            latencies.append(max(times[hits[0]] - start, 0.0))
+
+    false_triggers = sum(1 for t in onsets if not inside[min(int(round(t * fps)), len(inside) - 1)])
+    idle_seconds = (~inside).sum() / fps
+    return len(latencies), len(events), latencies, false_triggers, idle_seconds
+
+
+def sweep(args):
+    """回放标注片段，多进程遍历运动检测参数组合"""
+    clips = find_videos(args.sweep)
+    if not clips:
+        print("没有找到视频片段")
+        return
+    labels = {clip: load_labels(clip) for clip in clips}
+    tasks = list(itertools.product(clips, args.engines, args.thresholds, args.dilations))
+    print(f"{len(clips)} 个片段，{len(tasks) // len(clips)} 组检测参数 x {len(args.area_ratios)} 个面积占比，"
+          f"使用 {args.workers or os.cpu_count()} 个进程")
+
+    # (engine, threshold, dilation, area_ratio) -> 汇总
+    totals = {}
+    start = time.time()
+    with Pool(args.workers or None, initializer=_init_worker) as pool:
+        for (clip, engine, threshold, dilation), fps, ratios in pool.imap_unordered(movement_series, tasks):
+            for area_ratio in args.area_ratios:
+                detected, events, latencies, false_triggers, idle = score_triggers(
+                    ratios, fps, labels[clip], area_ratio, args.tolerance)
+                total = totals.setdefault((engine, threshold, dilation, area_ratio),
+                                          {'detected': 0, 'events': 0, 'latencies': [], 'false': 0, 'idle': 0.0})
+                total['detected'] += detected
+                total['events'] += events
+                total['latencies'].extend(latencies)
+                total['false'] += false_triggers
+                total['idle'] += idle
+    print(f"完成，用时 {time.time() - start:.1f}秒")
+
+    rows = []
+    for (engine, threshold, dilation, area_ratio), t in totals.items():
+        latencies = np.array(t['latencies']) * 1000
+        rows.append({
+            'engine': engine,
+            'threshold': threshold,
+            'dilation': dilation,
+            'area_ratio': area_ratio,
+            'recall': round(t['detected'] / t['events'], 3) if t['events'] else None,
+            'median_latency_ms': round(float(np.median(latencies)), 1) if len(latencies) else None,
+            'p95_latency_ms': round(float(np.percentile(latencies, 95)), 1) if len(latencies) else None,
+            'false_triggers': t['false'],
+            'false_per_min': round(t['false'] / t['idle'] * 60, 2) if t['idle'] > 0 else 0.0,
+        })
+    # 先看检出率，再看误触发，最后看延迟
+    rows.sort(key=lambda r: (-(r['recall'] or 0), r['false_per_min'],
+                             r['median_latency_ms'] if r['median_latency_ms'] is not None else float('inf')))
+
+    print(f"\n{'引擎':<12}{'阈值':>6}{'膨胀':>6}{'面积占比':>10}{'检出率':>8}{'延迟中位(ms)':>14}{'P95(ms)':>10}{'误触发/分钟':>12}")
+    for r in rows[:args.top]:
+        fmt = lambda v: '-' if v is None else v
+        print(f"{r['engine']:<12}{r['threshold']:>6}{r['dilation']:>6}{r['area_ratio']:>10}{fmt(r['recall']):>8}"
+              f"{fmt(r['median_latency_ms']):>14}{fmt(r['p95_latency_ms']):>10}{r['false_per_min']:>12}")
+
+    if args.output:
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"全部结果已保存至: {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='运动检测调参工具')
+    parser.add_argument('--camera', type=int, default=1, help='摄像头ID (默认: 1)')
+    parser.add_argument('--engine', default='background', choices=MOTION_ENGINES,
+                        help='运动检测引擎：background 背景模型，diff 相邻帧差 (默认: background)')
+    # 离线参数扫描
+    parser.add_argument('--sweep', nargs='+', metavar='CLIP',
+                        help='回放标注片段（文件或目录）做离线参数扫描，不打开摄像头和窗口')
+    parser.add_argument('--engines', nargs='+', default=list(MOTION_ENGINES), choices=MOTION_ENGINES,
+                        help='扫描的运动检测引擎 (默认: 全部)')
+    parser.add_argument('--thresholds', type=int, nargs='+', default=[15, 20, 25, 30, 40],
+                        help='扫描的像素差阈值 (默认: 15 20 25 30 40)')
+    parser.add_argument('--area-ratios', type=float, nargs='+', default=[0.005, 0.01, 0.02, 0.03, 0.05],
+                        help='扫描的移动区域占比阈值 (默认: 0.005 0.01 0.02 0.03 0.05)')
+    parser.add_argument('--dilations', type=int, nargs='+', default=[0, 1, 2],
+                        help='扫描的膨胀次数 (默认: 0 1 2)')
+    parser.add_argument('--tolerance', type=float, default=1.0,
+                        help='标注区间前后的容差秒数，其中的触发不算误触发 (默认: 1)')
+    parser.add_argument('--workers', type=int, default=0, help='进程数 (默认: CPU核心数)')
+    parser.add_argument('--top', type=int, default=15, help='显示排名前几的参数组合 (默认: 15)')
+    parser.add_argument('--output', help='把全部结果写入CSV文件')
+    args = parser.parse_args()
+
+    if args.sweep:
+        sweep(args)
+    else:
+        live_tuning(args)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
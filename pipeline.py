@@ -0,0 +1,351 @@
+import threading
+import time
+
+from capture import LatestFrameCapture
+from encoding import EncodedFrameCache, FrameEncoder, parse_quality
+
+
+# 叠加层绘制方式：server 在服务端把检测框画进画面，client 由浏览器根据检测数据绘制
+OVERLAY_MODES = ('server', 'client')
+
+
+class FramePacket:
+    """
+    一帧的广播内容。画面在检测循环中不编码，由观看者按需取用各画质档位的JPEG，
+    同一档位只编码一次。
+
+    属性:
+        raw: 未绘制叠加层的画面，没有 client 模式观看者时为 None
+        annotated: 已绘制叠加层的画面，没有 server 模式观看者时为 None
+    """
+
+    __slots__ = ('raw', 'annotated', '_caches')
+
+    def __init__(self, raw=None, annotated=None):
+        self.raw = raw
+        self.annotated = annotated
+        self._caches = {
+            'client': EncodedFrameCache(raw) if raw is not None else None,
+            'server': EncodedFrameCache(annotated) if annotated is not None else None,
+        }
+
+    def jpeg(self, overlay, tier, encoder):
+        """
+        返回该叠加层模式、该档位JPEG的 Future，本帧没有该模式的画面时返回 None。
+        """
+        cache = self._caches.get(overlay)
+        return cache.get(tier, encoder) if cache is not None else None
+
+
+class FrameBroadcaster:
+    """
+    保存最新一帧处理结果，并唤醒所有等待的观看者。
+
+    只保留最新结果，慢速的观看者会自然跳过中间帧，不会积压。
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._data = None
+        self._closed = False
+
+    def publish(self, data):
+        with self._cond:
+            self._seq += 1
+            self._data = data
+            self._cond.notify_all()
+
+    def wait(self, last_seq, timeout=1.0):
+        """
+        等待比 last_seq 更新的结果。
+
+        返回:
+            tuple: (seq, data)，超时或已关闭时 data 为 None
+        """
+        with self._cond:
+            if self._seq <= last_seq and not self._closed:
+                self._cond.wait(timeout)
+            if self._seq <= last_seq:
+                return last_seq, None
+            return self._seq, self._data
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    @property
+    def seq(self):
+        """最近一次发布的帧序号"""
+        return self._seq
+
+
+class DetectionPipeline:
+    """
+    单个摄像头的检测流程：采集 -> 处理 -> 广播。
+
+    第一个观看者订阅时启动，最后一个观看者离开并经过宽限期后自动停止，
+    无论多少人观看，每帧只做一次推理。只有存在 server 模式的观看者时才绘制叠加层。
+    调用 hold() 后即使没有观看者也保持运行，直到 release()。
+
+    参数:
+        camera_id: 摄像头ID
+        process_frame: 处理函数 process_frame(frame, camera_id, overlays, seq)，
+            overlays 为当前有观看者的叠加层模式集合，seq 为该帧发布后的帧序号，返回 FramePacket
+        grace_period: 无人观看后继续运行的秒数
+        on_stop: 流程结束时的回调，参数为流程本身
+        encoder: JPEG 编码线程池，多个流程可共享
+        sleep: 协作式让出函数（如 eventlet.sleep）。设置后观看者轮询新帧而不阻塞在系统锁上
+        poll_interval: 轮询间隔秒数
+    """
+
+    def __init__(self, camera_id, process_frame, grace_period=5.0, on_stop=None, encoder=None,
+                 sleep=None, poll_interval=0.01):
+        self.camera_id = camera_id
+        self.process_frame = process_frame
+        self.grace_period = grace_period
+        self.on_stop = on_stop
+        self.encoder = encoder or FrameEncoder()
+        self.sleep = sleep
+        self.poll_interval = poll_interval
+
+        self.capture = LatestFrameCapture(camera_id, 640, 480)
+        self.broadcaster = FrameBroadcaster()
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._subscribers = 0
+        self._holds = 0
+        self._viewers = dict.fromkeys(OVERLAY_MODES, 0)
+        self._idle_since = None
+        self._stopped = False
+
+        self._qualities = {}
+
+        self.frames_processed = 0
+        self.started_at = 0.0
+        self.frame_interval = 0.0
+
+    @property
+    def stopped(self):
+        return self._stopped
+
+    @property
+    def subscribers(self):
+        return self._subscribers
+
+    def _acquire(self, overlay):
+        """登记一个观看者，流程已停止时返回 False"""
+        with self._lock:
+            if self._stopped:
+                return False
+            self._subscribers += 1
+            self._viewers[overlay] += 1
+            self._start_locked()
+            return True
+
+    def _start_locked(self):
+        self._idle_since = None
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"pipeline-{self.camera_id}", daemon=True)
+            self._thread.start()
+
+    def _release(self, overlay):
+        with self._lock:
+            self._subscribers -= 1
+            self._viewers[overlay] -= 1
+            if self._subscribers == 0 and self._holds == 0:
+                self._idle_since = time.time()
+
+    def hold(self):
+        """没有观看者时也保持运行，直到 release()，流程已停止时返回 False"""
+        with self._lock:
+            if self._stopped:
+                return False
+            self._holds += 1
+            self._start_locked()
+            return True
+
+    def release(self):
+        with self._lock:
+            self._holds -= 1
+            if self._subscribers == 0 and self._holds == 0:
+                self._idle_since = time.time()
+
+    def subscribe(self, overlay='server', quality='auto'):
+        """
+        作为观看者订阅处理结果。
+
+        参数:
+            overlay: 叠加层模式，见 OVERLAY_MODES
+            quality: 画质，auto 根据观看者的消费速度自适应，见 encoding.parse_quality
+
+        返回:
+            generator: 逐个产出 (帧序号, JPEG字节)；流程未能订阅时返回 None
+        """
+        if not self._acquire(overlay):
+            return None
+        return self._frames(overlay, parse_quality(quality))
+
+    def _frames(self, overlay, quality):
+        key = id(quality)
+        self._qualities[key] = quality
+        try:
+            last_seq = 0
+            while not self.broadcaster.closed:
+                if self.sleep is None:
+                    last_seq, packet = self.broadcaster.wait(last_seq)
+                else:
+                    # 协作式模式：检查一次后让出，不阻塞事件循环
+                    last_seq, packet = self.broadcaster.wait(last_seq, timeout=0)
+                    if packet is None:
+                        self.sleep(self.poll_interval)
+                        continue
+                # 刚订阅时当前帧可能还没有该模式的画面，等下一帧
+                future = packet.jpeg(overlay, quality.tier, self.encoder) if packet is not None else None
+                if future is None:
+                    continue
+                if self.sleep is not None:
+                    while not future.done():
+                        self.sleep(self.poll_interval)
+                data = future.result()
+                # 生成器恢复执行时，上一帧已写入客户端连接，以此衡量观看者的消费速度
+                sent_at = time.perf_counter()
+                yield last_seq, data
+                quality.update(time.perf_counter() - sent_at, self.frame_interval)
+        finally:
+            self._qualities.pop(key, None)
+            self._release(overlay)
+
+    def overlays(self):
+        """当前有观看者的叠加层模式"""
+        with self._lock:
+            return {mode for mode, count in self._viewers.items() if count > 0}
+
+    def _should_stop(self):
+        with self._lock:
+            if self._subscribers > 0 or self._holds > 0 or self._idle_since is None:
+                return False
+            if time.time() - self._idle_since < self.grace_period:
+                return False
+            self._stopped = True
+            return True
+
+    def _run(self):
+        self.started_at = time.time()
+        try:
+            if not self.capture.start():
+                return
+            print(f"摄像头 {self.camera_id} 检测流程已启动")
+
+            last_publish = 0.0
+            while self.capture.is_running() and not self._should_stop():
+                success, frame = self.capture.read()
+                if not success:
+                    continue
+                # 只有本线程发布，处理结果发布后的序号即为当前序号加一
+                packet = self.process_frame(frame, self.camera_id, self.overlays(), self.broadcaster.seq + 1)
+                self.frames_processed += 1
+                now = time.perf_counter()
+                if last_publish:
+                    interval = now - last_publish
+                    self.frame_interval = interval if not self.frame_interval else \
+                        0.9 * self.frame_interval + 0.1 * interval
+                last_publish = now
+                if packet is not None:
+                    self.broadcaster.publish(packet)
+        except Exception as e:
+            print(f"摄像头 {self.camera_id} 检测流程发生错误: {e}")
+        finally:
+            with self._lock:
+                self._stopped = True
+            self.broadcaster.close()
+            self.capture.stop()
+            print(f"摄像头 {self.camera_id} 检测流程已停止")
+            if self.on_stop is not None:
+                self.on_stop(self)
+
+    def stats(self):
+        elapsed = time.time() - self.started_at if self.started_at else 0
+        stats = {
+            'camera_id': self.camera_id,
+            'subscribers': self._subscribers,
+            'held': self._holds > 0,
+            'viewers': dict(self._viewers),
+            'frames_processed': self.frames_processed,
+            'fps': round(self.frames_processed / elapsed, 2) if elapsed > 0 else 0.0,
+            'viewer_tiers': [q.tier for q in list(self._qualities.values())],
+        }
+        stats.update(self.capture.stats())
+        return stats
+
+
+class PipelineRegistry:
+    """
+    按摄像头ID管理检测流程单例。
+
+    参数:
+        process_frame: 传给每个流程的处理函数
+        grace_period: 无人观看后的停止宽限期（秒）
+        encoder: 所有流程共享的 JPEG 编码线程池
+        sleep: 协作式让出函数，见 DetectionPipeline
+        on_stop: 某个摄像头的流程停止且没有新流程接替时的回调，参数为摄像头ID
+    """
+
+    def __init__(self, process_frame, grace_period=5.0, encoder=None, sleep=None, on_stop=None):
+        self.process_frame = process_frame
+        self.grace_period = grace_period
+        self.encoder = encoder or FrameEncoder()
+        self.sleep = sleep
+        self.on_stop = on_stop
+        self._lock = threading.Lock()
+        self._pipelines = {}
+
+    def _get(self, camera_id):
+        """返回指定摄像头的流程，不存在或已停止时新建一个"""
+        with self._lock:
+            pipeline = self._pipelines.get(camera_id)
+            if pipeline is None or pipeline.stopped:
+                pipeline = DetectionPipeline(camera_id, self.process_frame, self.grace_period,
+                                             self._on_stop, self.encoder, self.sleep)
+                self._pipelines[camera_id] = pipeline
+            return pipeline
+
+    def subscribe(self, camera_id, overlay='server', quality='auto'):
+        """订阅指定摄像头的流程"""
+        while True:
+            frames = self._get(camera_id).subscribe(overlay, quality)
+            if frames is not None:
+                return frames
+
+    def hold(self, camera_id):
+        """
+        在没有观看者时保持指定摄像头的流程运行。
+
+        返回:
+            DetectionPipeline: 被保持的流程，不再需要时调用其 release()
+        """
+        while True:
+            pipeline = self._get(camera_id)
+            if pipeline.hold():
+                return pipeline
+
+    def _on_stop(self, pipeline):
+        with self._lock:
+            if self._pipelines.get(pipeline.camera_id) is not pipeline:
+                return
+            del self._pipelines[pipeline.camera_id]
+        if self.on_stop is not None:
+            self.on_stop(pipeline.camera_id)
+
+    def pipelines(self):
+        with self._lock:
+            return list(self._pipelines.values())
+
+    def stats(self):
+        return [pipeline.stats() for pipeline in self.pipelines()]
@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+import re
+import time
+
+import cv2
+import numpy as np
+
+from backends import DEFAULT_WEIGHTS, InferenceBackend, artifact_path, export_model
+from common import current_rss_mb, list_videos
+
+
+def load_class_names(path='trash.names'):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def sample_video_frames(video_dir, count, calib_count=None):
+    """
+    从目录下所有视频中均匀抽帧。
+
+    参数:
+        video_dir: 视频目录
+        count: 总帧数，平均分配到各个视频
+        calib_count: 校准时的总帧数；指定时改为在相邻两个校准帧正中间抽帧，作为评估帧
+    """
+    videos = list_videos(video_dir)
+    if not videos:
+        raise FileNotFoundError(f"{video_dir} 中没有找到视频文件")
+
+    per_video = max(count // len(videos), 1)
+    frames = []
+    for path in videos:
+        cap = cv2.VideoCapture(path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if calib_count:
+            # 按校准时的间隔定位，每个评估帧取某个校准间隔的中点
+            calib_per_video = max(calib_count // len(videos), 1)
+            step = max(total // calib_per_video, 1)
+            if step < 2:
+                print(f"{path} 帧数不足，评估帧会与校准帧重叠")
+            if per_video > calib_per_video:
+                print(f"{path} 只有 {calib_per_video} 个校准间隔，评估帧减少为 {calib_per_video} 帧")
+            intervals = sorted({j * calib_per_video // per_video for j in range(per_video)})
+            positions = [int((k + 0.5) * step) for k in intervals]
+        else:
+            step = max(total // per_video, 1)
+            positions = [i * step for i in range(per_video)]
+        for pos in positions:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, min(pos, max(total - 1, 0)))
+            success, frame = cap.read()
+            if success:
+                frames.append(cv2.resize(frame, (640, 480)))
+        cap.release()
+    print(f"从 {len(videos)} 个视频中抽取了 {len(frames)} 帧")
+    return frames
+
+
+def letterbox(frame, imgsz):
+    """与 ultralytics 一致的等比缩放加灰边填充，输出 1x3xHxW 的 float32 张量"""
+    h, w = frame.shape[:2]
+    scale = min(imgsz / h, imgsz / w)
+    nh, nw = int(round(h * scale)), int(round(w * scale))
+    resized = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((imgsz, imgsz, 3), 114, np.uint8)
+    top, left = (imgsz - nh) // 2, (imgsz - nw) // 2
+    canvas[top:top + nh, left:left + nw] = resized
+    tensor = canvas[:, :, ::-1].transpose(2, 0, 1).astype(np.float32) / 255.0
+    return tensor[None]
+
+
+class FrameCalibrationReader:
+    """把录像帧喂给 ONNX Runtime 的静态量化校准"""
+
+    def __init__(self, frames, input_name, imgsz):
+        self._inputs = iter([{input_name: letterbox(f, imgsz)} for f in frames])
+
+    def get_next(self):
+        return next(self._inputs, None)
+
+    def rewind(self):
+        pass
+
+
+def detect_head_nodes(model):
+    """找出检测头（最后一个模块）的节点，这部分同时输出坐标和类别分数，量化误差最大"""
+    indices = [int(m.group(1)) for n in model.graph.node if (m := re.match(r'/model\.(\d+)/', n.name))]
+    if not indices:
+        return []
+    prefix = f"/model.{max(indices)}/"
+    return [n.name for n in model.graph.node if n.name.startswith(prefix)]
+
+
+def quantize(weights, video_dir, calib_frames=200, imgsz=640, keep_head_fp32=True):
+    """
+    用录像帧校准，生成 INT8 ONNX 模型。
+
+    返回:
+        str: INT8 模型路径
+    """
+    import onnx
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+
+    fp32_path = export_model(weights, 'onnx', imgsz)
+    int8_path = artifact_path(weights, 'onnx-int8')
+
+    model = onnx.load(fp32_path)
+    input_name = model.graph.input[0].name
+    exclude = detect_head_nodes(model) if keep_head_fp32 else []
+
+    frames = sample_video_frames(video_dir, calib_frames)
+    reader = FrameCalibrationReader(frames, input_name, imgsz)
+
+    print(f"开始INT8量化校准，{len(frames)} 帧，检测头保留FP32的节点数: {len(exclude)}")
+    start = time.time()
+    quantize_static(fp32_path, int8_path, reader,
+                    quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8,
+                    per_channel=True,
+                    calibrate_method=CalibrationMethod.MinMax,
+                    nodes_to_exclude=exclude)
+
+    # 复制类别名、步长等元数据，ultralytics 加载时需要
+    quantized = onnx.load(int8_path)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(model.metadata_props)
+    onnx.save(quantized, int8_path)
+
+    print(f"量化完成 ({time.time() - start:.1f}秒): {int8_path}")
+    return int8_path
+
+
+def box_iou(a, b):
+    """两组 xyxy 框的 IoU 矩阵"""
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def class_drift(reference, candidate, num_classes, iou_threshold=0.5):
+    """
+    以FP32结果为参照，统计INT8结果每个类别的召回率、精确率和匹配框的平均分数偏差。
+    """
+    ref_count = np.zeros(num_classes, np.int64)
+    cand_count = np.zeros(num_classes, np.int64)
+    matched = np.zeros(num_classes, np.int64)
+    score_drift = np.zeros(num_classes, np.float64)
+
+    for ref, cand in zip(reference, candidate):
+        np.add.at(ref_count, ref.classes, 1)
+        np.add.at(cand_count, cand.classes, 1)
+        if not len(ref) or not len(cand):
+            continue
+        iou = box_iou(ref.boxes, cand.boxes)
+        iou[ref.classes[:, None] != cand.classes[None, :]] = 0
+        # 按参照分数从高到低贪心匹配，已匹配的候选框不再参与
+        for i in np.argsort(-ref.scores):
+            j = int(np.argmax(iou[i]))
+            if iou[i, j] >= iou_threshold:
+                iou[:, j] = 0
+                matched[ref.classes[i]] += 1
+                score_drift[ref.classes[i]] += cand.scores[j] - ref.scores[i]
+
+    return ref_count, cand_count, matched, score_drift
+
+
+def time_backend(backend, frames, conf):
+    latencies = []
+    outputs = []
+    for frame in frames:
+        start = time.perf_counter()
+        outputs.append(backend.predict_one(frame, conf))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return outputs, latencies
+
+
+def evaluate(weights, video_dir, eval_frames=200, conf=0.5, imgsz=640, calib_frames=200):
+    """对比FP32与INT8模型的逐类别结果、延迟和内存，calib_frames 须与量化时的校准帧数一致"""
+    names = load_class_names()
+    # 取两个校准帧正中间的帧，避免评估帧与校准帧几乎相同
+    frames = sample_video_frames(video_dir, eval_frames, calib_count=calib_frames)
+
+    report = {'classes': names, 'backends': {}}
+    outputs = {}
+    # 先导入推理库，使内存统计只包含模型本身
+    import ultralytics  # noqa: F401
+    import onnxruntime  # noqa: F401
+    for name in ('onnx', 'onnx-int8'):
+        rss_before = current_rss_mb()
+        backend = InferenceBackend(name, weights, imgsz).load().warmup(3)
+        rss_after = current_rss_mb()
+        rss_delta = rss_after - rss_before if None not in (rss_before, rss_after) else None
+        outputs[name], latencies = time_backend(backend, frames, conf)
+        path = artifact_path(weights, name)
+        report['backends'][name] = {
+            'model_mb': round(os.path.getsize(path) / 1024 / 1024, 2),
+            'load_rss_mb': round(rss_delta, 1) if rss_delta is not None else None,
+            'mean_ms': round(float(np.mean(latencies)), 2),
+            'p95_ms': round(float(np.percentile(latencies, 95)), 2),
+        }
+        del backend
+
+    ref_count, cand_count, matched, score_drift = class_drift(outputs['onnx'], outputs['onnx-int8'], len(names))
+    per_class = []
+    for i, name in enumerate(names):
+        per_class.append({
+            'class': name,
+            'fp32_boxes': int(ref_count[i]),
+            'int8_boxes': int(cand_count[i]),
+            'recall': round(matched[i] / ref_count[i], 4) if ref_count[i] else None,
+            'precision': round(matched[i] / cand_count[i], 4) if cand_count[i] else None,
+            'score_drift': round(score_drift[i] / matched[i], 4) if matched[i] else None,
+        })
+    report['per_class'] = per_class
+    return report
+
+
+def print_report(report):
+    fp32, int8 = report['backends']['onnx'], report['backends']['onnx-int8']
+    print(f"\n{'类别':<14}{'FP32框':>8}{'INT8框':>8}{'召回率':>8}{'精确率':>8}{'分数偏差':>10}")
+    for row in report['per_class']:
+        fmt = lambda v: '-' if v is None else f"{v:.3f}"
+        print(f"{row['class']:<14}{row['fp32_boxes']:>8}{row['int8_boxes']:>8}"
+              f"{fmt(row['recall']):>8}{fmt(row['precision']):>8}{fmt(row['score_drift']):>10}")
+
+    print(f"\n{'':<10}{'模型(MB)':>10}{'加载内存(MB)':>14}{'平均(ms)':>10}{'P95(ms)':>10}")
+    for name, r in (('FP32', fp32), ('INT8', int8)):
+        print(f"{name:<10}{r['model_mb']:>10}{r['load_rss_mb']:>14}{r['mean_ms']:>10}{r['p95_ms']:>10}")
+    if int8['mean_ms'] > 0:
+        print(f"\n加速比: {fp32['mean_ms'] / int8['mean_ms']:.2f}x, "
+              f"模型体积缩小: {fp32['model_mb'] / max(int8['model_mb'], 1e-6):.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='用录像帧校准生成INT8模型，并评估相对FP32的精度漂移')
+    parser.add_argument('--weights', default=DEFAULT_WEIGHTS, help=f'PyTorch 权重路径 (默认: {DEFAULT_WEIGHTS})')
+    parser.add_argument('--videos', default='videos', help='校准和评估使用的视频目录 (默认: videos)')
+    parser.add_argument('--calib-frames', type=int, default=200, help='校准帧数，评估帧按它定位在校准帧之间 (默认: 200)')
+    parser.add_argument('--eval-frames', type=int, default=200, help='评估帧数 (默认: 200)')
+    parser.add_argument('--conf', type=float, default=0.5, help='评估时的置信度阈值 (默认: 0.5)')
+    parser.add_argument('--imgsz', type=int, default=640, help='输入尺寸 (默认: 640)')
+    parser.add_argument('--quantize-head', action='store_true', help='检测头也量化（默认保留FP32）')
+    parser.add_argument('--skip-calibration', action='store_true', help='跳过量化，只评估已有的INT8模型')
+    parser.add_argument('--report', help='把评估结果写入JSON文件')
+    args = parser.parse_args()
+
+    if not args.skip_calibration:
+        quantize(args.weights, args.videos, args.calib_frames, args.imgsz, not args.quantize_head)
+
+    report = evaluate(args.weights, args.videos, args.eval_frames, args.conf, args.imgsz, args.calib_frames)
+    print_report(report)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"评估结果已保存至: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
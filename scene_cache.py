@@ -0,0 +1,102 @@
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def frame_signature(frame, size=(32, 24)):
+    """缩小到 32x24 的灰度图作为画面签名，计算约几十微秒"""
+    small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+
+
+class SceneEntry:
+    __slots__ = ('signature', 'context', 'detections', 'packet', 'created_at', 'hits')
+
+    def __init__(self, signature, context, detections, packet, created_at):
+        self.signature = signature
+        self.context = context
+        self.detections = detections
+        self.packet = packet
+        self.created_at = created_at
+        self.hits = 0
+
+
+class SceneCache:
+    """
+    画面未变化时复用上一次的检测结果和已编码画面的 LRU 缓存。
+
+    以缩小灰度图为签名，与缓存项的平均像素差不超过 tolerance、且状态上下文相同时命中。
+    缓存项超过 ttl 秒或被复用 max_hits 次后强制重新推理。
+
+    参数:
+        size: 最多缓存的画面数
+        tolerance: 签名的平均像素差容差 (0-255)
+        ttl: 缓存项有效秒数
+        max_hits: 单个缓存项最多被复用的次数
+    """
+
+    def __init__(self, size=8, tolerance=3.0, ttl=2.0, max_hits=60):
+        self.size = size
+        self.tolerance = tolerance
+        self.ttl = ttl
+        self.max_hits = max_hits
+        self._entries = OrderedDict()
+        self._next_id = 0
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def lookup(self, signature, context, now=None):
+        """
+        查找与当前画面相近的缓存项。
+
+        参数:
+            signature: frame_signature 的结果
+            context: 影响画面内容的状态（如检测状态、叠加层模式），必须完全相同才命中
+
+        返回:
+            SceneEntry 或 None
+        """
+        if now is None:
+            now = time.time()
+        for key, entry in reversed(self._entries.items()):
+            if entry.context != context:
+                continue
+            if np.abs(entry.signature - signature).mean() > self.tolerance:
+                continue
+            if now - entry.created_at > self.ttl or entry.hits >= self.max_hits:
+                # 过期或复用次数过多，强制刷新
+                del self._entries[key]
+                self.expired += 1
+                break
+            entry.hits += 1
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, signature, context, detections, packet, now=None):
+        entry = SceneEntry(signature, context, detections, packet, time.time() if now is None else now)
+        self._entries[self._next_id] = entry
+        self._next_id += 1
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,170 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class InferenceRequest:
+    __slots__ = ('source', 'frame', 'conf', 'imgsz', 'offset', 'future', 'submitted_at')
+
+    def __init__(self, source, frame, conf, imgsz, offset):
+        self.source = source
+        self.frame = frame
+        self.conf = conf
+        self.imgsz = imgsz
+        self.offset = offset
+        self.future = Future()
+        self.submitted_at = time.time()
+
+
+class BatchScheduler:
+    """
+    多摄像头批量推理调度器，所有摄像头共享同一个已加载的模型。
+
+    每个摄像头的检测流程提交自己的最新一帧并等待结果；调度线程收集各摄像头的请求，
+    在所有活跃摄像头都已提交或等待超过 max_wait 后，合并为一次批量 predict 调用，
+    再把结果分发回各自的摄像头。
+
+    参数:
+        backend: 推理后端，见 backends.InferenceBackend
+        max_batch: 单批最大帧数
+        max_wait: 第一帧到达后最多等待其他帧的秒数
+        source_timeout: 超过该秒数未提交的摄像头不再视为活跃
+    """
+
+    def __init__(self, backend, max_batch=4, max_wait=0.02, source_timeout=1.0):
+        self.backend = backend
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.source_timeout = source_timeout
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._running = False
+        self._last_seen = {}
+
+        # 统计信息
+        self.batches = 0
+        self.frames = 0
+        self.max_batch_seen = 0
+        self.total_queue_delay = 0.0
+        self.max_queue_delay = 0.0
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="batch-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def submit(self, frame, conf, imgsz=None, offset=(0, 0), source=None):
+        """
+        提交一帧，返回结果为 Detections 的 Future。
+
+        参数:
+            frame: 待推理的图像
+            conf: 该帧使用的置信度阈值
+            imgsz: 模型输入尺寸，None 表示使用模型默认值
+            offset: 检测框需要平移的 (x, y)，用于裁剪推理
+            source: 提交方标识，默认为当前线程
+        """
+        if source is None:
+            source = threading.get_ident()
+        request = InferenceRequest(source, frame, conf, imgsz, offset)
+        self._queue.put(request)
+        return request.future
+
+    def predict(self, frame, conf, imgsz=None, offset=(0, 0), source=None):
+        """提交一帧并等待结果"""
+        return self.submit(frame, conf, imgsz, offset, source).result()
+
+    def _active_sources(self, now):
+        return sum(1 for t in self._last_seen.values() if now - t <= self.source_timeout)
+
+    def _collect(self, first):
+        """从第一个请求开始收集一批，直到所有活跃摄像头都已提交或超时"""
+        batch = [first]
+        deadline = first.submitted_at + self.max_wait
+        while len(batch) < self.max_batch:
+            now = time.time()
+            self._last_seen[batch[-1].source] = now
+            if len({r.source for r in batch}) >= self._active_sources(now):
+                break
+            remaining = deadline - now
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                self._running = False
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        while self._running:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = self._collect(first)
+
+            now = time.time()
+            for request in batch:
+                self._last_seen[request.source] = now
+                delay = now - request.submitted_at
+                self.total_queue_delay += delay
+                self.max_queue_delay = max(self.max_queue_delay, delay)
+            self.batches += 1
+            self.frames += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+
+            # 输入尺寸不同的请求分开推理
+            groups = {}
+            for request in batch:
+                groups.setdefault(request.imgsz, []).append(request)
+            for imgsz, requests in groups.items():
+                self._predict_group(imgsz, requests)
+
+        # 停止时让仍在等待的请求失败，避免调用方永久阻塞
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                request.future.set_exception(RuntimeError("推理调度器已停止"))
+
+    def _predict_group(self, imgsz, requests):
+        # 用最低的置信度推理一次，再按各请求自己的阈值过滤
+        min_conf = min(r.conf for r in requests)
+        try:
+            results = self.backend.predict([r.frame for r in requests], min_conf, imgsz,
+                                           [r.offset for r in requests])
+        except Exception as e:
+            for request in requests:
+                request.future.set_exception(e)
+            return
+
+        for request, detections in zip(requests, results):
+            if request.conf > min_conf:
+                detections = detections.select(detections.scores >= request.conf)
+            request.future.set_result(detections)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'frames': self.frames,
+            'avg_batch_size': round(self.frames / self.batches, 2) if self.batches else 0.0,
+            'max_batch_size': self.max_batch_seen,
+            'avg_queue_delay_ms': round(self.total_queue_delay / self.frames * 1000, 2) if self.frames else 0.0,
+            'max_queue_delay_ms': round(self.max_queue_delay * 1000, 2),
+        }
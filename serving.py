@@ -0,0 +1,120 @@
+import multiprocessing
+import sys
+import threading
+import time
+from collections import deque
+
+# 服务模式：threading 为每个连接一个系统线程；eventlet 为协作式I/O，所有连接共用一个线程
+ASYNC_MODES = ('threading', 'eventlet')
+
+
+def async_mode_from_argv(argv=None):
+    """
+    在 argparse 之前从命令行中取出 --async-mode。
+
+    eventlet 的补丁必须在导入 flask 等模块之前完成，所以不能等到 __main__ 中解析参数。
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    for i, arg in enumerate(argv):
+        if arg == '--async-mode' and i + 1 < len(argv):
+            return argv[i + 1] if argv[i + 1] in ASYNC_MODES else 'threading'
+        if arg.startswith('--async-mode='):
+            value = arg.split('=', 1)[1]
+            return value if value in ASYNC_MODES else 'threading'
+    return 'threading'
+
+
+def monkey_patch(mode):
+    """
+    协作式模式下为 socket、select、time 打补丁，但保留真实的系统线程：
+    采集、推理和编码仍在各自的线程中运行，不会阻塞处理连接的协程。
+
+    返回:
+        function: 协作式让出的 sleep，threading 模式下为 None
+    """
+    # 推理工作进程会重新导入主模块，不需要打补丁
+    if mode != 'eventlet' or multiprocessing.parent_process() is not None:
+        return None
+    import eventlet
+    eventlet.monkey_patch(thread=False)
+    return eventlet.sleep
+
+
+def wait_event(event, timeout, sleep=None, interval=0.005):
+    """
+    等待 threading.Event。协作式模式下不能阻塞在系统锁上，改为轮询并让出。
+
+    返回:
+        bool: 超时前事件已触发时为 True
+    """
+    if sleep is None:
+        return event.wait(timeout)
+    deadline = time.monotonic() + timeout
+    while not event.is_set():
+        if time.monotonic() >= deadline:
+            return False
+        sleep(interval)
+    return True
+
+
+class Outbox:
+    """
+    检测线程发出的 Socket.IO 消息先放入发件箱，由 Socket.IO 的后台任务统一发送。
+
+    协作式模式下 Socket.IO 的连接只能在其事件循环所在的线程中写入；threading 模式下直接发送。
+    发件箱有长度上限，客户端跟不上时丢弃最旧的消息，内存不会无限增长。
+
+    参数:
+        socketio: SocketIO 实例
+        direct: 为 True 时不经过发件箱直接发送
+        maxlen: 发件箱最多保存的消息数
+        interval: 发件箱为空时的轮询间隔（秒）
+    """
+
+    def __init__(self, socketio, direct=True, maxlen=256, interval=0.005):
+        self.socketio = socketio
+        self.direct = direct
+        self.interval = interval
+        self._messages = deque(maxlen=maxlen)
+        self._started = False
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.sent = 0
+        self.dropped = 0
+
+    def emit(self, event, *args, **kwargs):
+        if self.direct:
+            self.socketio.emit(event, *args, **kwargs)
+            self.sent += 1
+            return
+        if len(self._messages) == self._messages.maxlen:
+            self.dropped += 1
+        self._messages.append((event, args, kwargs))
+
+    def start(self):
+        """启动发送任务，在启动服务之前于主线程中调用"""
+        with self._lock:
+            if self.direct or self._started:
+                return
+            self._started = True
+        self.socketio.start_background_task(self._drain)
+
+    def _drain(self):
+        while True:
+            while self._messages:
+                event, args, kwargs = self._messages.popleft()
+                try:
+                    self.socketio.emit(event, *args, **kwargs)
+                    self.sent += 1
+                except Exception as e:
+                    print(f"发送 {event} 失败: {e}")
+            self.socketio.sleep(self.interval)
+
+    def stats(self):
+        return {
+            'direct': self.direct,
+            'queued': len(self._messages),
+            'sent': self.sent,
+            'dropped': self.dropped,
+        }
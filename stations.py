@@ -0,0 +1,312 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# 站点可配置的字段及默认值
+STATION_DEFAULTS = {
+    'name': None,
+    'camera': 0,
+    'serial_port': None,  # 为空时不连接 Arduino，只推送结果
+    'motion_threshold': 30,  # 运动检测阈值
+    'motion_area_ratio': 0.02,  # 移动区域占比阈值
+    'cooldown': 7.0,  # 两次发送之间的冷却秒数
+    'conf': 0.8,  # 初始置信度
+    'reduced_conf': 0.5,  # 长时间未识别后降低到的置信度
+    'reduce_after': 7.0,  # 运动开始多少秒后降低置信度
+    'timeout_after': 14.0,  # 运动开始多少秒后使用默认分类
+    'default_cls': 0,  # 超时后使用的默认分类ID
+    'autostart': False,  # 启动时即开始检测，不等待观看者
+}
+
+_FIELD_TYPES = {
+    'name': str,
+    'camera': int,
+    'serial_port': str,
+    'motion_threshold': int,
+    'motion_area_ratio': float,
+    'cooldown': float,
+    'conf': float,
+    'reduced_conf': float,
+    'reduce_after': float,
+    'timeout_after': float,
+    'default_cls': int,
+    'autostart': bool,
+}
+
+
+def _convert(field, value):
+    if value is None:
+        if field in ('name', 'camera'):
+            raise ValueError(f"站点的 {field} 不能为空")
+        return STATION_DEFAULTS[field]
+    kind = _FIELD_TYPES[field]
+    if kind is bool and not isinstance(value, bool):
+        raise ValueError(f"{field} 应为 true 或 false")
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} 的值无效: {value!r}")
+
+
+def _nbytes(obj, seen, depth=0):
+    """统计对象内部可达的 numpy 数组和字节串占用的字节数"""
+    if obj is None or id(obj) in seen or depth > 6:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, bytes):
+        # 缓存的 JPEG 数据
+        return len(obj)
+    if isinstance(obj, dict):
+        return sum(_nbytes(v, seen, depth + 1) for v in obj.values())
+    if isinstance(obj, (list, tuple, deque, set)):
+        return sum(_nbytes(v, seen, depth + 1) for v in obj)
+    if isinstance(obj, (str, int, float, bool)) or callable(obj) and not hasattr(obj, '__dict__'):
+        return 0
+    total = 0
+    for name in getattr(type(obj), '__slots__', ()):
+        total += _nbytes(getattr(obj, name, None), seen, depth + 1)
+    if hasattr(obj, '__dict__'):
+        total += sum(_nbytes(v, seen, depth + 1) for v in vars(obj).values())
+    return total
+
+
+class Station:
+    """
+    一个垃圾桶（摄像头 + Arduino）的配置和运行状态。
+
+    字段见 STATION_DEFAULTS；运动检测器、投票器等组件由 StationRegistry 的 setup 回调创建，
+    所有站点共享同一个已加载的模型。
+    """
+
+    __slots__ = tuple(STATION_DEFAULTS) + (
+        # 运行状态
+        'motion_detected', 'motion_start_time', 'motion_ratio', 'motion_roi_box',
+        'detection_conf', 'detection_state', 'last_send_time', 'decisions',
+        # 组件
+        'motion_detector', 'motion_gate', 'voter', 'tracker', 'scene_cache', 'actuator', 'pipeline',
+    )
+
+    def __init__(self, **config):
+        unknown = set(config) - set(STATION_DEFAULTS)
+        if unknown:
+            raise ValueError(f"未知的站点字段: {', '.join(sorted(unknown))}")
+        for field, default in STATION_DEFAULTS.items():
+            setattr(self, field, _convert(field, config.get(field, default)))
+        self._validate()
+        for name in ('motion_detector', 'motion_gate', 'voter', 'tracker', 'scene_cache', 'actuator', 'pipeline'):
+            setattr(self, name, None)
+        self.last_send_time = 0.0
+        self.decisions = 0
+        self.motion_ratio = 0.0
+        self.motion_roi_box = None
+        self.reset()
+
+    def _validate(self):
+        if not self.name:
+            raise ValueError("站点的 name 不能为空")
+        if not 0 < self.motion_area_ratio < 1:
+            raise ValueError("motion_area_ratio 应在 0 到 1 之间")
+        if not 0 < self.reduced_conf <= self.conf <= 1:
+            raise ValueError("置信度应满足 0 < reduced_conf <= conf <= 1")
+        if not 0 <= self.reduce_after <= self.timeout_after:
+            raise ValueError("应满足 0 <= reduce_after <= timeout_after")
+        if self.cooldown < 0:
+            raise ValueError("cooldown 不能为负数")
+
+    def configure(self, **changes):
+        """
+        修改配置，校验失败时保持原配置不变。
+
+        返回:
+            set: 实际发生变化的字段
+        """
+        unknown = set(changes) - set(STATION_DEFAULTS)
+        if unknown:
+            raise ValueError(f"未知的站点字段: {', '.join(sorted(unknown))}")
+        if 'name' in changes and changes['name'] != self.name:
+            raise ValueError("站点名称不能修改")
+        previous = self.config()
+        try:
+            for field, value in changes.items():
+                setattr(self, field, _convert(field, value))
+            self._validate()
+        except ValueError:
+            for field, value in previous.items():
+                setattr(self, field, value)
+            raise
+        return {field for field in changes if getattr(self, field) != previous[field]}
+
+    def reset(self):
+        """回到初始检测状态"""
+        self.motion_detected = False
+        self.motion_start_time = 0.0
+        self.detection_conf = self.conf
+        self.detection_state = "NORMAL"
+
+    def elapsed(self, now=None):
+        """本次运动已持续的秒数，没有运动时为 0"""
+        if not self.motion_detected:
+            return 0.0
+        return (time.time() if now is None else now) - self.motion_start_time
+
+    def in_cooldown(self, now=None):
+        return (time.time() if now is None else now) - self.last_send_time < self.cooldown
+
+    @property
+    def running(self):
+        """是否在没有观看者时也保持检测"""
+        return self.pipeline is not None and not self.pipeline.stopped
+
+    def config(self):
+        return {field: getattr(self, field) for field in STATION_DEFAULTS}
+
+    def memory_bytes(self):
+        """站点对象及其组件（背景模型、投票器、跟踪点、画面缓存等）占用的内存，不含共享的模型和流程"""
+        seen = {id(self.actuator), id(self.pipeline)}
+        total = sys.getsizeof(self)
+        for name in ('motion_detector', 'motion_gate', 'voter', 'tracker', 'scene_cache'):
+            component = getattr(self, name)
+            if component is not None:
+                total += sys.getsizeof(component) + _nbytes(component, seen)
+        return total
+
+    def stats(self):
+        stats = self.config()
+        stats.update({
+            'running': self.running,
+            'state': self.detection_state,
+            'detection_conf': self.detection_conf,
+            'motion': self.motion_detected,
+            'motion_ratio': round(float(self.motion_ratio), 4),
+            'decisions': self.decisions,
+            'memory_kb': round(self.memory_bytes() / 1024, 1),
+        })
+        for name in ('motion_gate', 'voter', 'tracker', 'scene_cache'):
+            component = getattr(self, name)
+            stats[name] = component.stats() if component is not None else None
+        stats['arduino'] = self.actuator.stats() if self.actuator is not None else None
+        return stats
+
+
+class StationRegistry:
+    """
+    管理所有站点，按名称和摄像头ID查找，可从 JSON 文件加载并在修改后写回。
+
+    配置文件格式: {"stations": [{"name": "bin-1", "camera": 0, "serial_port": "COM3"}, ...]}
+
+    参数:
+        setup: 站点加入时调用 setup(station)，创建其组件
+        teardown: 站点删除时调用 teardown(station)，释放其组件
+        reconfigure: 配置修改后调用 reconfigure(station, changed)
+        path: 配置文件路径，为 None 时不保存
+    """
+
+    def __init__(self, setup=None, teardown=None, reconfigure=None, path=None):
+        self.setup = setup
+        self.teardown = teardown
+        self.reconfigure = reconfigure
+        self.path = path
+        self._lock = threading.RLock()
+        self._stations = {}
+
+    def load(self, path):
+        """从配置文件加载站点，文件不存在时不做任何事"""
+        self.path = path
+        if not os.path.exists(path):
+            print(f"站点配置文件 {path} 不存在，将在修改后创建")
+            return self
+        with open(path, encoding='utf-8') as f:
+            configs = json.load(f).get('stations', [])
+        for config in configs:
+            self.add(config, save=False)
+        print(f"已从 {path} 加载 {len(configs)} 个站点")
+        return self
+
+    def save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            configs = [station.config() for station in self._stations.values()]
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'stations': configs}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+    def _check_conflicts(self, station, exclude=None):
+        for other in self._stations.values():
+            if other is exclude:
+                continue
+            if other.camera == station.camera:
+                raise ValueError(f"摄像头 {station.camera} 已被站点 {other.name} 使用")
+            if station.serial_port and other.serial_port == station.serial_port:
+                raise ValueError(f"串口 {station.serial_port} 已被站点 {other.name} 使用")
+
+    def add(self, config, save=True):
+        """
+        新增站点。
+
+        返回:
+            Station: 新站点；名称、摄像头或串口与已有站点冲突时抛出 ValueError
+        """
+        station = Station(**config)
+        with self._lock:
+            if station.name in self._stations:
+                raise ValueError(f"站点 {station.name} 已存在")
+            self._check_conflicts(station)
+            # 组件创建完成后才加入注册表，检测线程不会拿到未初始化的站点
+            if self.setup is not None:
+                self.setup(station)
+            self._stations[station.name] = station
+        if save:
+            self.save()
+        return station
+
+    def update(self, name, changes):
+        """修改站点配置，返回修改后的站点，站点不存在时抛出 KeyError"""
+        with self._lock:
+            station = self._stations[name]
+            previous = station.config()
+            changed = station.configure(**changes)
+            try:
+                self._check_conflicts(station, exclude=station)
+            except ValueError:
+                station.configure(**{k: v for k, v in previous.items() if k != 'name'})
+                raise
+        if changed and self.reconfigure is not None:
+            self.reconfigure(station, changed)
+        if changed:
+            self.save()
+        return station
+
+    def remove(self, name):
+        with self._lock:
+            station = self._stations.pop(name)
+        if self.teardown is not None:
+            self.teardown(station)
+        self.save()
+        return station
+
+    def get(self, name):
+        with self._lock:
+            return self._stations.get(name)
+
+    def for_camera(self, camera_id):
+        with self._lock:
+            for station in self._stations.values():
+                if station.camera == camera_id:
+                    return station
+        return None
+
+    def stations(self):
+        with self._lock:
+            return list(self._stations.values())
+
+    def stats(self):
+        return {station.name: station.stats() for station in self.stations()}
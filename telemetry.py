@@ -0,0 +1,166 @@
+import struct
+import threading
+import time
+
+# 状态编码，与 process_frame 中的 detection_state 对应
+STATES = ('NORMAL', 'REDUCED_CONF', 'TIMEOUT', 'LOADING')
+FLAG_MOTION = 1
+FLAG_IDLE = 2
+NO_CLASS = 0xFFFF
+
+# 帧序号、摄像头ID (uint32)、时间戳 (float64)、状态、标志位 (uint8)、置信度阈值、运动区域占比、
+# 已检测秒数 (float32)、最高分类别 (uint16，没有检测框时为 0xFFFF)、最高分 (float32)，小端，共 36 字节
+TELEMETRY_FORMAT = struct.Struct('<IIdBBfffHf')
+
+
+def pack_telemetry(seq, camera_id, state, conf, motion_ratio=0.0, elapsed=0.0, motion=False, idle=False,
+                   top_cls=None, top_score=0.0, timestamp=None):
+    """把一帧的检测状态编码为定长二进制消息"""
+    flags = (FLAG_MOTION if motion else 0) | (FLAG_IDLE if idle else 0)
+    return TELEMETRY_FORMAT.pack(
+        seq, camera_id, time.time() if timestamp is None else timestamp,
+        STATES.index(state) if state in STATES else 0xFF, flags,
+        conf, motion_ratio, elapsed, NO_CLASS if top_cls is None else top_cls, top_score)
+
+
+def unpack_telemetry(data):
+    seq, camera_id, timestamp, state, flags, conf, motion_ratio, elapsed, top_cls, top_score = \
+        TELEMETRY_FORMAT.unpack(data)
+    return {
+        'seq': seq,
+        'camera_id': camera_id,
+        'timestamp': timestamp,
+        'state': STATES[state] if state < len(STATES) else None,
+        'motion': bool(flags & FLAG_MOTION),
+        'idle': bool(flags & FLAG_IDLE),
+        'conf': conf,
+        'motion_ratio': motion_ratio,
+        'elapsed': elapsed,
+        'top_cls': None if top_cls == NO_CLASS else top_cls,
+        'top_score': top_score,
+    }
+
+
+class TelemetrySubscriber:
+    __slots__ = ('sid', 'interval', 'last_seq', 'last_sent', 'inflight_since')
+
+    def __init__(self, sid, interval):
+        self.sid = sid
+        self.interval = interval
+        self.last_seq = 0
+        self.last_sent = 0.0
+        self.inflight_since = 0.0
+
+
+class TelemetryHub:
+    """
+    按摄像头分房间推送逐帧状态。
+
+    每个摄像头只保存最新一条消息，检测循环发布时直接覆盖旧消息（合并），不会排队。
+    发送任务按每个订阅者的最大频率发送最新消息；上一条还没确认的订阅者不发送，
+    期间被覆盖的消息直接丢弃，慢速客户端只会收到更少的更新，而不会积压。
+
+    参数:
+        emit: 发送函数 emit(sid, payload, callback)
+        max_rate: 每个客户端每秒最多收到的消息数，客户端可以请求更低的频率
+        ack_timeout: 等待客户端确认的最长秒数，超时后视为丢失
+        tick: 发送任务的检查间隔（秒）
+    """
+
+    def __init__(self, emit, max_rate=5.0, ack_timeout=2.0, tick=0.02):
+        self.emit = emit
+        self.max_rate = max_rate
+        self.ack_timeout = ack_timeout
+        self.tick = tick
+        self._lock = threading.Lock()
+        self._latest = {}  # camera_id -> (seq, payload)
+        self._rooms = {}  # camera_id -> {sid: TelemetrySubscriber}
+
+        # 统计信息
+        self.published = 0
+        self.sent = 0
+        self.superseded = 0
+        self.timeouts = 0
+
+    def publish(self, camera_id, state, conf, **sample):
+        """发布一帧的状态，该摄像头没有订阅者时直接返回"""
+        with self._lock:
+            if camera_id not in self._rooms:
+                return
+            # 每个摄像头单独编号，订阅者据此计算被覆盖的消息数
+            seq = self._latest[camera_id][0] + 1 if camera_id in self._latest else 1
+            self._latest[camera_id] = (seq, pack_telemetry(seq, camera_id, state, conf, **sample))
+            self.published += 1
+
+    def subscribe(self, sid, camera_id, max_rate=None):
+        rate = min(max_rate, self.max_rate) if max_rate and max_rate > 0 else self.max_rate
+        with self._lock:
+            self._rooms.setdefault(camera_id, {})[sid] = TelemetrySubscriber(sid, 1.0 / rate)
+
+    def unsubscribe(self, sid, camera_id=None):
+        """退出指定摄像头的房间，camera_id 为 None 时退出全部房间"""
+        with self._lock:
+            for camera in list(self._rooms) if camera_id is None else [camera_id]:
+                room = self._rooms.get(camera)
+                if room is not None:
+                    room.pop(sid, None)
+                    if not room:
+                        del self._rooms[camera]
+                        self._latest.pop(camera, None)
+
+    def flush(self, now=None):
+        """向到了发送时间、且上一条已确认的订阅者发送所在房间的最新消息"""
+        if now is None:
+            now = time.time()
+        ready = []
+        with self._lock:
+            for camera_id, room in self._rooms.items():
+                latest = self._latest.get(camera_id)
+                if latest is None:
+                    continue
+                seq, payload = latest
+                for sub in room.values():
+                    if sub.last_seq >= seq:
+                        continue
+                    if sub.inflight_since:
+                        if now - sub.inflight_since < self.ack_timeout:
+                            continue
+                        self.timeouts += 1
+                    if now - sub.last_sent < sub.interval:
+                        continue
+                    # 两次发送之间被覆盖的消息不再发送
+                    if sub.last_seq:
+                        self.superseded += seq - sub.last_seq - 1
+                    sub.last_seq = seq
+                    sub.last_sent = sub.inflight_since = now
+                    ready.append((sub, payload))
+        for sub, payload in ready:
+            self.emit(sub.sid, payload, self._ack_callback(sub))
+            self.sent += 1
+
+    @staticmethod
+    def _ack_callback(sub):
+        def ack(*args):
+            sub.inflight_since = 0.0
+        return ack
+
+    def run(self, sleep=time.sleep):
+        """发送任务主循环，由 Socket.IO 的后台任务运行"""
+        while True:
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"发送遥测数据失败: {e}")
+            sleep(self.tick)
+
+    def stats(self):
+        with self._lock:
+            rooms = {camera_id: len(room) for camera_id, room in self._rooms.items()}
+        return {
+            'max_rate': self.max_rate,
+            'rooms': rooms,
+            'published': self.published,
+            'sent': self.sent,
+            'superseded': self.superseded,
+            'ack_timeouts': self.timeouts,
+        }
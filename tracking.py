@@ -0,0 +1,145 @@
+import cv2
+import numpy as np
+
+from detections import Detections
+
+
+class FlowTracker:
+    """
+    用 LK 光流把上一次的检测框平移到当前帧。
+
+    检测后在每个框内取角点，之后每帧跟踪这些点，框按其内部点的位移中值平移，
+    分数乘以仍被稳定跟踪的点的比例。点的前后向误差过大视为跟丢。
+
+    参数:
+        max_corners: 每个框最多取的角点数
+        min_points: 框内至少剩余多少个点才继续保留该框
+        max_error: 前后向跟踪误差上限（像素）
+    """
+
+    def __init__(self, max_corners=30, min_points=4, max_error=1.0):
+        self.max_corners = max_corners
+        self.min_points = min_points
+        self.max_error = max_error
+        self._gray = None
+        self._detections = Detections()
+        self._points = np.zeros((0, 1, 2), np.float32)
+        self._owners = np.zeros(0, np.int32)
+        self._initial = np.zeros(0, np.int32)
+
+    def reset(self, gray, detections):
+        """以新的检测结果为起点"""
+        self._gray = gray
+        self._detections = detections
+        points, owners = [], []
+        h, w = gray.shape[:2]
+        for i, (_, _, box) in enumerate(detections):
+            x1, y1, x2, y2 = np.clip(box.astype(int), 0, [w, h, w, h])
+            if x2 - x1 < 8 or y2 - y1 < 8:
+                continue
+            corners = cv2.goodFeaturesToTrack(gray[y1:y2, x1:x2], self.max_corners, 0.01, 5)
+            if corners is None:
+                continue
+            points.append(corners + np.array([x1, y1], np.float32))
+            owners.append(np.full(len(corners), i, np.int32))
+        self._points = np.concatenate(points).astype(np.float32) if points else np.zeros((0, 1, 2), np.float32)
+        self._owners = np.concatenate(owners) if owners else np.zeros(0, np.int32)
+        self._initial = np.bincount(self._owners, minlength=len(detections))
+
+    def track(self, gray):
+        """
+        跟踪到当前帧。
+
+        返回:
+            tuple: (Detections, quality)，quality 为各框剩余点比例的平均值，没有框时为 1.0
+        """
+        if not len(self._detections):
+            self._gray = gray
+            return self._detections, 1.0
+        if not len(self._points):
+            return Detections(), 0.0
+
+        forward, status, _ = cv2.calcOpticalFlowPyrLK(self._gray, gray, self._points, None)
+        backward, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self._gray, forward, None)
+        error = np.linalg.norm((self._points - backward).reshape(-1, 2), axis=1)
+        good = (status.reshape(-1) == 1) & (back_status.reshape(-1) == 1) & (error < self.max_error)
+
+        shift = (forward - self._points).reshape(-1, 2)
+        boxes, keep = self._detections.boxes.copy(), []
+        ratios = np.zeros(len(self._detections), np.float32)
+        for i in range(len(self._detections)):
+            mask = good & (self._owners == i)
+            if self._initial[i]:
+                ratios[i] = mask.sum() / self._initial[i]
+            if mask.sum() < self.min_points:
+                continue
+            dx, dy = np.median(shift[mask], axis=0)
+            boxes[i] += np.array([dx, dy, dx, dy], np.float32)
+            keep.append(i)
+
+        # 只保留跟踪成功的点，下一帧从当前位置继续
+        self._gray = gray
+        self._points = forward[good]
+        self._owners = self._owners[good]
+        self._detections = Detections(boxes, self._detections.scores, self._detections.classes)
+
+        tracked = Detections(boxes[keep], self._detections.scores[keep] * ratios[keep],
+                             self._detections.classes[keep])
+        return tracked, float(ratios.mean())
+
+
+class TrackedDetector:
+    """
+    每隔 stride 帧运行一次检测，中间的帧用光流跟踪上一次的检测框；
+    跟踪质量低于 min_quality 时立即重新检测。
+
+    参数:
+        detect: 检测函数 detect(frame, *args)，返回 Detections
+        stride: 检测间隔帧数，1 表示每帧都检测
+        min_quality: 跟踪质量下限
+    """
+
+    def __init__(self, detect, stride=1, min_quality=0.5):
+        self.detect = detect
+        self.stride = stride
+        self.min_quality = min_quality
+        self.tracker = FlowTracker()
+        self._since_detect = None
+
+        # 统计信息
+        self.frames = 0
+        self.inferences = 0
+        self.fallbacks = 0
+
+    def invalidate(self):
+        """丢弃跟踪状态，下一帧重新检测"""
+        self._since_detect = None
+
+    def __call__(self, frame, *args):
+        self.frames += 1
+        if self.stride <= 1:
+            self.inferences += 1
+            return self.detect(frame, *args)
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self._since_detect is not None and self._since_detect < self.stride - 1:
+            detections, quality = self.tracker.track(gray)
+            if quality >= self.min_quality:
+                self._since_detect += 1
+                return detections
+            self.fallbacks += 1
+
+        detections = self.detect(frame, *args)
+        self.inferences += 1
+        self.tracker.reset(gray, detections)
+        self._since_detect = 0
+        return detections
+
+    def stats(self):
+        return {
+            'stride': self.stride,
+            'frames': self.frames,
+            'inferences': self.inferences,
+            'tracking_fallbacks': self.fallbacks,
+            'inference_rate': round(self.inferences / self.frames, 3) if self.frames else 0.0,
+        }
@@ -2,7 +2,7 @@ import cv2
 import numpy as np
 import os
 
-def create_test_video(output_path, duration=10, fps=30, width=640, height=480):
+def create_test_video(output_path, duration=10, fps=30, width=640, height=480, codec='H264'):
     """
     创建一个简单的测试视频
     
@@ -12,12 +12,13 @@ def create_test_video(output_path, duration=10, fps=30, width=640, height=480):
         fps: 每秒帧数
         width: 视频宽度
         height: 视频高度
+        codec: 视频编码器 FourCC
     """
     # 确保输出目录存在
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
     # 创建视频写入器
-    fourcc = cv2.VideoWriter_fourcc(*'H264')  # MP4格式
+    fourcc = cv2.VideoWriter_fourcc(*codec)  # MP4格式
     out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
     
     # 生成帧
@@ -1,87 +1,265 @@
 import cv2
 import os
+import sys
 import argparse
+import queue
+import threading
+import time
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 
-def crop_video_to_4_3(input_path, output_path=None):
+# 作为脚本运行时 sys.path 中只有 videos/，加入项目根目录以导入共用模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import find_videos
+
+def default_output_path(input_path):
+    filename, ext = os.path.splitext(input_path)
+    return f"{filename}_cropped{ext}"
+
+def crop_window(width, height):
     """
-    将视频裁切为4:3比例，保持高度不变，居中裁切。
-    
-    参数:
-        input_path (str): 输入视频的路径
-        output_path (str, optional): 输出视频的路径。如果为None，将在输入视频名后添加"_cropped"
-    
+    计算4:3比例（保持高度不变）的居中裁切区域。
+
     返回:
-        str: 输出视频的路径
+        tuple: (x_start, new_width)
     """
+    new_width = int(height * 4 / 3)
+    if new_width > width:
+        print(f"警告: 视频宽度 ({width}px) 小于所需的4:3宽度 ({new_width}px)。将保持原始宽度。")
+        return 0, width
+    return (width - new_width) // 2, new_width
+
+def open_video(input_path, output_path, codec):
+    """打开输入视频并创建对应的写入器，返回 (cap, out, x_start, new_width, 估计帧数)"""
     if not os.path.exists(input_path):
         raise FileNotFoundError(f"找不到输入视频: {input_path}")
-    
-    # 如果没有指定输出路径，则自动生成
-    if output_path is None:
-        filename, ext = os.path.splitext(input_path)
-        output_path = f"{filename}_cropped{ext}"
-    
+
     # 打开视频
     cap = cv2.VideoCapture(input_path)
     if not cap.isOpened():
         raise Exception(f"无法打开视频: {input_path}")
-    
-    # 获取视频基本信息
+
+    # 获取视频基本信息，帧数只是容器中记录的估计值，仅用于进度条
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     fps = cap.get(cv2.CAP_PROP_FPS)
     frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    
-    # 计算4:3比例下的新宽度（保持高度不变）
-    new_width = int(height * 4 / 3)
-    
+
     # 计算裁切区域（居中）
-    if new_width > width:
-        print(f"警告: 视频宽度 ({width}px) 小于所需的4:3宽度 ({new_width}px)。将保持原始宽度。")
-        new_width = width
-        x_start = 0
-    else:
-        x_start = (width - new_width) // 2
-    
+    x_start, new_width = crop_window(width, height)
+
     # 创建视频写入器
-    fourcc = cv2.VideoWriter_fourcc(*'H264')  # 可以根据需要更改编码格式
+    fourcc = cv2.VideoWriter_fourcc(*codec)  # 可以根据需要更改编码格式
     out = cv2.VideoWriter(output_path, fourcc, fps, (new_width, height))
-    
-    # 处理每一帧
+    if not out.isOpened():
+        cap.release()
+        raise Exception(f"无法创建输出视频 {output_path}，请检查编码器 {codec} 是否可用")
+
     print(f"开始裁切视频: {input_path}")
     print(f"从 {width}x{height} 裁切到 {new_width}x{height} (4:3 比例)")
-    
+    return cap, out, x_start, new_width, frame_count
+
+def crop_video_to_4_3(input_path, output_path=None, codec='H264'):
+    """
+    将视频裁切为4:3比例，保持高度不变，居中裁切。
+
+    参数:
+        input_path (str): 输入视频的路径
+        output_path (str, optional): 输出视频的路径。如果为None，将在输入视频名后添加"_cropped"
+        codec (str): 输出视频编码器 FourCC
+
+    返回:
+        str: 输出视频的路径
+    """
+    # 如果没有指定输出路径，则自动生成
+    if output_path is None:
+        output_path = default_output_path(input_path)
+
+    cap, out, x_start, new_width, frame_count = open_video(input_path, output_path, codec)
+
     try:
-        for _ in tqdm(range(frame_count)):
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # 裁切帧
-            cropped_frame = frame[:, x_start:x_start + new_width]
-            
-            # 写入新视频
-            out.write(cropped_frame)
-    
+        # 一直读到文件末尾，不依赖容器记录的帧数
+        with tqdm(total=frame_count or None) as progress:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+
+                # 裁切帧
+                cropped_frame = frame[:, x_start:x_start + new_width]
+
+                # 写入新视频
+                out.write(cropped_frame)
+                progress.update(1)
+
     finally:
         # 释放资源
         cap.release()
         out.release()
-    
+
     print(f"视频裁切完成，已保存至: {output_path}")
     return output_path
 
+def _put(q, item, stop):
+    """放入有界队列，下游出错停止时放弃等待"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _get(q, stop):
+    """从队列取出一项，下游出错停止时返回 None，不会一直阻塞"""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return None
+
+def crop_video_pipelined(input_path, output_path=None, codec='H264', queue_size=32, show_progress=True):
+    """
+    流水线方式裁切视频：解码、裁切、编码分别在各自的线程中进行，阶段之间用有界队列连接。
+
+    帧的内容和顺序与 crop_video_to_4_3 完全相同，输出一致。
+
+    返回:
+        dict: 输出路径、帧数、耗时和帧率
+    """
+    if output_path is None:
+        output_path = default_output_path(input_path)
+
+    cap, out, x_start, new_width, frame_count = open_video(input_path, output_path, codec)
+    decoded = queue.Queue(maxsize=queue_size)
+    cropped = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+
+    def decode():
+        try:
+            while not stop.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if not _put(decoded, frame, stop):
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            _put(decoded, None, stop)
+
+    def crop():
+        try:
+            while True:
+                frame = _get(decoded, stop)
+                if frame is None:
+                    break
+                # 复制为连续内存，编码线程写入时不再需要转换
+                if not _put(cropped, np.ascontiguousarray(frame[:, x_start:x_start + new_width]), stop):
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            _put(cropped, None, stop)
+
+    start = time.time()
+    threads = [threading.Thread(target=decode, daemon=True), threading.Thread(target=crop, daemon=True)]
+    for t in threads:
+        t.start()
+
+    frames = 0
+    progress = tqdm(total=frame_count or None, desc=os.path.basename(input_path), disable=not show_progress)
+    try:
+        # 编码在当前线程进行
+        while True:
+            frame = cropped.get()
+            if frame is None:
+                break
+            out.write(frame)
+            frames += 1
+            progress.update(1)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+        progress.close()
+        cap.release()
+        out.release()
+
+    if errors:
+        raise errors[0]
+    elapsed = time.time() - start
+    return {
+        'input': input_path,
+        'output': output_path,
+        'frames': frames,
+        'seconds': round(elapsed, 2),
+        'fps': round(frames / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+def crop_videos(inputs, output_dir=None, jobs=2, codec='H264', queue_size=32):
+    """
+    批量裁切：同时处理 jobs 个文件，每个文件内部以流水线方式处理。
+
+    返回:
+        list: 每个文件一条结果字典，失败的文件包含 error 字段
+    """
+    def output_for(path):
+        if output_dir is None:
+            return default_output_path(path)
+        os.makedirs(output_dir, exist_ok=True)
+        name, ext = os.path.splitext(os.path.basename(path))
+        return os.path.join(output_dir, f"{name}_cropped{ext}")
+
+    results = []
+    # 解码和编码都会释放 GIL，多个文件可以在线程中真正并行
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(crop_video_pipelined, path, output_for(path), codec, queue_size, False): path
+                   for path in inputs}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                result = future.result()
+                print(f"完成 {path}: {result['frames']} 帧, {result['seconds']}秒, {result['fps']} 帧/秒")
+            except Exception as e:
+                result = {'input': path, 'error': str(e)}
+                print(f"处理 {path} 失败: {e}")
+            results.append(result)
+    return results
+
 def main():
     parser = argparse.ArgumentParser(description='将视频裁切为4:3比例，保持高度不变，居中裁切')
-    parser.add_argument('input', help='输入视频的路径')
-    parser.add_argument('-o', '--output', help='输出视频的路径（可选）')
-    
+    parser.add_argument('input', nargs='+', help='输入视频的路径，批量模式下也可以是目录')
+    parser.add_argument('-o', '--output', help='输出视频的路径（可选，仅单个文件）')
+    parser.add_argument('--codec', default='H264', help='输出视频编码器 FourCC (默认: H264)')
+    parser.add_argument('--batch', action='store_true', help='批量模式：多个文件同时处理，解码/裁切/编码流水线并行')
+    parser.add_argument('--jobs', type=int, default=2, help='批量模式下同时处理的文件数 (默认: 2)')
+    parser.add_argument('--output-dir', help='批量模式的输出目录，默认与输入文件相同')
+    parser.add_argument('--queue-size', type=int, default=32, help='流水线各阶段之间的队列长度 (默认: 32)')
+
     args = parser.parse_args()
-    
+
+    if args.batch or len(args.input) > 1:
+        # 目录中已裁切过的输出不再处理
+        videos = find_videos(args.input, skip='_cropped')
+        start = time.time()
+        results = crop_videos(videos, args.output_dir, args.jobs, args.codec, args.queue_size)
+        total = sum(r.get('frames', 0) for r in results)
+        elapsed = time.time() - start
+        print(f"\n{'文件':<40}{'帧数':>8}{'耗时(秒)':>10}{'帧/秒':>10}")
+        for r in sorted(results, key=lambda r: r['input']):
+            if 'error' in r:
+                print(f"{os.path.basename(r['input']):<40}{'失败':>8}  {r['error']}")
+            else:
+                print(f"{os.path.basename(r['input']):<40}{r['frames']:>8}{r['seconds']:>10}{r['fps']:>10}")
+        print(f"共 {len(videos)} 个文件, {total} 帧, 用时 {elapsed:.1f}秒, 总吞吐 {total / elapsed:.1f} 帧/秒")
+        return
+
     try:
-        crop_video_to_4_3(args.input, args.output)
+        crop_video_to_4_3(args.input[0], args.output, args.codec)
     except Exception as e:
         print(f"错误: {e}")
 
@@ -0,0 +1,104 @@
+import time
+from collections import deque
+
+import numpy as np
+
+
+class TemporalVoter:
+    """
+    跨帧累积各类别置信度的投票器，代替“连续 N 个相同检测框”的计数方式。
+
+    每帧先把已有的累积值乘以 decay，再加上本帧每个类别的最高分数（同类别多个框只算一次），
+    某个类别的累积值达到 fire_mass 且占全部累积值的比例不低于 dominance 时做出决定。
+    同一帧里出现其他类别的框只会稀释比例，不会像计数方式那样把进度清零。
+
+    参数:
+        num_classes: 类别数
+        decay: 每帧的衰减系数，越小越只看最近几帧
+        fire_mass: 做出决定所需的累积置信度
+        dominance: 主导类别至少占全部累积值的比例
+    """
+
+    def __init__(self, num_classes, decay=0.8, fire_mass=2.5, dominance=0.7):
+        self.decay = decay
+        self.fire_mass = fire_mass
+        self.dominance = dominance
+        self.mass = np.zeros(num_classes, np.float64)
+        self._frame_scores = np.zeros(num_classes, np.float64)
+        self._started_at = None
+        self._frames = 0
+
+        # 统计信息
+        self.decisions = 0
+        self._decision_times = deque(maxlen=200)
+        self._decision_frames = deque(maxlen=200)
+
+    def reset(self):
+        """清空累积值，物体被投放或状态超时后调用"""
+        self.mass[:] = 0
+        self._started_at = None
+        self._frames = 0
+
+    def update(self, detections, now=None):
+        """
+        加入一帧的检测结果。
+
+        参数:
+            detections: 本帧的 Detections
+            now: 当前时间，默认为 time.time()
+
+        返回:
+            tuple: 做出决定时为 (类别ID, 该类别本帧最高分数)，否则为 None
+        """
+        if now is None:
+            now = time.time()
+
+        self.mass *= self.decay
+        if len(detections):
+            self._frame_scores[:] = 0
+            np.maximum.at(self._frame_scores, detections.classes, detections.scores)
+            self.mass += self._frame_scores
+            if self._started_at is None:
+                self._started_at = now
+
+        total = self.mass.sum()
+        if self._started_at is None:
+            return None
+        # 证据已衰减殆尽，视为这一轮结束，下次从头计时
+        if total < 0.05:
+            self.reset()
+            return None
+
+        self._frames += 1
+        cls_id = int(np.argmax(self.mass))
+        if self.mass[cls_id] < self.fire_mass or self.mass[cls_id] < self.dominance * total:
+            return None
+
+        score = float(self._frame_scores[cls_id]) if len(detections) else 0.0
+        self.decisions += 1
+        self._decision_times.append(now - self._started_at)
+        self._decision_frames.append(self._frames)
+        self.reset()
+        return cls_id, score
+
+    def stats(self):
+        return {
+            'decisions': self.decisions,
+            'median_decision_ms': round(float(np.median(self._decision_times)) * 1000, 1)
+            if self._decision_times else None,
+            'median_decision_frames': float(np.median(self._decision_frames)) if self._decision_frames else None,
+            'leading_class': int(np.argmax(self.mass)) if self.mass.any() else None,
+            'leading_mass': round(float(self.mass.max()), 3),
+        }
+
+
+def add_voter_arguments(parser):
+    """在命令行参数中加入投票器的可调参数"""
+    parser.add_argument('--vote-decay', type=float, default=0.8, help='投票累积值每帧的衰减系数 (默认: 0.8)')
+    parser.add_argument('--vote-mass', type=float, default=2.5, help='做出决定所需的累积置信度 (默认: 2.5)')
+    parser.add_argument('--vote-dominance', type=float, default=0.7,
+                        help='主导类别至少占全部累积值的比例 (默认: 0.7)')
+
+
+def voter_from_args(args, num_classes):
+    return TemporalVoter(num_classes, args.vote_decay, args.vote_mass, args.vote_dominance)
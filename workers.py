@@ -0,0 +1,403 @@
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from backends import DEFAULT_WEIGHTS
+from detections import Detections
+
+# camera: 每个摄像头固定由一个工作进程推理；pool: 每帧交给当前最空闲的工作进程
+WORKER_MODES = ('camera', 'pool')
+
+# 每个帧槽的默认大小，与摄像头采集尺寸一致
+FRAME_SHAPE = (480, 640, 3)
+
+
+class FrameRing:
+    """
+    共享内存中的帧槽环形缓冲区。
+
+    主进程把画面复制到空闲的槽中，只把槽号和形状发给工作进程，工作进程直接在共享内存上推理，
+    画面不经过序列化。槽在收到该帧的推理结果后才归还。
+
+    参数:
+        slots: 槽数
+        slot_bytes: 每个槽的字节数，不能小于最大的一帧
+        name: 已有共享内存的名称，工作进程按名称附加；为 None 时新建
+    """
+
+    def __init__(self, slots=4, slot_bytes=int(np.prod(FRAME_SHAPE)), name=None):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=slots * slot_bytes)
+        self.buffers = np.ndarray((slots, slot_bytes), np.uint8, buffer=self.shm.buf)
+        self._free = list(range(slots))
+        self._cond = threading.Condition()
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def acquire(self, timeout=None):
+        """取一个空闲槽，超时仍没有空闲槽时抛出 TimeoutError"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._free, timeout):
+                raise TimeoutError("共享内存帧槽已满")
+            return self._free.pop()
+
+    def release(self, slot):
+        with self._cond:
+            self._free.append(slot)
+            self._cond.notify()
+
+    def write(self, slot, frame):
+        """把画面复制到槽中，返回其形状"""
+        if frame.dtype != np.uint8 or frame.nbytes > self.slot_bytes:
+            raise ValueError(f"画面 {frame.shape} {frame.dtype} 超出帧槽大小 {self.slot_bytes} 字节")
+        np.copyto(self.view(slot, frame.shape), frame)
+        return frame.shape
+
+    def view(self, slot, shape):
+        """槽中画面的连续视图，不复制"""
+        return self.buffers[slot, :int(np.prod(shape))].reshape(shape)
+
+    def close(self):
+        self.buffers = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def pack_detections(detections):
+    """把检测结果压缩为一个 (N, 6) float32 数组：x1, y1, x2, y2, score, cls"""
+    return np.column_stack([detections.boxes, detections.scores, detections.classes]).astype(np.float32)
+
+
+def unpack_detections(record):
+    return Detections(record[:, :4], record[:, 4], record[:, 5])
+
+
+def _limit_threads(threads):
+    # 多个工作进程各自占满所有核心会互相争抢，限制每个进程的计算线程数
+    import cv2
+
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def _worker_main(index, backend_name, weights, ring_name, slots, slot_bytes, tasks, results, warmup, threads):
+    """工作进程：加载自己的模型，按槽号读取共享内存中的画面推理，只把检测结果发回主进程"""
+    ring = FrameRing(slots, slot_bytes, name=ring_name)
+    try:
+        _limit_threads(threads)
+        from backends import InferenceBackend
+
+        backend = InferenceBackend(backend_name, weights).load()
+        if warmup > 0:
+            backend.warmup(warmup)
+    except Exception as e:
+        results.put(('failed', index, None, str(e)))
+        ring.close()
+        return
+    results.put(('ready', index, None, (dict(backend.names), backend.load_time, backend.warmup_time)))
+
+    parent = multiprocessing.parent_process()
+    while True:
+        try:
+            task = tasks.get(timeout=1.0)
+        except queue.Empty:
+            # 主进程被强制结束时不会通知工作进程，自行退出
+            if parent is not None and not parent.is_alive():
+                break
+            continue
+        if task is None:
+            break
+        request_id, slot, shape, conf, imgsz, offset = task
+        start = time.perf_counter()
+        try:
+            detections = backend.predict_one(ring.view(slot, shape), conf, imgsz, offset)
+            results.put(('result', index, request_id, (pack_detections(detections), time.perf_counter() - start)))
+        except Exception as e:
+            results.put(('error', index, request_id, str(e)))
+    ring.close()
+
+
+class WorkerProcess:
+    __slots__ = ('index', 'process', 'ring', 'tasks', 'alive', 'sources', 'inflight', 'frames', 'busy_time')
+
+    def __init__(self, index, process, ring, tasks):
+        self.index = index
+        self.process = process
+        self.ring = ring
+        self.tasks = tasks
+        self.alive = True
+        self.sources = set()
+        self.inflight = 0
+        self.frames = 0
+        self.busy_time = 0.0
+
+
+class ProcessInferencePool:
+    """
+    在多个工作进程中推理，每个进程加载一份模型，推理和结果解析不再与 Flask、Socket.IO 线程争抢 GIL。
+
+    每个工作进程有自己的共享内存帧槽（FrameRing）和任务队列，任务只包含槽号、形状和参数；
+    结果为每个检测框 6 个 float32 的小数组。接口与 InferenceBackend 的 names、predict_one 一致，
+    可以直接替代后端。
+
+    参数:
+        name: 推理后端名称，见 backends.BACKENDS
+        workers: 工作进程数
+        mode: 分配方式，见 WORKER_MODES
+        weights: PyTorch 权重路径
+        warmup: 每个工作进程启动时的预热推理次数
+        slots: 每个工作进程的帧槽数
+        slot_bytes: 每个帧槽的字节数
+        threads: 每个工作进程的计算线程数
+        start_timeout: 等待工作进程加载模型的最长秒数
+        result_timeout: predict_one 等待单帧结果的最长秒数
+    """
+
+    # 收集线程检查工作进程是否存活的间隔（秒），与结果队列是否空闲无关
+    CHECK_INTERVAL = 0.5
+
+    def __init__(self, name='torch', workers=2, mode='camera', weights=DEFAULT_WEIGHTS, warmup=2, slots=4,
+                 slot_bytes=int(np.prod(FRAME_SHAPE)), threads=1, start_timeout=300.0, result_timeout=30.0):
+        if mode not in WORKER_MODES:
+            raise ValueError(f"未知的分配方式: {mode}，可选: {', '.join(WORKER_MODES)}")
+        self.name = name
+        self.workers = workers
+        self.mode = mode
+        self.weights = weights
+        self.warmup_runs = warmup
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.threads = threads
+        self.start_timeout = start_timeout
+        self.result_timeout = result_timeout
+
+        self.names = {}
+        self.load_time = 0.0
+        self.warmup_time = 0.0
+
+        self._ctx = multiprocessing.get_context('spawn')
+        self._results = None
+        self._workers = []
+        self._assigned = {}
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._collector = None
+
+        # 统计信息
+        self.frames = 0
+        self.failures = 0
+        self.total_roundtrip = 0.0
+
+    def start(self):
+        """启动工作进程并等待全部加载完成，任一进程加载失败时抛出 RuntimeError"""
+        self._results = self._ctx.Queue()
+        for index in range(self.workers):
+            ring = FrameRing(self.slots, self.slot_bytes)
+            tasks = self._ctx.Queue()
+            process = self._ctx.Process(
+                target=_worker_main, name=f"inference-worker-{index}", daemon=True,
+                args=(index, self.name, self.weights, ring.name, self.slots, self.slot_bytes,
+                      tasks, self._results, self.warmup_runs, self.threads))
+            process.start()
+            self._workers.append(WorkerProcess(index, process, ring, tasks))
+
+        started = time.time()
+        waiting = set(range(self.workers))
+        while waiting:
+            try:
+                remaining = max(self.start_timeout - (time.time() - started), 0.1)
+                kind, index, _, payload = self._results.get(timeout=remaining)
+            except queue.Empty:
+                self.stop()
+                raise RuntimeError(f"等待推理工作进程超时 ({self.start_timeout:g}秒)")
+            if kind == 'failed':
+                self.stop()
+                raise RuntimeError(f"推理工作进程 {index} 加载失败: {payload}")
+            names, load_time, warmup_time = payload
+            self.names = names
+            self.load_time = max(self.load_time, load_time)
+            self.warmup_time = max(self.warmup_time, warmup_time)
+            waiting.discard(index)
+            print(f"推理工作进程 {index} 已就绪 (pid {self._workers[index].process.pid})")
+
+        self._collector = threading.Thread(target=self._collect, name="inference-results", daemon=True)
+        self._collector.start()
+        return self
+
+    def stop(self):
+        for worker in self._workers:
+            if worker.process.is_alive():
+                worker.tasks.put(None)
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.alive = False
+        if self._collector is not None:
+            self._results.put(None)
+            self._collector.join(timeout=2)
+            self._collector = None
+        self._fail_pending(lambda worker: True, "推理工作进程已停止")
+        for worker in self._workers:
+            worker.ring.close()
+        self._workers = []
+
+    def _choose(self, source):
+        with self._lock:
+            alive = [w for w in self._workers if w.alive]
+            if not alive:
+                raise RuntimeError("没有可用的推理工作进程")
+            if self.mode == 'camera':
+                worker = self._assigned.get(source)
+                if worker is None or not worker.alive:
+                    # 新摄像头分配给负责摄像头最少的工作进程
+                    worker = min(alive, key=lambda w: (len(w.sources), w.inflight))
+                    self._assigned[source] = worker
+                    worker.sources.add(source)
+            else:
+                worker = min(alive, key=lambda w: w.inflight)
+            worker.inflight += 1
+            return worker
+
+    def release(self, source):
+        """提交方不再推理（如摄像头的检测流程已停止），解除其与工作进程的固定关系"""
+        with self._lock:
+            worker = self._assigned.pop(source, None)
+            if worker is not None:
+                worker.sources.discard(source)
+
+    def submit(self, frame, conf, imgsz=None, offset=(0, 0), source=None, timeout=5.0):
+        """
+        把一帧写入工作进程的帧槽，返回结果为 Detections 的 Future。
+
+        参数:
+            frame: 待推理的 uint8 图像，可以是裁剪区域
+            conf: 置信度阈值
+            imgsz: 模型输入尺寸，None 表示使用模型默认值
+            offset: 检测框需要平移的 (x, y)，用于裁剪推理
+            source: 提交方标识（如摄像头ID），camera 模式下同一标识固定由一个工作进程推理，
+                不再使用时调用 release()；默认为当前线程
+            timeout: 等待空闲帧槽的最长秒数
+        """
+        if source is None:
+            source = threading.get_ident()
+        worker = self._choose(source)
+        try:
+            slot = worker.ring.acquire(timeout)
+        except TimeoutError:
+            with self._lock:
+                worker.inflight -= 1
+            raise
+        try:
+            shape = worker.ring.write(slot, frame)
+        except ValueError:
+            worker.ring.release(slot)
+            with self._lock:
+                worker.inflight -= 1
+            raise
+        request_id = next(self._ids)
+        future = Future()
+        with self._lock:
+            self._pending[request_id] = (future, worker, slot, time.perf_counter())
+        worker.tasks.put((request_id, slot, shape, conf, imgsz, tuple(offset)))
+        return future
+
+    def predict_one(self, frame, conf, imgsz=None, offset=(0, 0), source=None):
+        """提交一帧并等待结果，超过 result_timeout 仍无结果时抛出 TimeoutError"""
+        future = self.submit(frame, conf, imgsz, offset, source)
+        try:
+            return future.result(self.result_timeout)
+        except FutureTimeout:
+            raise TimeoutError(f"等待推理结果超时 ({self.result_timeout:g}秒)") from None
+
+    def _finish(self, request_id):
+        with self._lock:
+            entry = self._pending.pop(request_id, None)
+            if entry is not None:
+                entry[1].inflight -= 1
+        if entry is not None:
+            entry[1].ring.release(entry[2])
+        return entry
+
+    def _collect(self):
+        last_check = time.monotonic()
+        while True:
+            try:
+                message = self._results.get(timeout=self.CHECK_INTERVAL)
+            except queue.Empty:
+                message = ()
+            # 其他工作进程持续返回结果时队列不会空闲，因此按时间检查，及时让已退出进程上的请求失败
+            if time.monotonic() - last_check >= self.CHECK_INTERVAL:
+                self._check_workers()
+                last_check = time.monotonic()
+            if message is None:
+                break
+            if not message:
+                continue
+            kind, index, request_id, payload = message
+            entry = self._finish(request_id)
+            if entry is None:
+                continue
+            future, worker, _, submitted = entry
+            if kind == 'result':
+                record, elapsed = payload
+                worker.frames += 1
+                worker.busy_time += elapsed
+                self.frames += 1
+                self.total_roundtrip += time.perf_counter() - submitted
+                future.set_result(unpack_detections(record))
+            else:
+                self.failures += 1
+                future.set_exception(RuntimeError(payload))
+
+    def _check_workers(self):
+        for worker in self._workers:
+            if worker.alive and not worker.process.is_alive():
+                with self._lock:
+                    worker.alive = False
+                    for source in worker.sources:
+                        self._assigned.pop(source, None)
+                    worker.sources.clear()
+                print(f"推理工作进程 {worker.index} 已退出 (exitcode {worker.process.exitcode})")
+                self._fail_pending(lambda w: w is worker, f"推理工作进程 {worker.index} 已退出")
+
+    def _fail_pending(self, match, message):
+        with self._lock:
+            request_ids = [request_id for request_id, entry in self._pending.items() if match(entry[1])]
+        for request_id in request_ids:
+            entry = self._finish(request_id)
+            if entry is not None:
+                self.failures += 1
+                entry[0].set_exception(RuntimeError(message))
+
+    def stats(self):
+        return {
+            'mode': self.mode,
+            'frames': self.frames,
+            'failures': self.failures,
+            'avg_roundtrip_ms': round(self.total_roundtrip / self.frames * 1000, 2) if self.frames else 0.0,
+            'workers': [{
+                'pid': w.process.pid,
+                'alive': w.alive,
+                'cameras': len(w.sources),
+                'inflight': w.inflight,
+                'frames': w.frames,
+                'avg_inference_ms': round(w.busy_time / w.frames * 1000, 2) if w.frames else 0.0,
+            } for w in self._workers],
+        }